@@ -1,9 +1,11 @@
 """
 添加 projects 表的数据库迁移脚本
 """
-from run import app, db
+from run import create_app, db
 from sqlalchemy import text
 
+app = create_app()
+
 
 def add_projects_table():
     """创建projects表"""
@@ -1,9 +1,11 @@
 """
 添加 tenant_id 字段到现有表
 """
-from run import app, db
+from run import create_app, db
 from sqlalchemy import text
 
+app = create_app()
+
 
 def add_tenant_columns():
     """添加tenant_id字段"""
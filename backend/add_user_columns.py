@@ -1,9 +1,11 @@
 """
 添加 users 表的新字段
 """
-from run import app, db
+from run import create_app, db
 from sqlalchemy import text
 
+app = create_app()
+
 
 def add_user_columns():
     """添加users表的新字段"""
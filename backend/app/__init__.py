@@ -52,6 +52,35 @@ def create_app(config_name=None):
     from app.utils.errors import register_error_handlers
     register_error_handlers(app)
 
+    # 注册全文检索索引维护钩子
+    from app.services.search_service import register_search_index_hooks
+    register_search_index_hooks()
+
+    # 注册 MCP 目录缓存失效钩子
+    from app.services.mcp_catalog_cache import register_mcp_catalog_hooks
+    register_mcp_catalog_hooks()
+
+    # 注册用例、执行记录项目归属的维护钩子
+    from app.services.project_scope_service import register_project_scope_hooks
+    register_project_scope_hooks()
+
+    # 注册执行记录按日汇总的维护钩子
+    from app.services.execution_stats_service import register_execution_stats_hooks
+    register_execution_stats_hooks()
+
+    # 注册项目统计计数的维护钩子
+    from app.services.project_stats_service import register_project_stats_hooks, schedule_project_stats_reconcile
+    register_project_stats_hooks()
+
+    # 初始化后台任务队列
+    from app.services.job_queue import get_job_queue
+    get_job_queue().init_app(app)
+    schedule_project_stats_reconcile(app)
+
+    # 注册命令行工具
+    from app.commands import register_commands
+    register_commands(app)
+
     # 注册认证中间件
     @app.before_request
     def auth_middleware():
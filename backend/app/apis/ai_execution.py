@@ -1,21 +1,49 @@
 """
 AI测试执行API
 """
-from flask import request
-from flask_restx import Namespace, Resource
-from app.utils.errors import success_response, error_response
-from app.models import TestCase, TestSuite, TestExecution, TestPlan, Project
-from app import db
-from datetime import datetime
 import json
-import random
 import time
+from flask import request, current_app, Response, stream_with_context
+from flask_restx import Namespace, Resource
+from app import db
+from app.models import BackgroundJob
+from app.utils.errors import success_response, error_response
+from app.services.job_queue import get_job_queue
+from app.services.execution_log_store import get_execution_log_store
+from app.services.ai_execution_service import AI_EXECUTION_JOB_TYPE, build_execution_state, resolve_concurrency
 
 # 创建命名空间
 ai_execution_ns = Namespace('ai-execution', description='AI测试执行接口')
 
-# 存储执行状态（实际生产环境应该使用Redis或数据库）
-execution_store = {}
+# 单次拉取的最大事件数
+MAX_EVENTS_PER_POLL = 500
+
+
+def _get_job_status(execution_id):
+    """读取执行的状态与进度（不加载 state）"""
+    return db.session.query(
+        BackgroundJob.status, BackgroundJob.progress, BackgroundJob.cancel_requested, BackgroundJob.error_message
+    ).filter(BackgroundJob.id == execution_id, BackgroundJob.job_type == AI_EXECUTION_JOB_TYPE).first()
+
+
+def _status_dict(execution_id, job_status):
+    """执行状态摘要"""
+    return {
+        'execution_id': execution_id,
+        'status': job_status.status,
+        'progress': job_status.progress,
+        'cancel_requested': job_status.cancel_requested,
+        'error_message': job_status.error_message,
+        'finished': job_status.status in BackgroundJob.FINISHED_STATUSES
+    }
+
+
+def _parse_since(value):
+    """解析事件序号参数"""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
 
 
 @ai_execution_ns.route('/start')
@@ -27,47 +55,35 @@ class AIExecutionStartAPI(Resource):
             data = request.get_json()
             case_ids = data.get('case_ids', [])
             environment_id = data.get('environment_id')
+            test_plan_id = data.get('test_plan_id')
+            concurrency = data.get('concurrency')
+            fail_fast = bool(data.get('fail_fast', False))
+            priority_order = bool(data.get('priority_order', True))
 
             if not case_ids:
                 return error_response(message='请选择要执行的测试用例')
 
-            # 生成执行ID
-            execution_id = int(time.time() * 1000)
-
-            # 获取测试用例信息
-            test_cases = []
-            for case_id in case_ids:
-                case = TestCase.query.filter_by(id=case_id, is_deleted=False).first()
-                if case:
-                    test_cases.append({
-                        'id': case.id,
-                        'caseName': case.name,
-                        'status': 'pending',
-                        'progress': 0,
-                        'currentStep': 0,
-                        'totalSteps': 5,
-                        'currentStepContent': '',
-                        'errorInfo': '',
-                        'logs': []
-                    })
-
-            # 初始化执行状态
-            execution_store[execution_id] = {
-                'execution_id': execution_id,
-                'status': 'running',
-                'test_cases': test_cases,
-                'success_count': 0,
-                'failed_count': 0,
-                'skipped_count': 0,
-                'start_time': datetime.utcnow().isoformat(),
-                'environment_id': environment_id
-            }
-
-            # 启动后台模拟执行（实际应该使用Celery或类似任务队列）
-            _simulate_execution(execution_id, case_ids)
+            # 提前校验环境是否可用，避免任务启动后才失败
+            try:
+                resolve_concurrency(environment_id, concurrency)
+            except ValueError as e:
+                return error_response(message=str(e), code=400)
+
+            # 执行状态持久化在后台任务中，由任务队列的工作线程池执行
+            job = get_job_queue().submit(
+                AI_EXECUTION_JOB_TYPE,
+                payload={
+                    'case_ids': case_ids,
+                    'environment_id': environment_id,
+                    'test_plan_id': test_plan_id,
+                    'concurrency': concurrency,
+                    'fail_fast': fail_fast
+                },
+                state=build_execution_state(case_ids, environment_id, priority_order)
+            )
 
             return success_response(data={
-                'execution_id': execution_id,
+                'execution_id': job.id,
                 'message': 'AI执行已启动'
             })
         except Exception as e:
@@ -80,126 +96,160 @@ class AIExecutionStatusAPI(Resource):
     def get(self, execution_id):
         """获取执行状态"""
         try:
-            if execution_id not in execution_store:
+            job = get_job_queue().get(execution_id, AI_EXECUTION_JOB_TYPE)
+            if job is None:
                 return error_response(message='执行记录不存在', code=404)
 
-            execution = execution_store.get(execution_id)
+            execution = job.get_state()
+            execution.update({
+                'execution_id': job.id,
+                'status': job.status,
+                'progress': job.progress,
+                'cancel_requested': job.cancel_requested,
+                'error_message': job.error_message
+            })
 
             return success_response(data=execution)
         except Exception as e:
             return error_response(message=f'获取执行状态失败: {str(e)}')
 
 
+@ai_execution_ns.route('/<int:execution_id>/events')
+class AIExecutionEventsAPI(Resource):
+    @ai_execution_ns.doc('get_execution_events')
+    @ai_execution_ns.param('since', '已收到的最大事件序号，首次传0')
+    @ai_execution_ns.param('timeout', '没有新事件时最长等待秒数（长轮询），0表示立即返回')
+    def get(self, execution_id):
+        """长轮询获取执行增量事件：用例状态变化(case_status)、新日志(log)、执行汇总(summary)"""
+        try:
+            since = _parse_since(request.args.get('since'))
+            max_timeout = current_app.config.get('EXECUTION_EVENTS_LONG_POLL_TIMEOUT', 25)
+            timeout = min(request.args.get('timeout', max_timeout, type=float), max_timeout)
+            poll_interval = current_app.config.get('EXECUTION_EVENTS_POLL_INTERVAL', 0.5)
+            deadline = time.monotonic() + max(timeout, 0)
+
+            queue = get_job_queue()
+            while True:
+                job_status = _get_job_status(execution_id)
+                if job_status is None:
+                    return error_response(message='执行记录不存在', code=404)
+                events = queue.get_events(execution_id, since, MAX_EVENTS_PER_POLL)
+                finished = job_status.status in BackgroundJob.FINISHED_STATUSES
+                if events or finished or time.monotonic() >= deadline:
+                    break
+                # 结束本次读事务并归还连接，下次查询才能读到新提交的事件
+                db.session.rollback()
+                time.sleep(poll_interval)
+
+            data = _status_dict(execution_id, job_status)
+            data.update({
+                'events': [event.to_dict() for event in events],
+                'next_since': events[-1].id if events else since,
+                'has_more': len(events) >= MAX_EVENTS_PER_POLL
+            })
+            return success_response(data=data)
+        except Exception as e:
+            return error_response(message=f'获取执行事件失败: {str(e)}')
+
+
+@ai_execution_ns.route('/<int:execution_id>/stream')
+class AIExecutionStreamAPI(Resource):
+    @ai_execution_ns.doc('stream_execution_events')
+    @ai_execution_ns.param('since', '已收到的最大事件序号，断线重连时也可通过 Last-Event-ID 请求头传递')
+    def get(self, execution_id):
+        """以 Server-Sent Events 推送执行增量事件，执行结束后发送 end 事件并关闭"""
+        if _get_job_status(execution_id) is None:
+            return error_response(message='执行记录不存在', code=404)
+
+        since = _parse_since(request.headers.get('Last-Event-ID', request.args.get('since')))
+        poll_interval = current_app.config.get('EXECUTION_EVENTS_POLL_INTERVAL', 0.5)
+        heartbeat_interval = current_app.config.get('EXECUTION_STREAM_HEARTBEAT_INTERVAL', 15)
+        max_duration = current_app.config.get('EXECUTION_STREAM_MAX_DURATION', 300)
+        queue = get_job_queue()
+
+        def format_event(event_type, data, event_id=None):
+            lines = [f'id: {event_id}'] if event_id is not None else []
+            lines.append(f'event: {event_type}')
+            lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+            return '\n'.join(lines) + '\n\n'
+
+        def generate():
+            last_seq = since
+            last_status = None
+            started = last_sent = time.monotonic()
+            try:
+                while True:
+                    job_status = _get_job_status(execution_id)
+                    events = queue.get_events(execution_id, last_seq, MAX_EVENTS_PER_POLL)
+                    db.session.rollback()
+
+                    for event in events:
+                        last_seq = event.id
+                        yield format_event(event.event_type, event.to_dict(), event.id)
+                    status = _status_dict(execution_id, job_status)
+                    if status != last_status:
+                        last_status = status
+                        yield format_event('status', status)
+                        last_sent = time.monotonic()
+                    elif events:
+                        last_sent = time.monotonic()
+
+                    if len(events) >= MAX_EVENTS_PER_POLL:
+                        continue
+                    if status['finished']:
+                        yield format_event('end', {'next_since': last_seq})
+                        return
+
+                    now = time.monotonic()
+                    # 限制单个连接的时长，客户端会携带 Last-Event-ID 自动重连
+                    if now - started >= max_duration:
+                        return
+                    if now - last_sent >= heartbeat_interval:
+                        last_sent = now
+                        yield ': keep-alive\n\n'
+                    time.sleep(poll_interval)
+            finally:
+                db.session.remove()
+
+        return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            # 关闭 Nginx 代理缓冲，事件立即送达
+            'X-Accel-Buffering': 'no'
+        })
+
+
+@ai_execution_ns.route('/<int:execution_id>/logs')
+class AIExecutionLogsAPI(Resource):
+    @ai_execution_ns.doc('get_execution_logs')
+    @ai_execution_ns.param('offset', '起始位置')
+    @ai_execution_ns.param('limit', '返回条数，最大1000')
+    @ai_execution_ns.param('case_id', '只返回该用例的日志')
+    def get(self, execution_id):
+        """按区间读取执行的完整日志"""
+        try:
+            if _get_job_status(execution_id) is None:
+                return error_response(message='执行记录不存在', code=404)
+
+            offset = max(request.args.get('offset', 0, type=int), 0)
+            limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+            case_id = request.args.get('case_id', type=int)
+
+            data = get_execution_log_store().read(execution_id, offset, limit, case_id)
+            return success_response(data=data)
+        except Exception as e:
+            return error_response(message=f'获取执行日志失败: {str(e)}')
+
+
 @ai_execution_ns.route('/<int:execution_id>/stop')
 class AIExecutionStopAPI(Resource):
     @ai_execution_ns.doc('stop_execution')
     def post(self, execution_id):
         """停止执行"""
         try:
-            if execution_id not in execution_store:
+            job = get_job_queue().cancel(execution_id, AI_EXECUTION_JOB_TYPE)
+            if job is None:
                 return error_response(message='执行记录不存在', code=404)
 
-            execution = execution_store[execution_id]
-            execution['status'] = 'stopped'
-
             return success_response(message='已停止执行')
         except Exception as e:
             return error_response(message=f'停止执行失败: {str(e)}')
-
-
-def _simulate_execution(execution_id, case_ids):
-    """模拟AI执行过程（实际应该调用真实的AI Agent）"""
-    import threading
-
-    def execute():
-        try:
-            execution = execution_store.get(execution_id)
-            if not execution:
-                return
-
-            test_cases = execution['test_cases']
-
-            for index, case in enumerate(test_cases):
-                # 检查是否已停止
-                if execution_store.get(execution_id, {}).get('status') == 'stopped':
-                    break
-
-                # 更新状态为执行中
-                case['status'] = 'running'
-                case['currentStep'] = 1
-
-                steps = [
-                    '准备测试环境',
-                    '解析测试步骤',
-                    '执行测试操作',
-                    '验证结果',
-                    '生成测试报告'
-                ]
-
-                for step_index, step_name in enumerate(steps, 1):
-                    # 检查是否已停止
-                    if execution_store.get(execution_id, {}).get('status') == 'stopped':
-                        break
-
-                    case['currentStep'] = step_index
-                    case['currentStepContent'] = step_name
-                    case['progress'] = int((step_index / len(steps)) * 100)
-
-                    # 添加日志
-                    case['logs'].append({
-                        'time': datetime.now().strftime('%H:%M:%S'),
-                        'level': 'INFO',
-                        'message': f'正在执行: {step_name}'
-                    })
-
-                    # 模拟执行时间
-                    time.sleep(random.uniform(1, 3))
-
-                # 随机决定成功或失败
-                if random.random() > 0.2:  # 80%成功率
-                    case['status'] = 'completed'
-                    execution['success_count'] += 1
-                    case['logs'].append({
-                        'time': datetime.now().strftime('%H:%M:%S'),
-                        'level': 'INFO',
-                        'message': '测试执行成功'
-                    })
-                else:
-                    case['status'] = 'failed'
-                    execution['failed_count'] += 1
-                    case['errorInfo'] = '断言失败: 期望值与实际值不匹配'
-                    case['logs'].append({
-                        'time': datetime.now().strftime('%H:%M:%S'),
-                        'level': 'ERROR',
-                        'message': '测试执行失败: 断言失败'
-                    })
-
-                # 保存执行记录到数据库
-                try:
-                    test_case = TestCase.query.get(case['id'])
-                    if test_case:
-                        execution_record = TestExecution(
-                            test_case_id=case['id'],
-                            status='passed' if case['status'] == 'completed' else 'failed',
-                            executed_by='AI Agent',
-                            actual_result=json.dumps({'logs': case['logs'][-5:]}),
-                            duration=random.randint(10, 60)
-                        )
-                        db.session.add(execution_record)
-                        db.session.commit()
-                except Exception as e:
-                    print(f'Save execution record failed: {e}')
-
-            # 更新整体状态
-            if execution_store.get(execution_id, {}).get('status') != 'stopped':
-                execution['status'] = 'completed'
-
-        except Exception as e:
-            print(f'Execution failed: {e}')
-            if execution_id in execution_store:
-                execution_store[execution_id]['status'] = 'failed'
-
-    # 在后台线程中执行
-    thread = threading.Thread(target=execute)
-    thread.daemon = True
-    thread.start()
@@ -5,7 +5,8 @@ from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from app import db
 from app.models import Defect, DefectWorkflow, DefectComment, DefectModule
-from app.utils import success_response, error_response
+from app.utils import success_response, error_response, is_cursor_request, cursor_page_response
+from app.services.search_service import get_search_service, DOC_TYPE_DEFECT
 import json
 from datetime import datetime, date
 
@@ -192,16 +193,30 @@ class DefectListAPI(Resource):
                 query = query.filter_by(priority=priority)
             if assigned_to:
                 query = query.filter_by(assigned_to=assigned_to)
+
+            search_service = get_search_service()
+            order_by = [Defect.id.desc()]
             if keyword:
-                query = query.filter(Defect.title.contains(keyword) |
-                                     Defect.defect_no.contains(keyword))
+                # 全文检索：匹配编号、标题、描述、复现步骤、标签等字段，按相关度排序
+                matched = search_service.match_subquery(DOC_TYPE_DEFECT, keyword)
+                query = query.join(matched, matched.c.doc_id == Defect.id)
+                order_by.insert(0, matched.c.score.desc())
+
+            def serialize(defects):
+                return search_service.to_dicts_with_highlight(DOC_TYPE_DEFECT, defects, keyword)
+
+            if is_cursor_request():
+                # 游标分页固定按 id 排序，无法保持关键字检索的相关度排序
+                if keyword:
+                    return error_response(message='关键字检索按相关度排序，不支持游标分页', code=400)
+                return cursor_page_response(query, Defect.id, per_page, serialize)
 
-            pagination = query.order_by(Defect.id.desc()).paginate(
+            pagination = query.order_by(*order_by).paginate(
                 page=page, per_page=per_page, error_out=False
             )
 
             return success_response(data={
-                'items': [item.to_dict() for item in pagination.items],
+                'items': serialize(pagination.items),
                 'total': pagination.total,
                 'pages': pagination.pages,
                 'current_page': page
@@ -5,14 +5,20 @@ from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from app import db
 from app.models import MCPServer, MCPTool, MCPResource, Skill
-from app.utils import success_response, error_response
+from app.utils import success_response, error_response, is_cursor_request, cursor_page_response
 from app.services.mcp_operations import MCPOperations
 from app.services.mcp_client import MCPConnectionError, MCPTimeoutError, MCPClientError
 from app.services.mcp_process_manager import get_mcp_process_manager
+from app.services.mcp_session_pool import get_mcp_session_pool
+from app.services.mcp_sync_service import get_mcp_sync_service
+from app.services.mcp_catalog_cache import get_mcp_catalog_cache
 import json
 import subprocess
+import time
+from collections import Counter
 from datetime import datetime
 import traceback
+from sqlalchemy import update, case, func
 
 # 命名空间
 mcp_server_ns = Namespace('MCPServers', description='MCP Server管理')
@@ -28,6 +34,7 @@ mcp_server_model = mcp_server_ns.model('MCPServer', {
     'env': fields.String(description='环境变量(JSON对象)'),
     'url': fields.String(description='URL(SSE/HTTP)'),
     'timeout': fields.Integer(description='超时时间'),
+    'session_pool_size': fields.Integer(description='常驻会话数上限'),
     'status': fields.String(description='状态'),
     'is_enabled': fields.Boolean(description='是否启用'),
     'is_builtin': fields.Boolean(description='是否内置'),
@@ -90,6 +97,8 @@ def _handle_mcp_status_change(mcp_server, old_is_enabled, new_is_enabled):
 
     # 从启用变为禁用：停止进程
     elif old_is_enabled and not new_is_enabled:
+        # 关闭会话池中该服务器的常驻会话
+        get_mcp_session_pool().close_server(mcp_server.id)
         if mcp_server.transport_type == 'stdio':
             # stdio 类型需要停止进程
             success = process_manager.stop_process(mcp_server.id)
@@ -130,6 +139,9 @@ class MCPServerListAPI(Resource):
                 is_enabled_bool = is_enabled.lower() == 'true'
                 query = query.filter_by(is_enabled=is_enabled_bool)
 
+            if is_cursor_request():
+                return cursor_page_response(query, MCPServer.id, per_page)
+
             pagination = query.order_by(MCPServer.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -165,6 +177,7 @@ class MCPServerListAPI(Resource):
                 env=json.dumps(data.get('env')) if data.get('env') else None,
                 url=data.get('url'),
                 timeout=data.get('timeout', 30),
+                session_pool_size=data.get('session_pool_size', 1),
                 status=data.get('status', 'active'),
                 is_enabled=data.get('is_enabled', True),
                 is_builtin=data.get('is_builtin', False),
@@ -244,6 +257,7 @@ class MCPServerAPI(Resource):
                 mcp_server.env = json.dumps(data['env'])
             mcp_server.url = data.get('url', mcp_server.url)
             mcp_server.timeout = data.get('timeout', mcp_server.timeout)
+            mcp_server.session_pool_size = data.get('session_pool_size', mcp_server.session_pool_size)
             mcp_server.status = data.get('status', mcp_server.status)
             mcp_server.is_enabled = new_is_enabled
             mcp_server.is_builtin = data.get('is_builtin', mcp_server.is_builtin)
@@ -280,6 +294,7 @@ class MCPServerAPI(Resource):
             mcp_server.is_deleted = True
             mcp_server.updated_at = datetime.utcnow()
             db.session.commit()
+            get_mcp_session_pool().close_server(mcp_server.id)
             return success_response(message='删除成功')
         except Exception as e:
             db.session.rollback()
@@ -304,21 +319,22 @@ class MCPServerTestAPI(Resource):
                 'output': ''
             }
 
-            # 对于 stdio 类型，先检查进程是否在运行
-            if mcp_server.transport_type == 'stdio':
-                process_manager = get_mcp_process_manager()
-                if not process_manager.is_running(mcp_id):
-                    result['message'] = 'MCP Server 进程未运行，请先启用'
-                    result['success'] = False
-                    return success_response(data=result, message='测试完成')
+            # 对于 stdio 类型，需启用后才有常驻进程（本 worker 未启动时由 MCPOperations 按需启动）
+            if mcp_server.transport_type == 'stdio' and not mcp_server.is_enabled:
+                result['message'] = 'MCP Server 进程未运行，请先启用'
+                result['success'] = False
+                return success_response(data=result, message='测试完成')
 
             # 使用真实的 MCP 连接测试
             operations = MCPOperations(mcp_server)
 
             try:
-                # 尝试获取工具列表来测试连接
-                tools = operations.list_tools()
+                # 尝试获取工具列表来测试连接，目录缓存未过期时直接使用缓存（refresh=true 强制重新连接）
+                force = request.args.get('refresh', 'false').lower() == 'true'
+                catalog = get_mcp_catalog_cache().get_or_fetch(mcp_server, operations.discover, force=force)
+                tools = catalog['tools']
                 result['success'] = True
+                result['cached'] = catalog['cached']
                 result['message'] = f'连接成功，获取到 {len(tools)} 个工具'
                 result['output'] = f'工具列表: {", ".join([t["name"] for t in tools[:5]])}'
 
@@ -368,12 +384,12 @@ class MCPServerToolsAPI(Resource):
             return error_response(message=f'获取工具列表失败: {str(e)}', code=500)
 
 
-@mcp_server_ns.route('/<int:mcp_id>/sync')
-class MCPServerSyncAPI(Resource):
-    """同步MCP Server工具和资源"""
+@mcp_server_ns.route('/<int:mcp_id>/catalog')
+class MCPServerCatalogAPI(Resource):
+    """获取MCP Server工具和资源目录（优先读取目录缓存）"""
 
-    def post(self, mcp_id):
-        """同步工具和资源列表到数据库"""
+    def get(self, mcp_id):
+        """获取MCP Server当前提供的工具和资源，refresh=true 时强制重新连接"""
         try:
             mcp_server = MCPServer.query.filter_by(id=mcp_id, is_deleted=False).first()
             if not mcp_server:
@@ -382,79 +398,65 @@ class MCPServerSyncAPI(Resource):
             if not mcp_server.is_enabled:
                 return error_response(message='MCP Server已禁用', code=400)
 
-            # 使用真实的 MCP 连接
-            operations = MCPOperations(mcp_server)
-
-            result = {
-                'tools_synced': 0,
-                'resources_synced': 0,
-                'tools': [],
-                'resources': []
-            }
-
+            force = request.args.get('refresh', 'false').lower() == 'true'
             try:
-                # 同步工具列表
-                tools = operations.list_tools()
-
-                # 删除旧的工具记录
-                MCPTool.query.filter_by(mcp_id=mcp_id).delete()
-
-                # 添加新的工具记录
-                for tool_data in tools:
-                    tool = MCPTool(
-                        mcp_id=mcp_id,
-                        name=tool_data.get('name', ''),
-                        description=tool_data.get('description', ''),
-                        input_schema=json.dumps(tool_data.get('input_schema', {}))
-                    )
-                    db.session.add(tool)
-
-                result['tools_synced'] = len(tools)
-                result['tools'] = tools
-                mcp_server.tools_count = len(tools)
-
+                catalog = get_mcp_catalog_cache().get_or_fetch(
+                    mcp_server, MCPOperations(mcp_server).discover, force=force)
             except MCPConnectionError as e:
-                current_app.logger.error(f'MCP连接失败: {str(e)}')
                 return error_response(message=f'MCP连接失败: {str(e)}', code=503)
-
             except MCPTimeoutError as e:
-                current_app.logger.error(f'MCP连接超时: {str(e)}')
                 return error_response(message=f'MCP连接超时: {str(e)}', code=504)
-
             except MCPClientError as e:
-                current_app.logger.error(f'MCP客户端错误: {str(e)}')
                 return error_response(message=f'MCP客户端错误: {str(e)}', code=500)
 
-            try:
-                # 同步资源列表
-                resources = operations.list_resources()
-
-                # 删除旧的资源记录
-                MCPResource.query.filter_by(mcp_id=mcp_id).delete()
-
-                # 添加新的资源记录
-                for resource_data in resources:
-                    resource = MCPResource(
-                        mcp_id=mcp_id,
-                        uri=resource_data.get('uri', ''),
-                        name=resource_data.get('name', ''),
-                        description=resource_data.get('description', ''),
-                        mime_type=resource_data.get('mime_type', '')
-                    )
-                    db.session.add(resource)
-
-                result['resources_synced'] = len(resources)
-                result['resources'] = resources
-                mcp_server.resources_count = len(resources)
+            return success_response(data={
+                'tools': catalog['tools'],
+                'resources': catalog['resources'],
+                'resources_error': catalog['resources_error'],
+                'cached': catalog['cached'],
+                'fetched_at': datetime.utcfromtimestamp(catalog['fetched_at']).isoformat()
+            })
 
-            except Exception as e:
+        except Exception as e:
+            current_app.logger.error(f'获取MCP Server目录失败: {str(e)}\n{traceback.format_exc()}')
+            return error_response(message=f'获取目录失败: {str(e)}', code=500)
+
+
+@mcp_server_ns.route('/<int:mcp_id>/sync')
+class MCPServerSyncAPI(Resource):
+    """同步MCP Server工具和资源"""
+
+    def post(self, mcp_id):
+        """同步工具和资源列表到数据库"""
+        try:
+            mcp_server = MCPServer.query.filter_by(id=mcp_id, is_deleted=False).first()
+            if not mcp_server:
+                return error_response(message='MCP Server不存在', code=404)
+
+            if not mcp_server.is_enabled:
+                return error_response(message='MCP Server已禁用', code=400)
+
+            # 在同一会话上并发获取工具和资源（目录缓存未过期时直接使用，force=true 强制重新连接），按差异写入数据库
+            force = request.args.get('force', 'false').lower() == 'true'
+            sync_result = get_mcp_sync_service().sync([mcp_server], force=force)[0]
+            if not sync_result['success']:
+                return error_response(message=sync_result['error'], code=sync_result['code'])
+
+            if sync_result['resources_error']:
                 # 资源同步失败不影响工具同步
-                current_app.logger.warning(f'MCP资源同步失败: {str(e)}')
+                current_app.logger.warning(f'MCP资源同步失败: {sync_result["resources_error"]}')
 
-            # 更新同步时间
-            mcp_server.last_sync_at = datetime.utcnow()
-            mcp_server.status = 'active'
-            db.session.commit()
+            result = {
+                'tools_synced': sync_result['tools']['total'],
+                'resources_synced': sync_result['resources']['total'] if sync_result['resources'] else 0,
+                'tools': sync_result['tool_list'],
+                'resources': sync_result['resource_list'],
+                'cached': sync_result['cached'],
+                'changes': {
+                    'tools': sync_result['tools'],
+                    'resources': sync_result['resources']
+                }
+            }
 
             return success_response(data=result, message=f'同步成功: {result["tools_synced"]}个工具, {result["resources_synced"]}个资源')
 
@@ -464,6 +466,58 @@ class MCPServerSyncAPI(Resource):
             return error_response(message=f'同步失败: {str(e)}', code=500)
 
 
+@mcp_server_ns.route('/sync-all')
+class MCPServerSyncAllAPI(Resource):
+    """批量同步MCP Server工具和资源"""
+
+    def post(self):
+        """
+        并发同步多个MCP Server
+        请求体可选 {"ids": [1, 2]} 只同步指定服务器，不传则同步全部已启用的服务器；
+        {"force": true} 忽略目录缓存重新连接
+        """
+        try:
+            data = request.get_json(silent=True) or {}
+            ids = data.get('ids')
+            force = bool(data.get('force', False))
+
+            query = MCPServer.query.filter_by(is_deleted=False, is_enabled=True)
+            if ids is not None:
+                if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                    return error_response(message='ids必须是整数数组', code=400)
+                query = query.filter(MCPServer.id.in_(ids))
+            servers = query.order_by(MCPServer.id).all()
+
+            results = get_mcp_sync_service().sync(servers, force=force)
+            items = [{
+                'id': item['id'],
+                'name': item['name'],
+                'success': item['success'],
+                'error': item.get('error'),
+                'resources_error': item.get('resources_error'),
+                'cached': item.get('cached', False),
+                'tools': item.get('tools'),
+                'resources': item.get('resources')
+            } for item in results]
+
+            # 指定的服务器中不存在或未启用的
+            skipped = sorted(set(ids) - {server.id for server in servers}) if ids is not None else []
+            succeeded = sum(1 for item in items if item['success'])
+
+            return success_response(data={
+                'total': len(items),
+                'succeeded': succeeded,
+                'failed': len(items) - succeeded,
+                'skipped': skipped,
+                'items': items
+            }, message=f'同步完成: 成功{succeeded}个, 失败{len(items) - succeeded}个')
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'批量同步MCP Server失败: {str(e)}\n{traceback.format_exc()}')
+            return error_response(message=f'批量同步失败: {str(e)}', code=500)
+
+
 @mcp_server_ns.route('/<int:mcp_id>/tools/<tool_name>/invoke')
 class MCPServerToolInvokeAPI(Resource):
     """调用MCP Server工具"""
@@ -517,6 +571,95 @@ class MCPServerToolInvokeAPI(Resource):
             return error_response(message=f'调用工具失败: {str(e)}', code=500)
 
 
+@mcp_server_ns.route('/<int:mcp_id>/invoke-batch')
+class MCPServerToolInvokeBatchAPI(Resource):
+    """批量调用MCP Server工具"""
+
+    def post(self, mcp_id):
+        """
+        在同一会话上批量调用工具，结果按请求顺序返回
+        请求体: {"calls": [{"tool_name": "x", "params": {}, "timeout": 10}], "parallel": false}
+        """
+        try:
+            mcp_server = MCPServer.query.filter_by(id=mcp_id, is_deleted=False).first()
+            if not mcp_server:
+                return error_response(message='MCP Server不存在', code=404)
+
+            if not mcp_server.is_enabled:
+                return error_response(message='MCP Server已禁用', code=400)
+
+            data = request.get_json() or {}
+            calls = data.get('calls')
+            if not isinstance(calls, list) or not calls:
+                return error_response(message='calls不能为空', code=400)
+            max_calls = current_app.config.get('MCP_INVOKE_BATCH_MAX_CALLS', 100)
+            if len(calls) > max_calls:
+                return error_response(message=f'单次最多调用{max_calls}个工具', code=400)
+            for call in calls:
+                if not isinstance(call, dict) or not isinstance(call.get('tool_name'), str) or not call['tool_name']:
+                    return error_response(message='每个调用必须包含tool_name', code=400)
+                if call.get('params') is not None and not isinstance(call['params'], dict):
+                    return error_response(message='params必须是对象', code=400)
+                timeout = call.get('timeout')
+                if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+                    return error_response(message='timeout必须是正数', code=400)
+
+            operations = MCPOperations(mcp_server)
+
+            try:
+                started = time.monotonic()
+                results = operations.call_tools(
+                    calls,
+                    parallel=bool(data.get('parallel', False)),
+                    concurrency=current_app.config.get('MCP_INVOKE_BATCH_CONCURRENCY', 10)
+                )
+                elapsed = round(time.monotonic() - started, 3)
+
+            except MCPConnectionError as e:
+                mcp_server.status = 'error'
+                db.session.commit()
+                current_app.logger.error(f'MCP连接失败: {str(e)}')
+                return error_response(message=f'MCP连接失败: {str(e)}', code=503)
+
+            except MCPTimeoutError as e:
+                mcp_server.status = 'error'
+                db.session.commit()
+                current_app.logger.error(f'MCP连接超时: {str(e)}')
+                return error_response(message=f'MCP连接超时: {str(e)}', code=504)
+
+            except MCPClientError as e:
+                current_app.logger.error(f'MCP客户端错误: {str(e)}')
+                return error_response(message=f'MCP客户端错误: {str(e)}', code=500)
+
+            # 使用统计一次写入：服务器与各工具的调用次数按本批次累加
+            now = datetime.utcnow()
+            tool_counts = Counter(call['tool_name'] for call in calls)
+            mcp_server.usage_count = func.coalesce(MCPServer.usage_count, 0) + len(calls)
+            mcp_server.last_used_at = now
+            mcp_server.status = 'active'
+            db.session.execute(
+                update(MCPTool)
+                .where(MCPTool.mcp_id == mcp_id, MCPTool.name.in_(list(tool_counts)))
+                .values(usage_count=func.coalesce(MCPTool.usage_count, 0) + case(tool_counts, value=MCPTool.name, else_=0),
+                        last_used_at=now)
+            )
+            db.session.commit()
+
+            succeeded = sum(1 for result in results if result['success'])
+            return success_response(data={
+                'total': len(results),
+                'succeeded': succeeded,
+                'failed': len(results) - succeeded,
+                'elapsed': elapsed,
+                'results': results
+            }, message=f'调用完成: 成功{succeeded}个, 失败{len(results) - succeeded}个')
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'批量调用MCP工具失败: {str(e)}\n{traceback.format_exc()}')
+            return error_response(message=f'批量调用工具失败: {str(e)}', code=500)
+
+
 @mcp_server_ns.route('/<int:mcp_id>/resources')
 class MCPServerResourcesAPI(Resource):
     """获取MCP Server资源列表（从数据库读取）"""
@@ -622,6 +765,9 @@ class SkillListAPI(Resource):
                 is_enabled_bool = is_enabled.lower() == 'true'
                 query = query.filter_by(is_enabled=is_enabled_bool)
 
+            if is_cursor_request():
+                return cursor_page_response(query, Skill.id, per_page)
+
             pagination = query.order_by(Skill.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -3,8 +3,9 @@
 """
 from flask import request
 from flask_restx import Namespace, Resource, fields
+from sqlalchemy import func
 from app.utils.errors import success_response, error_response
-from app.models import Project, Tenant
+from app.models import Project, Tenant, ExecutionDailyStat
 from app import db
 from datetime import datetime
 import random
@@ -154,9 +155,6 @@ class ProjectDetailAPI(Resource):
             if not project:
                 return error_response(message='项目不存在', code=404)
 
-            # 更新统计信息
-            project.update_statistics()
-
             return success_response(data=project.to_dict())
         except Exception as e:
             return error_response(message=f'获取项目详情失败: {str(e)}')
@@ -251,45 +249,31 @@ class ProjectStatisticsAPI(Resource):
             if not project:
                 return error_response(message='项目不存在', code=404)
 
-            # 更新并获取统计信息
-            project.update_statistics()
-
-            from app.models import TestCase, TestSuite, TestPlan, Defect, TestExecution
-
-            # 获取详细统计
-            test_suites = TestSuite.query.filter_by(
-                project_id=project_id
-            ).count()
-
-            test_cases = TestCase.query.filter(
-                TestCase.is_deleted == False,
-                TestCase.suite_id.isnot(None)
-            ).join(TestSuite).filter(TestSuite.project_id == project_id).count()
-
-            test_plans = TestPlan.query.filter_by(project_id=project_id).count()
-
-            defects = Defect.query.filter_by(project_id=project_id).count()
-
-            # 获取最近的执行记录
-            recent_executions = TestExecution.query.join(TestCase).join(TestSuite).filter(
-                TestSuite.project_id == project_id
-            ).order_by(TestExecution.execution_time.desc()).limit(10).all()
-
-            # 获取通过的执行记录数
-            passed_executions = TestExecution.query.join(TestCase).join(TestSuite).filter(
-                TestSuite.project_id == project_id,
-                TestExecution.status == 'passed'
-            ).count()
-
-            return success_response(data={
+            # 计数由项目统计服务增量维护，直接读取项目行
+            data = {
                 'project': project.to_dict(),
-                'test_suites': test_suites,
-                'test_cases': test_cases,
-                'test_plans': test_plans,
-                'defects': defects,
-                'passed_executions': passed_executions,
-                'recent_executions': [e.to_dict() for e in recent_executions]
-            })
+                'test_suites': project.test_suite_count or 0,
+                'test_cases': project.test_case_count or 0,
+                'test_plans': project.test_plan_count or 0,
+                'defects': project.defect_count or 0,
+                # 通过的执行次数读取执行记录按日汇总
+                'passed_executions': int(db.session.query(
+                    func.coalesce(func.sum(ExecutionDailyStat.execution_count), 0)
+                ).filter(
+                    ExecutionDailyStat.project_id == project_id,
+                    ExecutionDailyStat.status == 'passed'
+                ).scalar())
+            }
+
+            # 最近的执行记录仅在 include_recent=true 时返回
+            if request.args.get('include_recent', 'false').lower() == 'true':
+                from app.models import TestExecution
+                recent_executions = TestExecution.query.filter(
+                    TestExecution.project_id == project_id
+                ).order_by(TestExecution.execution_time.desc()).limit(10).all()
+                data['recent_executions'] = [e.to_dict() for e in recent_executions]
+
+            return success_response(data=data)
         except Exception as e:
             return error_response(message=f'获取项目统计失败: {str(e)}')
 
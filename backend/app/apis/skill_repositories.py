@@ -5,7 +5,7 @@ from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from app import db
 from app.models import SkillRepository, GitCredential, GitSkill, SkillSyncLog
-from app.utils import success_response, error_response, encrypt_data
+from app.utils import success_response, error_response, is_cursor_request, cursor_page_response, encrypt_data
 from app.services.git_sync_service import get_git_sync_service
 import json
 from datetime import datetime
@@ -200,6 +200,9 @@ class SkillRepositoryListAPI(Resource):
                 is_enabled_bool = is_enabled.lower() == 'true'
                 query = query.filter_by(is_enabled=is_enabled_bool)
 
+            if is_cursor_request():
+                return cursor_page_response(query, SkillRepository.id, per_page)
+
             pagination = query.order_by(SkillRepository.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -270,6 +273,9 @@ class SkillRepositoryAPI(Resource):
 
             data = request.get_json()
 
+            # 仓库地址、分支或技能路径变化后，下次同步不能再基于上次的 commit 做增量
+            source = (repository.git_url, repository.branch, repository.skills_path)
+
             repository.name = data.get('name', repository.name)
             repository.description = data.get('description', repository.description)
             repository.git_url = data.get('git_url', repository.git_url)
@@ -282,6 +288,8 @@ class SkillRepositoryAPI(Resource):
             repository.webhook_secret = data.get('webhook_secret', repository.webhook_secret)
             repository.is_enabled = data.get('is_enabled', repository.is_enabled)
             repository.auto_sync = data.get('auto_sync', repository.auto_sync)
+            if (repository.git_url, repository.branch, repository.skills_path) != source:
+                repository.last_synced_commit = None
 
             db.session.commit()
             return success_response(data=repository.to_dict(), message='更新成功')
@@ -332,7 +340,9 @@ class SkillRepositorySyncAPI(Resource):
                 return error_response(message='仓库已禁用', code=400)
 
             sync_service = get_git_sync_service()
-            result = sync_service.sync(repo_id, sync_type='manual', triggered_by=request.args.get('user', 'system'))
+            # full=true 强制全量同步
+            result = sync_service.sync(repo_id, sync_type='manual', triggered_by=request.args.get('user', 'system'),
+                                       full=request.args.get('full', 'false').lower() == 'true')
 
             if result['success']:
                 return success_response(data=result, message='同步成功')
@@ -406,6 +416,10 @@ class SkillRepositoryWebhookAPI(Resource):
 
             # 检查是否是push事件
             if data.get('ref') and repository.branch in data.get('ref', ''):
+                # 推送后的 commit 已经同步过，无需再拉取
+                if data.get('after') and data['after'] == repository.last_synced_commit:
+                    return success_response(message='Webhook接收成功，该提交已同步')
+
                 sync_service = get_git_sync_service()
                 result = sync_service.sync(repo_id, sync_type='webhook', triggered_by='webhook')
 
@@ -455,6 +469,9 @@ class GitSkillListAPI(Resource):
                 is_enabled_bool = is_enabled.lower() == 'true'
                 query = query.filter_by(is_enabled=is_enabled_bool)
 
+            if is_cursor_request():
+                return cursor_page_response(query, GitSkill.id, per_page)
+
             pagination = query.order_by(GitSkill.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -5,7 +5,7 @@ from flask import request, current_app, g
 from flask_restx import Namespace, Resource, fields
 from app import db
 from app.models import Tenant, TenantUser, User
-from app.utils import success_response, error_response
+from app.utils import success_response, error_response, is_cursor_request, cursor_page_response
 from app.utils.permissions import (
     require_super_admin,
     require_tenant_admin,
@@ -77,31 +77,36 @@ class TenantListAPI(Resource):
                 query = query.filter(Tenant.name.contains(keyword) |
                                      Tenant.code.contains(keyword))
 
+            def serialize(tenants):
+                items = []
+                for item in tenants:
+                    item_dict = item.to_dict()
+                    # 添加当前用户在该租户中的角色
+                    if current_user.is_super_admin():
+                        item_dict['user_role'] = 'super_admin'
+                        item_dict['user_role_name'] = '超级管理员'
+                    else:
+                        tenant_user = TenantUser.query.filter_by(
+                            tenant_id=item.id,
+                            user_id=current_user.id,
+                            is_deleted=False
+                        ).first()
+                        if tenant_user:
+                            item_dict['user_role'] = tenant_user.role
+                            role_names = {'owner': '所有者', 'admin': '管理员', 'member': '成员'}
+                            item_dict['user_role_name'] = role_names.get(tenant_user.role, tenant_user.role)
+                    items.append(item_dict)
+                return items
+
+            if is_cursor_request():
+                return cursor_page_response(query, Tenant.id, per_page, serialize)
+
             pagination = query.order_by(Tenant.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
 
-            items = []
-            for item in pagination.items:
-                item_dict = item.to_dict()
-                # 添加当前用户在该租户中的角色
-                if current_user.is_super_admin():
-                    item_dict['user_role'] = 'super_admin'
-                    item_dict['user_role_name'] = '超级管理员'
-                else:
-                    tenant_user = TenantUser.query.filter_by(
-                        tenant_id=item.id,
-                        user_id=current_user.id,
-                        is_deleted=False
-                    ).first()
-                    if tenant_user:
-                        item_dict['user_role'] = tenant_user.role
-                        role_names = {'owner': '所有者', 'admin': '管理员', 'member': '成员'}
-                        item_dict['user_role_name'] = role_names.get(tenant_user.role, tenant_user.role)
-                items.append(item_dict)
-
             return success_response(data={
-                'items': items,
+                'items': serialize(pagination.items),
                 'total': pagination.total,
                 'pages': pagination.pages,
                 'current_page': page
@@ -5,8 +5,12 @@ from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from app import db
 from app.models import TestCase, TestSuite
-from app.utils import success_response, error_response
+from app.utils import success_response, error_response, is_cursor_request, cursor_page_response
+from app.services.search_service import get_search_service, DOC_TYPE_TEST_CASE
+from app.services.project_stats_service import get_project_stats_service
+from app.services.project_scope_service import get_project_scope_service
 import json
+from collections import defaultdict
 from datetime import datetime
 
 # 命名空间
@@ -43,6 +47,49 @@ test_case_model = test_case_ns.model('TestCase', {
 
 # ============== 测试套件API ==============
 
+def build_suite_tree(suites, case_counts, include_descendants=False):
+    """
+    构建套件树形结构（单次遍历）
+
+    先按 parent_id 建立索引，再自顶向下挂载子节点，整体为线性复杂度。
+    父套件不在列表中的节点与原有行为一致，不会出现在树中。
+
+    Args:
+        suites: 已按 sort_order 排序的套件列表
+        case_counts: {suite_id: 用例数量}
+        include_descendants: 是否额外返回包含所有子孙套件的用例总数(total_case_count)
+
+    Returns:
+        list: 树形结构的套件字典列表
+    """
+    children_index = defaultdict(list)
+    for suite in suites:
+        children_index[suite.parent_id].append(suite)
+
+    roots = []
+    # 按层级展开，记录访问顺序以便自底向上汇总
+    ordered_nodes = []
+    stack = [(suite, roots) for suite in reversed(children_index.get(None, []))]
+    while stack:
+        suite, siblings = stack.pop()
+        suite_dict = suite.to_dict()
+        suite_dict['children'] = []
+        suite_dict['case_count'] = case_counts.get(suite.id, 0)
+        siblings.append(suite_dict)
+        ordered_nodes.append(suite_dict)
+        for child in reversed(children_index.get(suite.id, [])):
+            stack.append((child, suite_dict['children']))
+
+    if include_descendants:
+        # 先序遍历的逆序保证子节点先于父节点完成汇总
+        for suite_dict in reversed(ordered_nodes):
+            suite_dict['total_case_count'] = suite_dict['case_count'] + sum(
+                child['total_case_count'] for child in suite_dict['children']
+            )
+
+    return roots
+
+
 @test_suite_ns.route('')
 class TestSuiteListAPI(Resource):
     """测试套件列表API"""
@@ -51,6 +98,7 @@ class TestSuiteListAPI(Resource):
         """获取所有测试套件(树形结构)"""
         try:
             project_id = request.args.get('project_id', type=int)
+            include_descendants = request.args.get('include_descendants', 'false').lower() == 'true'
 
             # 获取所有套件
             query = TestSuite.query
@@ -59,18 +107,10 @@ class TestSuiteListAPI(Resource):
 
             suites = query.order_by(TestSuite.sort_order).all()
 
-            # 构建树形结构
-            def build_tree(parent_id=None):
-                result = []
-                for suite in suites:
-                    if suite.parent_id == parent_id:
-                        suite_dict = suite.to_dict()
-                        suite_dict['children'] = build_tree(suite.id)
-                        suite_dict['case_count'] = suite.test_cases.count()
-                        result.append(suite_dict)
-                return result
-
-            return success_response(data=build_tree())
+            # 一次聚合查询获取所有套件的用例数
+            case_counts = TestSuite.get_case_count_map(project_id)
+
+            return success_response(data=build_suite_tree(suites, case_counts, include_descendants))
         except Exception as e:
             current_app.logger.error(f'获取测试套件失败: {str(e)}')
             return error_response(message=f'获取测试套件失败: {str(e)}', code=500)
@@ -91,6 +131,10 @@ class TestSuiteListAPI(Resource):
             )
 
             db.session.add(suite)
+            db.session.flush()  # 获取suite ID
+
+            # 计算物化路径
+            suite.refresh_path()
             db.session.commit()
 
             return success_response(data=suite.to_dict(), message='创建成功', code=201)
@@ -108,7 +152,12 @@ class TestSuiteAPI(Resource):
         """获取测试套件详情"""
         try:
             suite = TestSuite.query.get_or_404(suite_id)
-            return success_response(data=suite.to_dict())
+
+            suite_dict = suite.to_dict()
+            # 包含所有子孙套件的用例总数
+            suite_dict['total_case_count'] = suite.count_subtree_cases()
+
+            return success_response(data=suite_dict)
         except Exception as e:
             return error_response(message=f'获取测试套件失败: {str(e)}', code=500)
 
@@ -119,12 +168,27 @@ class TestSuiteAPI(Resource):
             suite = TestSuite.query.get_or_404(suite_id)
             data = request.get_json()
 
+            new_parent_id = data.get('parent_id', suite.parent_id)
+            parent_changed = new_parent_id != suite.parent_id
+
+            # 不能移动到自身或子孙套件下
+            if parent_changed and new_parent_id:
+                new_parent = TestSuite.query.get(new_parent_id)
+                if not new_parent:
+                    return error_response(message='父套件不存在', code=400)
+                if new_parent.is_descendant_of(suite):
+                    return error_response(message='不能将套件移动到自身或其子套件下', code=400)
+
             suite.name = data.get('name', suite.name)
             suite.description = data.get('description', suite.description)
-            suite.parent_id = data.get('parent_id', suite.parent_id)
+            suite.parent_id = new_parent_id
             suite.project_id = data.get('project_id', suite.project_id)
             suite.sort_order = data.get('sort_order', suite.sort_order)
 
+            # 父套件变化时同步更新整棵子树的物化路径
+            if parent_changed:
+                suite.refresh_path()
+
             db.session.commit()
             return success_response(data=suite.to_dict(), message='更新成功')
         except Exception as e:
@@ -169,32 +233,51 @@ class TestCaseListAPI(Resource):
             priority = request.args.get('priority')
             case_type = request.args.get('case_type')
             keyword = request.args.get('keyword')
+            include_descendants = request.args.get('include_descendants', 'false').lower() == 'true'
 
             query = TestCase.query.filter_by(is_deleted=False)
 
-            # 按项目过滤（需要join TestSuite）
+            # 按项目过滤（用例冗余了所在套件的项目）
             if project_id:
-                query = query.join(TestSuite).filter(TestSuite.project_id == project_id)
+                query = query.filter(TestCase.project_id == project_id)
 
             # 使用明确的字段名避免歧义
             if suite_id:
-                query = query.filter(TestCase.suite_id == suite_id)
+                if include_descendants:
+                    # 基于物化路径一次查出整棵子树下的用例
+                    query = query.filter(TestCase.suite_id.in_(TestSuite.subtree_ids_query(suite_id)))
+                else:
+                    query = query.filter(TestCase.suite_id == suite_id)
             if status:
                 query = query.filter(TestCase.status == status)
             if priority:
                 query = query.filter(TestCase.priority == priority)
             if case_type:
                 query = query.filter(TestCase.case_type == case_type)
+
+            search_service = get_search_service()
+            order_by = [TestCase.id.desc()]
             if keyword:
-                query = query.filter(TestCase.name.contains(keyword) |
-                                     TestCase.case_no.contains(keyword))
+                # 全文检索：匹配编号、名称、描述、步骤、标签等字段，按相关度排序
+                matched = search_service.match_subquery(DOC_TYPE_TEST_CASE, keyword)
+                query = query.join(matched, matched.c.doc_id == TestCase.id)
+                order_by.insert(0, matched.c.score.desc())
+
+            def serialize(cases):
+                return search_service.to_dicts_with_highlight(DOC_TYPE_TEST_CASE, cases, keyword)
+
+            if is_cursor_request():
+                # 游标分页固定按 id 排序，无法保持关键字检索的相关度排序
+                if keyword:
+                    return error_response(message='关键字检索按相关度排序，不支持游标分页', code=400)
+                return cursor_page_response(query, TestCase.id, per_page, serialize)
 
-            pagination = query.order_by(TestCase.id.desc()).paginate(
+            pagination = query.order_by(*order_by).paginate(
                 page=page, per_page=per_page, error_out=False
             )
 
             return success_response(data={
-                'items': [item.to_dict() for item in pagination.items],
+                'items': serialize(pagination.items),
                 'total': pagination.total,
                 'pages': pagination.pages,
                 'current_page': page
@@ -314,9 +397,14 @@ class TestCaseBatchDeleteAPI(Resource):
             if not case_ids:
                 return error_response(message='请选择要删除的用例', code=400)
 
+            # 批量更新不会触发ORM事件，需手动扣减项目用例数并移除检索文档
+            stats_service = get_project_stats_service()
+            live_counts = stats_service.count_live_cases(case_ids)
             TestCase.query.filter(TestCase.id.in_(case_ids)).update(
                 {'is_deleted': True}, synchronize_session=False
             )
+            stats_service.adjust('test_case_count', {project_id: -count for project_id, count in live_counts.items()})
+            get_search_service().remove_documents(DOC_TYPE_TEST_CASE, case_ids)
             db.session.commit()
 
             return success_response(message=f'成功删除 {len(case_ids)} 条用例')
@@ -339,9 +427,16 @@ class TestCaseBatchMoveAPI(Resource):
             if not case_ids:
                 return error_response(message='请选择要移动的用例', code=400)
 
+            # 批量更新不会触发ORM事件，需手动将用例数从原项目移到目标套件的项目
+            stats_service = get_project_stats_service()
+            deltas = {project_id: -count for project_id, count in stats_service.count_live_cases(case_ids).items()}
             TestCase.query.filter(TestCase.id.in_(case_ids)).update(
                 {'suite_id': target_suite_id}, synchronize_session=False
             )
+            get_project_scope_service().sync_cases(case_ids)
+            for project_id, count in stats_service.count_live_cases(case_ids).items():
+                deltas[project_id] = deltas.get(project_id, 0) + count
+            stats_service.adjust('test_case_count', deltas)
             db.session.commit()
 
             return success_response(message=f'成功移动 {len(case_ids)} 条用例')
@@ -5,7 +5,7 @@ from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from app import db
 from app.models import TestEnvironment, EnvironmentResource
-from app.utils import success_response, error_response
+from app.utils import success_response, error_response, is_cursor_request, cursor_page_response
 import json
 
 # 命名空间
@@ -72,6 +72,9 @@ class TestEnvironmentListAPI(Resource):
                 query = query.filter(TestEnvironment.name.contains(keyword) |
                                      TestEnvironment.env_code.contains(keyword))
 
+            if is_cursor_request():
+                return cursor_page_response(query, TestEnvironment.id, per_page)
+
             pagination = query.order_by(TestEnvironment.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -220,6 +223,9 @@ class EnvironmentResourceListAPI(Resource):
                 query = query.filter(EnvironmentResource.name.contains(keyword) |
                                      EnvironmentResource.host.contains(keyword))
 
+            if is_cursor_request():
+                return cursor_page_response(query, EnvironmentResource.id, per_page)
+
             pagination = query.order_by(EnvironmentResource.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
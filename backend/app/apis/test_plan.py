@@ -5,7 +5,7 @@ from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from app import db
 from app.models import TestPlan, TestPlanCase, TestExecution, TestCase, TestPlanFolder
-from app.utils import success_response, error_response
+from app.utils import success_response, error_response, is_cursor_request, cursor_page_response
 import json
 from datetime import datetime, date
 
@@ -82,11 +82,18 @@ class TestPlanListAPI(Resource):
                 query = query.filter(TestPlan.name.contains(keyword) |
                                      TestPlan.plan_no.contains(keyword))
 
+            def serialize(plans):
+                # 一次聚合查询获取本页所有计划的进度，避免逐条统计
+                progress_map = TestPlan.get_progress_map(plan.id for plan in plans)
+                return [plan.to_dict(progress_map=progress_map) for plan in plans]
+
+            if is_cursor_request():
+                return cursor_page_response(query, TestPlan.id, per_page, serialize)
+
             pagination = query.order_by(TestPlan.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
-
-            items = [item.to_dict() for item in pagination.items]
+            items = serialize(pagination.items)
 
             return success_response(data={
                 'items': items,
@@ -313,6 +320,7 @@ class TestExecutionListAPI(Resource):
             per_page = request.args.get('per_page', 20, type=int)
             test_plan_id = request.args.get('test_plan_id', type=int)
             test_case_id = request.args.get('test_case_id', type=int)
+            project_id = request.args.get('project_id', type=int)
             status = request.args.get('status')
 
             query = TestExecution.query
@@ -321,9 +329,14 @@ class TestExecutionListAPI(Resource):
                 query = query.filter_by(test_plan_id=test_plan_id)
             if test_case_id:
                 query = query.filter_by(test_case_id=test_case_id)
+            if project_id:
+                query = query.filter_by(project_id=project_id)
             if status:
                 query = query.filter_by(status=status)
 
+            if is_cursor_request():
+                return cursor_page_response(query, TestExecution.id, per_page)
+
             pagination = query.order_by(TestExecution.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -1,13 +1,21 @@
 """
 测试报告管理API
 """
-from flask import request, current_app
+from flask import request, current_app, send_file
 from flask_restx import Namespace, Resource, fields
 from app import db
-from app.models import TestReport, ReportMetric, TestExecution, Defect
-from app.utils import success_response, error_response
+from app.models import TestReport, ReportMetric, TestExecution, Defect, BackgroundJob
+from app.utils import success_response, error_response, is_cursor_request, cursor_page_response
+from app.utils.upsert import upsert
+from app.services.job_queue import get_job_queue
+from app.services.report_export_service import REPORT_EXPORT_JOB_TYPE, EXPORT_FORMATS, get_report_export_service
+from app.services.execution_stats_service import (
+    GRANULARITIES, MAX_TREND_PERIODS, get_execution_stats_service, period_start
+)
+import os
+import re
 import json
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from sqlalchemy import func
 
 # 命名空间
@@ -70,6 +78,9 @@ class TestReportListAPI(Resource):
             # 排除模板
             query = query.filter_by(is_template=False)
 
+            if is_cursor_request():
+                return cursor_page_response(query, TestReport.id, per_page)
+
             pagination = query.order_by(TestReport.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -128,33 +139,45 @@ class TestReportListAPI(Resource):
             return error_response(message=f'创建测试报告失败: {str(e)}', code=500)
 
 
-def generate_report_statistics(report, data):
-    """生成报告统计数据"""
+CASE_STATUS_FIELDS = {
+    'passed': 'passed_cases',
+    'failed': 'failed_cases',
+    'blocked': 'blocked_cases',
+    'skipped': 'skipped_cases',
+}
+
+DEFECT_SEVERITY_FIELDS = {
+    'critical': 'critical_defects',
+    'high': 'high_defects',
+    'medium': 'medium_defects',
+    'low': 'low_defects',
+}
+
+
+def generate_report_statistics(report, data=None):
+    """生成报告统计数据（按状态、严重程度分组计数，不加载计划用例与缺陷明细）"""
     try:
         # 基于测试计划生成统计
         if report.test_plan_id:
             from app.models import TestPlanCase
 
-            # 获取测试计划的所有用例
-            plan_cases = TestPlanCase.query.filter_by(test_plan_id=report.test_plan_id).all()
-
-            report.total_cases = len(plan_cases)
-            report.passed_cases = sum(1 for pc in plan_cases if pc.last_status == 'passed')
-            report.failed_cases = sum(1 for pc in plan_cases if pc.last_status == 'failed')
-            report.blocked_cases = sum(1 for pc in plan_cases if pc.last_status == 'blocked')
-            report.skipped_cases = sum(1 for pc in plan_cases if pc.last_status == 'skipped')
+            status_counts = dict(db.session.query(
+                TestPlanCase.last_status, func.count(TestPlanCase.id)
+            ).filter(TestPlanCase.test_plan_id == report.test_plan_id).group_by(TestPlanCase.last_status).all())
+            report.total_cases = sum(status_counts.values())
+            for status, field in CASE_STATUS_FIELDS.items():
+                setattr(report, field, status_counts.get(status, 0))
 
             # 计算通过率和执行率
             report.calculate_statistics()
 
             # 获取缺陷统计
-            defect_query = Defect.query.filter_by(test_plan_id=report.test_plan_id)
-            defects = defect_query.all()
-            report.total_defects = len(defects)
-            report.critical_defects = sum(1 for d in defects if d.severity == 'critical')
-            report.high_defects = sum(1 for d in defects if d.severity == 'high')
-            report.medium_defects = sum(1 for d in defects if d.severity == 'medium')
-            report.low_defects = sum(1 for d in defects if d.severity == 'low')
+            severity_counts = dict(db.session.query(
+                Defect.severity, func.count(Defect.id)
+            ).filter(Defect.test_plan_id == report.test_plan_id).group_by(Defect.severity).all())
+            report.total_defects = sum(severity_counts.values())
+            for severity, field in DEFECT_SEVERITY_FIELDS.items():
+                setattr(report, field, severity_counts.get(severity, 0))
 
         # 计算执行时长
         if report.start_time and report.end_time:
@@ -226,28 +249,144 @@ class TestReportAPI(Resource):
             return error_response(message=f'删除测试报告失败: {str(e)}', code=500)
 
 
+@test_report_ns.route('/<int:report_id>/regenerate')
+class TestReportRegenerateAPI(Resource):
+    """重新生成报告统计API"""
+
+    def post(self, report_id):
+        """按测试计划的当前数据重新生成报告统计"""
+        try:
+            report = TestReport.query.get_or_404(report_id)
+            if report.is_template:
+                return error_response(message='报告模板不支持生成统计', code=400)
+
+            report = generate_report_statistics(report)
+            db.session.commit()
+
+            return success_response(data=report.to_dict(), message='重新生成成功')
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'重新生成报告统计失败: {str(e)}')
+            return error_response(message=f'重新生成报告统计失败: {str(e)}', code=500)
+
+
+def _export_result(report_id, format_type, content_hash, **extra):
+    """导出结果，附带下载地址"""
+    return dict(
+        extra,
+        format=format_type,
+        content_hash=content_hash,
+        export_url=f'/test-reports/{report_id}/export/download?format={format_type}&hash={content_hash}'
+    )
+
+
+def _find_active_export_job(payload):
+    """查找参数相同、尚未结束的导出任务，避免重复提交"""
+    jobs = BackgroundJob.query.filter(
+        BackgroundJob.job_type == REPORT_EXPORT_JOB_TYPE,
+        BackgroundJob.status.in_(('pending', 'running'))
+    ).order_by(BackgroundJob.id).all()
+    return next((job for job in jobs if job.get_payload() == payload), None)
+
+
 @test_report_ns.route('/<int:report_id>/export')
 class TestReportExportAPI(Resource):
     """导出测试报告API"""
 
     def post(self, report_id):
-        """导出测试报告"""
+        """导出测试报告：报告内容未变化且已有导出文件时直接返回，否则提交后台导出任务"""
         try:
-            data = request.get_json()
+            data = request.get_json() or {}
             report = TestReport.query.get_or_404(report_id)
-            format_type = data.get('format', 'html')
+            format_type = (data.get('format') or 'html').lower()
+            refresh = bool(data.get('refresh', False))
+
+            if format_type not in EXPORT_FORMATS:
+                return error_response(message=f'不支持的导出格式: {format_type}', code=400)
+            service = get_report_export_service()
+            if format_type == 'pdf' and service.pdf_renderer() is None:
+                return error_response(message='当前环境未安装 PDF 渲染器（WeasyPrint 或 wkhtmltopdf）', code=400)
+
+            content_hash, path = service.find_artifact(report, format_type)
+            if path is not None and not refresh:
+                return success_response(
+                    data=_export_result(report_id, format_type, content_hash,
+                                        status='completed', cached=True, size=os.path.getsize(path)),
+                    message='报告内容未变化，直接返回已导出的文件'
+                )
 
-            # TODO: 实现报告导出功能
-            # 这里预留导出功能接口
+            payload = {'report_id': report_id, 'format': format_type, 'content_hash': content_hash, 'refresh': refresh}
+            job = _find_active_export_job(payload) or get_job_queue().submit(
+                REPORT_EXPORT_JOB_TYPE, payload=payload, created_by=data.get('created_by')
+            )
 
             return success_response(
-                data={'export_url': f'/exports/reports/{report_id}.{format_type}'},
+                data={'job_id': job.id, 'status': job.status, 'format': format_type, 'cached': False},
                 message=f'报告导出为 {format_type.upper()} 格式的任务已提交'
             )
         except Exception as e:
+            db.session.rollback()
             return error_response(message=f'导出报告失败: {str(e)}', code=500)
 
 
+@test_report_ns.route('/<int:report_id>/export/jobs/<int:job_id>')
+class TestReportExportJobAPI(Resource):
+    """报告导出任务API"""
+
+    def get(self, report_id, job_id):
+        """获取导出任务状态，完成后返回下载地址"""
+        try:
+            job = get_job_queue().get(job_id, REPORT_EXPORT_JOB_TYPE)
+            if job is None or job.get_payload().get('report_id') != report_id:
+                return error_response(message='导出任务不存在', code=404)
+
+            result = {
+                'job_id': job.id,
+                'status': job.status,
+                'error_message': job.error_message,
+                'finished': job.is_finished
+            }
+            state = job.get_state()
+            if job.status == 'completed' and state.get('content_hash'):
+                result = _export_result(report_id, state['format'], state['content_hash'],
+                                        size=state.get('size'), rows=state.get('rows'),
+                                        cached=state.get('cached', False), **result)
+            return success_response(data=result)
+        except Exception as e:
+            return error_response(message=f'获取导出任务失败: {str(e)}', code=500)
+
+
+@test_report_ns.route('/<int:report_id>/export/download')
+class TestReportExportDownloadAPI(Resource):
+    """下载导出文件API"""
+
+    @test_report_ns.param('format', '导出格式')
+    @test_report_ns.param('hash', '内容摘要，为空时下载与报告当前内容一致的文件')
+    def get(self, report_id):
+        """下载导出文件"""
+        try:
+            report = TestReport.query.get_or_404(report_id)
+            format_type = (request.args.get('format') or 'html').lower()
+            content_hash = request.args.get('hash')
+            if format_type not in EXPORT_FORMATS:
+                return error_response(message=f'不支持的导出格式: {format_type}', code=400)
+
+            service = get_report_export_service()
+            if content_hash:
+                if not re.fullmatch(r'[0-9a-f]{64}', content_hash):
+                    return error_response(message='内容摘要格式错误', code=400)
+                path = service.artifact_path(report_id, format_type, content_hash)
+            else:
+                _, path = service.find_artifact(report, format_type)
+            if path is None or not os.path.exists(path):
+                return error_response(message='导出文件不存在或已过期，请重新导出', code=404)
+
+            return send_file(path, mimetype=EXPORT_FORMATS[format_type], as_attachment=True,
+                             download_name=f'{report.report_no or report.id}.{format_type}')
+        except Exception as e:
+            return error_response(message=f'下载导出文件失败: {str(e)}', code=500)
+
+
 @test_report_ns.route('/templates')
 class TestReportTemplateListAPI(Resource):
     """报告模板列表API"""
@@ -293,6 +432,49 @@ class TestReportTemplateListAPI(Resource):
             return error_response(message=f'创建报告模板失败: {str(e)}', code=500)
 
 
+@test_report_ns.route('/trends')
+class TestReportTrendAPI(Resource):
+    """执行趋势API"""
+
+    @test_report_ns.param('project_id', '项目ID')
+    @test_report_ns.param('test_plan_id', '测试计划ID')
+    @test_report_ns.param('from', '开始日期(YYYY-MM-DD)，默认结束日期前29天')
+    @test_report_ns.param('to', '结束日期(YYYY-MM-DD)，默认今天(UTC)')
+    @test_report_ns.param('granularity', '统计周期: day, week, month')
+    def get(self):
+        """按周期统计执行次数、各状态次数、通过率与执行时长（读取按日汇总表）"""
+        try:
+            project_id = request.args.get('project_id', type=int)
+            test_plan_id = request.args.get('test_plan_id', type=int)
+            granularity = request.args.get('granularity', 'day')
+            if granularity not in GRANULARITIES:
+                return error_response(message=f'不支持的统计周期: {granularity}', code=400)
+
+            try:
+                date_to = date.fromisoformat(request.args['to']) if request.args.get('to') \
+                    else datetime.utcnow().date()
+                date_from = date.fromisoformat(request.args['from']) if request.args.get('from') \
+                    else date_to - timedelta(days=29)
+            except ValueError:
+                return error_response(message='日期格式错误，应为 YYYY-MM-DD', code=400)
+            if date_from > date_to:
+                return error_response(message='开始日期不能晚于结束日期', code=400)
+            periods = (period_start(date_to, granularity) - period_start(date_from, granularity)).days
+            if periods // {'day': 1, 'week': 7, 'month': 28}[granularity] >= MAX_TREND_PERIODS:
+                return error_response(message=f'统计周期数不能超过 {MAX_TREND_PERIODS}', code=400)
+
+            items = get_execution_stats_service().trends(date_from, date_to, granularity, project_id, test_plan_id)
+            return success_response(data={
+                'granularity': granularity,
+                'from': date_from.isoformat(),
+                'to': date_to.isoformat(),
+                'items': items
+            })
+        except Exception as e:
+            current_app.logger.error(f'获取执行趋势失败: {str(e)}')
+            return error_response(message=f'获取执行趋势失败: {str(e)}', code=500)
+
+
 # ============== 报告度量指标API ==============
 
 @report_metric_ns.route('')
@@ -322,6 +504,9 @@ class ReportMetricListAPI(Resource):
         try:
             data = request.get_json()
 
+            if ReportMetric.query.filter_by(report_id=data.get('report_id'), metric_key=data.get('metric_key')).first():
+                return error_response(message=f'指标键值已存在: {data.get("metric_key")}', code=400)
+
             metric = ReportMetric(
                 report_id=data.get('report_id'),
                 metric_name=data.get('metric_name'),
@@ -363,6 +548,11 @@ class ReportMetricAPI(Resource):
             metric = ReportMetric.query.get_or_404(metric_id)
             data = request.get_json()
 
+            metric_key = data.get('metric_key', metric.metric_key)
+            if metric_key != metric.metric_key and ReportMetric.query.filter_by(
+                    report_id=metric.report_id, metric_key=metric_key).first():
+                return error_response(message=f'指标键值已存在: {metric_key}', code=400)
+
             metric.metric_name = data.get('metric_name', metric.metric_name)
             metric.metric_key = data.get('metric_key', metric.metric_key)
             metric.metric_value = data.get('metric_value', metric.metric_value)
@@ -392,43 +582,86 @@ class ReportMetricAPI(Resource):
             return error_response(message=f'删除报告度量指标失败: {str(e)}', code=500)
 
 
+# 批量写入时，指标键已存在则覆盖的字段
+METRIC_UPDATE_FIELDS = ('metric_name', 'metric_value', 'metric_type', 'display_order', 'category',
+                        'description', 'trend_data')
+
+
 @report_metric_ns.route('/batch')
 class ReportMetricBatchAPI(Resource):
-    """批量创建报告度量指标API"""
+    """批量写入报告度量指标API"""
 
     def post(self):
-        """批量创建报告度量指标"""
+        """
+        批量写入报告度量指标：按 (report_id, metric_key) 新增或覆盖，一条语句写入整批。
+        默认只返回数量，return_items 为 true 时返回写入后的指标
+        """
         try:
-            data = request.get_json()
+            data = request.get_json() or {}
             metrics_data = data.get('metrics', [])
+            default_report_id = data.get('report_id')
 
-            if not metrics_data:
+            if not metrics_data or not isinstance(metrics_data, list):
                 return error_response(message='请提供度量指标数据', code=400)
 
-            created_metrics = []
-            for metric_data in metrics_data:
-                metric = ReportMetric(
-                    report_id=metric_data.get('report_id'),
-                    metric_name=metric_data.get('metric_name'),
-                    metric_key=metric_data.get('metric_key'),
-                    metric_value=metric_data.get('metric_value'),
-                    metric_type=metric_data.get('metric_type', 'string'),
-                    display_order=metric_data.get('display_order', 0),
-                    category=metric_data.get('category'),
-                    description=metric_data.get('description'),
-                    trend_data=json.dumps(metric_data.get('trend_data')) if metric_data.get('trend_data') else None
-                )
-                db.session.add(metric)
-                created_metrics.append(metric)
-
+            now = datetime.utcnow()
+            rows = {}
+            for index, metric_data in enumerate(metrics_data):
+                if not isinstance(metric_data, dict):
+                    return error_response(message=f'第 {index + 1} 条度量指标格式错误', code=400)
+                report_id = metric_data.get('report_id') or default_report_id
+                if not report_id or not metric_data.get('metric_name') or not metric_data.get('metric_key'):
+                    return error_response(message=f'第 {index + 1} 条度量指标缺少 report_id、metric_name 或 metric_key',
+                                          code=400)
+                # 客户端可能以字符串传入报告ID，统一转为整数，与数据库中的键类型一致
+                if not re.fullmatch(r'\d+', str(report_id).strip()):
+                    return error_response(message=f'第 {index + 1} 条度量指标的 report_id 必须为整数', code=400)
+                report_id = int(report_id)
+                metric_key = str(metric_data['metric_key'])
+                # 同一请求中重复的指标键以最后一条为准
+                rows[(report_id, metric_key)] = {
+                    'report_id': report_id,
+                    'metric_name': metric_data.get('metric_name'),
+                    'metric_key': metric_key,
+                    'metric_value': metric_data.get('metric_value'),
+                    'metric_type': metric_data.get('metric_type', 'string'),
+                    'display_order': metric_data.get('display_order', 0),
+                    'category': metric_data.get('category'),
+                    'description': metric_data.get('description'),
+                    'trend_data': json.dumps(metric_data.get('trend_data')) if metric_data.get('trend_data') else None,
+                    'created_at': now
+                }
+
+            report_ids = {report_id for report_id, _ in rows}
+            found_ids = {row[0] for row in db.session.query(TestReport.id).filter(TestReport.id.in_(report_ids)).all()}
+            if report_ids - found_ids:
+                return error_response(message=f'报告不存在: {sorted(report_ids - found_ids)}', code=404)
+
+            # 已存在的指标键（用于区分新增与覆盖的数量）
+            metric_keys = {metric_key for _, metric_key in rows}
+            existing = set(db.session.query(ReportMetric.report_id, ReportMetric.metric_key).filter(
+                ReportMetric.report_id.in_(report_ids),
+                ReportMetric.metric_key.in_(metric_keys)
+            ).all()) & set(rows)
+
+            upsert(db.session, ReportMetric.__table__, list(rows.values()),
+                   key_columns=('report_id', 'metric_key'), update_columns=METRIC_UPDATE_FIELDS)
             db.session.commit()
 
+            result = {'total': len(rows), 'created': len(rows) - len(existing), 'updated': len(existing)}
+            if data.get('return_items'):
+                metrics = ReportMetric.query.filter(
+                    ReportMetric.report_id.in_(report_ids),
+                    ReportMetric.metric_key.in_(metric_keys)
+                ).order_by(ReportMetric.report_id, ReportMetric.display_order, ReportMetric.id).all()
+                result['items'] = [m.to_dict() for m in metrics if (m.report_id, m.metric_key) in rows]
+
             return success_response(
-                data=[m.to_dict() for m in created_metrics],
-                message=f'成功创建 {len(created_metrics)} 条度量指标',
+                data=result,
+                message=f'成功写入 {len(rows)} 条度量指标（新增 {result["created"]}，更新 {result["updated"]}）',
                 code=201
             )
         except Exception as e:
             db.session.rollback()
-            current_app.logger.error(f'批量创建报告度量指标失败: {str(e)}')
-            return error_response(message=f'批量创建报告度量指标失败: {str(e)}', code=500)
+            current_app.logger.error(f'批量写入报告度量指标失败: {str(e)}')
+            return error_response(message=f'批量写入报告度量指标失败: {str(e)}', code=500)
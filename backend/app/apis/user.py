@@ -5,6 +5,7 @@ from flask import request, g
 from flask_restx import Namespace, Resource, fields
 from app.models import User, Tenant, TenantUser
 from app.utils.errors import success_response, error_response
+from app.utils.pagination import is_cursor_request, cursor_page_response
 from datetime import datetime
 from app import db
 
@@ -76,6 +77,9 @@ class UserListAPI(Resource):
                 query = query.filter(User.status == status)
 
             # 分页
+            if is_cursor_request():
+                return cursor_page_response(query, User.id, per_page)
+
             pagination = query.order_by(User.id.desc()).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -0,0 +1,54 @@
+"""
+命令行工具
+通过 flask <group> <command> 调用，如 flask search-index rebuild
+"""
+import click
+from flask.cli import AppGroup
+
+
+search_index_cli = AppGroup('search-index', help='全文检索索引管理')
+
+
+@search_index_cli.command('rebuild')
+@click.option('--doc-type', type=click.Choice(['test_case', 'defect']), default=None,
+              help='仅重建指定类型，默认全部')
+def rebuild_search_index(doc_type):
+    """全量重建全文检索文档"""
+    from app.services.search_service import get_search_service
+
+    counts = get_search_service().rebuild(doc_type)
+    for current_type, count in counts.items():
+        click.echo(f'{current_type}: {count} 条文档已重建')
+
+
+execution_stats_cli = AppGroup('execution-stats', help='执行记录按日汇总管理')
+
+
+@execution_stats_cli.command('rebuild')
+@click.option('--project-id', type=int, default=None, help='仅重建指定项目，默认全部')
+def rebuild_execution_stats(project_id):
+    """从执行记录全量重建按日汇总"""
+    from app.services.execution_stats_service import get_execution_stats_service
+
+    count = get_execution_stats_service().rebuild(project_id)
+    click.echo(f'执行汇总已重建: {count} 行')
+
+
+project_stats_cli = AppGroup('project-stats', help='项目统计计数管理')
+
+
+@project_stats_cli.command('reconcile')
+@click.option('--project-id', type=int, default=None, help='仅校正指定项目，默认全部')
+def reconcile_project_stats(project_id):
+    """按实际数据校正项目统计计数"""
+    from app.services.project_stats_service import get_project_stats_service
+
+    count = get_project_stats_service().reconcile(project_id)
+    click.echo(f'项目统计计数已校正: {count} 个项目')
+
+
+def register_commands(app):
+    """注册命令行工具"""
+    app.cli.add_command(search_index_cli)
+    app.cli.add_command(execution_stats_cli)
+    app.cli.add_command(project_stats_cli)
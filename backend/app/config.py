@@ -61,11 +61,80 @@ class Config:
     # Git技能仓库配置
     # Git 仓库存储目录，可通过 .env 配置 GIT_REPOS_DIR
     GIT_REPOS_DIR = os.getenv('GIT_REPOS_DIR', os.path.join(os.path.dirname(__file__), 'git_repos'))
+    # 同步时解析技能目录的子进程数量，0 或 1 表示在当前进程串行解析
+    SKILL_PARSE_WORKERS = int(os.getenv('SKILL_PARSE_WORKERS', str(min(4, os.cpu_count() or 1))))
+    # 技能目录数达到该值才使用进程池并行解析
+    SKILL_PARSE_PARALLEL_THRESHOLD = int(os.getenv('SKILL_PARSE_PARALLEL_THRESHOLD', '100'))
     # 加密密钥，用于加密 Git 凭证
     ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY')
     # 加密密钥种子（用于派生密钥）
     ENCRYPTION_KEY_SEED = os.getenv('ENCRYPTION_KEY_SEED', 'default-seed-change-in-production')
 
+    # 后台任务队列配置
+    # 每个进程的任务工作线程数
+    JOB_WORKER_COUNT = int(os.getenv('JOB_WORKER_COUNT', '4'))
+    # 调度线程轮询待执行任务的间隔（秒）
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+    # 运行中任务心跳超时时间（秒），超时视为所在进程已退出
+    JOB_STALE_TIMEOUT = int(os.getenv('JOB_STALE_TIMEOUT', '120'))
+    # 已结束任务的增量事件保留天数，0 表示不清理
+    JOB_EVENT_RETENTION_DAYS = int(os.getenv('JOB_EVENT_RETENTION_DAYS', '7'))
+
+    # AI执行并发配置
+    # 未指定环境或环境未登记资源时的默认并发数
+    AI_EXECUTION_DEFAULT_CONCURRENCY = int(os.getenv('AI_EXECUTION_DEFAULT_CONCURRENCY', '4'))
+    # 单个环境的并发上限
+    AI_EXECUTION_MAX_CONCURRENCY = int(os.getenv('AI_EXECUTION_MAX_CONCURRENCY', '16'))
+
+    # 执行结果批量写入配置
+    # 缓冲的执行记录达到该数量时写入
+    EXECUTION_RESULT_BATCH_SIZE = int(os.getenv('EXECUTION_RESULT_BATCH_SIZE', '100'))
+    # 距上次写入超过该秒数时写入
+    EXECUTION_RESULT_FLUSH_INTERVAL = float(os.getenv('EXECUTION_RESULT_FLUSH_INTERVAL', '2'))
+    # 写入失败后的最大重试次数，仍失败时执行任务标记为失败
+    EXECUTION_RESULT_MAX_RETRIES = int(os.getenv('EXECUTION_RESULT_MAX_RETRIES', '3'))
+
+    # 执行状态推送配置
+    # 长轮询没有新事件时的最长等待时间（秒），需小于反向代理的读超时
+    EXECUTION_EVENTS_LONG_POLL_TIMEOUT = float(os.getenv('EXECUTION_EVENTS_LONG_POLL_TIMEOUT', '25'))
+    # 长轮询/SSE 检查新事件的间隔（秒）
+    EXECUTION_EVENTS_POLL_INTERVAL = float(os.getenv('EXECUTION_EVENTS_POLL_INTERVAL', '0.5'))
+    # SSE 心跳间隔（秒）
+    EXECUTION_STREAM_HEARTBEAT_INTERVAL = int(os.getenv('EXECUTION_STREAM_HEARTBEAT_INTERVAL', '15'))
+    # 单个 SSE 连接的最长时间（秒），到期后由客户端自动重连
+    EXECUTION_STREAM_MAX_DURATION = int(os.getenv('EXECUTION_STREAM_MAX_DURATION', '300'))
+
+    # 执行日志配置
+    # 完整执行日志的存储目录（gzip压缩），多实例部署时应使用共享存储
+    EXECUTION_LOG_DIR = os.getenv('EXECUTION_LOG_DIR', os.path.join(os.path.dirname(__file__), 'execution_logs'))
+    # 执行状态中每个用例保留的最近日志条数
+    EXECUTION_LOG_RING_SIZE = int(os.getenv('EXECUTION_LOG_RING_SIZE', '50'))
+    # 缓冲的日志达到该行数时落盘
+    EXECUTION_LOG_FLUSH_LINES = int(os.getenv('EXECUTION_LOG_FLUSH_LINES', '100'))
+
+    # 报告导出配置
+    # 导出文件存储目录，按报告ID与内容摘要缓存，多实例部署时应使用共享存储
+    REPORT_EXPORT_DIR = os.getenv('REPORT_EXPORT_DIR', os.path.join(os.path.dirname(__file__), 'report_exports'))
+    # 导出时从数据库流式读取用例、缺陷的每批行数
+    REPORT_EXPORT_BATCH_SIZE = int(os.getenv('REPORT_EXPORT_BATCH_SIZE', '1000'))
+
+    # 项目统计计数配置
+    # 定期按实际数据校正项目计数的间隔（秒），0 表示不定期校正
+    PROJECT_STATS_RECONCILE_INTERVAL = int(os.getenv('PROJECT_STATS_RECONCILE_INTERVAL', '3600'))
+
+    # MCP 会话池配置
+    # 常驻会话空闲超过该秒数后关闭（stdio 进程随之退出）
+    MCP_SESSION_IDLE_TIMEOUT = int(os.getenv('MCP_SESSION_IDLE_TIMEOUT', '300'))
+    # 会话空闲超过该秒数时，复用前先做健康检查
+    MCP_SESSION_HEALTH_CHECK_INTERVAL = int(os.getenv('MCP_SESSION_HEALTH_CHECK_INTERVAL', '60'))
+    # 批量同步时同时连接的 MCP Server 数量上限
+    MCP_SYNC_CONCURRENCY = int(os.getenv('MCP_SYNC_CONCURRENCY', '8'))
+    # 工具/资源目录缓存有效期（秒），0 表示不缓存
+    MCP_CATALOG_CACHE_TTL = int(os.getenv('MCP_CATALOG_CACHE_TTL', '300'))
+    # 批量调用工具时单次请求的最大调用数与并发执行的最大并发数
+    MCP_INVOKE_BATCH_MAX_CALLS = int(os.getenv('MCP_INVOKE_BATCH_MAX_CALLS', '100'))
+    MCP_INVOKE_BATCH_CONCURRENCY = int(os.getenv('MCP_INVOKE_BATCH_CONCURRENCY', '10'))
+
     # Session配置
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
 
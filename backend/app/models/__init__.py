@@ -6,25 +6,29 @@ from .user import User
 from .project import Project
 from .test_case import TestCase, TestSuite
 from .test_plan import TestPlan, TestPlanCase, TestExecution, TestPlanFolder
-from .test_env import TestEnvironment, EnvironmentResource
+from .test_env import TestEnvironment, EnvironmentResource, EnvironmentSlot, EnvironmentSlotLease
 from .defect import Defect, DefectWorkflow, DefectComment, DefectModule
-from .test_report import TestReport, ReportMetric
+from .test_report import TestReport, ReportMetric, ExecutionDailyStat
 from .mcp_tool import MCPServer, MCPTool, MCPResource, MCPToolExecution
 from .skill import Skill
 from .skill_repository import GitCredential, SkillRepository, GitSkill, SkillSyncLog
 from .llm_model import LLMModel
 from .menu import Menu, Role, RoleMenu, UserRole
+from .search_document import SearchDocument
+from .background_job import BackgroundJob, BackgroundJobEvent
 
 __all__ = [
     'Tenant', 'TenantUser', 'User',
     'Project',
     'TestCase', 'TestSuite',
     'TestPlan', 'TestPlanCase', 'TestExecution', 'TestPlanFolder',
-    'TestEnvironment', 'EnvironmentResource',
+    'TestEnvironment', 'EnvironmentResource', 'EnvironmentSlot', 'EnvironmentSlotLease',
     'Defect', 'DefectWorkflow', 'DefectComment', 'DefectModule',
-    'TestReport', 'ReportMetric',
+    'TestReport', 'ReportMetric', 'ExecutionDailyStat',
     'MCPServer', 'MCPTool', 'MCPResource', 'MCPToolExecution', 'Skill',
     'GitCredential', 'SkillRepository', 'GitSkill', 'SkillSyncLog',
     'LLMModel',
-    'Menu', 'Role', 'RoleMenu', 'UserRole'
+    'Menu', 'Role', 'RoleMenu', 'UserRole',
+    'SearchDocument',
+    'BackgroundJob', 'BackgroundJobEvent'
 ]
@@ -0,0 +1,97 @@
+"""
+后台任务模型 - 持久化的任务队列
+"""
+from datetime import datetime
+from sqlalchemy.dialects import mysql
+from app import db
+import json
+
+
+class BackgroundJob(db.Model):
+    """后台任务模型"""
+    __tablename__ = 'background_jobs'
+
+    id = db.Column(db.Integer, primary_key=True, comment='主键ID')
+    job_type = db.Column(db.String(50), nullable=False, index=True, comment='任务类型，如 ai_execution')
+    status = db.Column(db.String(20), default='pending', index=True,
+                       comment='状态: pending, running, completed, failed, stopped')
+
+    # 任务数据
+    payload = db.Column(db.Text, comment='任务参数(JSON)')
+    state = db.Column(db.Text().with_variant(mysql.LONGTEXT(), 'mysql'), comment='任务运行状态(JSON)，由任务处理函数维护')
+    progress = db.Column(db.Integer, default=0, comment='进度(0-100)')
+    error_message = db.Column(db.Text, comment='错误信息')
+
+    # 调度控制
+    cancel_requested = db.Column(db.Boolean, default=False, comment='是否已请求取消')
+    attempts = db.Column(db.Integer, default=0, comment='已执行次数')
+    max_attempts = db.Column(db.Integer, default=1, comment='最大执行次数，工作进程退出后据此决定是否重新排队')
+    worker_id = db.Column(db.String(100), comment='执行该任务的工作进程标识')
+    heartbeat_at = db.Column(db.DateTime, comment='最后心跳时间')
+
+    # 时间戳
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    started_at = db.Column(db.DateTime, comment='开始时间')
+    finished_at = db.Column(db.DateTime, comment='结束时间')
+    created_by = db.Column(db.String(100), comment='创建人')
+
+    # 终态
+    FINISHED_STATUSES = ('completed', 'failed', 'stopped')
+
+    def get_payload(self):
+        """获取任务参数"""
+        return json.loads(self.payload) if self.payload else {}
+
+    def get_state(self):
+        """获取任务运行状态"""
+        return json.loads(self.state) if self.state else {}
+
+    @property
+    def is_finished(self):
+        """是否已结束"""
+        return self.status in self.FINISHED_STATUSES
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'payload': self.get_payload(),
+            'state': self.get_state(),
+            'progress': self.progress,
+            'error_message': self.error_message,
+            'cancel_requested': self.cancel_requested,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'worker_id': self.worker_id,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_by': self.created_by
+        }
+
+
+class BackgroundJobEvent(db.Model):
+    """后台任务增量事件，自增ID即事件序号，供状态订阅方按 since 拉取增量"""
+    __tablename__ = 'background_job_events'
+    __table_args__ = (
+        db.Index('ix_background_job_events_job_id_id', 'job_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, comment='主键ID（事件序号）')
+    job_id = db.Column(db.Integer, db.ForeignKey('background_jobs.id', ondelete='CASCADE'), nullable=False,
+                       comment='后台任务ID')
+    event_type = db.Column(db.String(50), nullable=False, comment='事件类型，如 case_status, log')
+    data = db.Column(db.Text, comment='事件数据(JSON)')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'seq': self.id,
+            'type': self.event_type,
+            'data': json.loads(self.data) if self.data else {},
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
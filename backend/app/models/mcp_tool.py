@@ -29,6 +29,7 @@ class MCPServer(db.Model):
 
     # 超时配置
     timeout = db.Column(db.Integer, default=30, comment='超时时间（秒）')
+    session_pool_size = db.Column(db.Integer, default=1, comment='常驻会话数上限，会话繁忙时按需扩容至该数量')
 
     # 状态管理
     status = db.Column(db.String(20), default='active', comment='状态: active, inactive, error')
@@ -76,6 +77,7 @@ class MCPServer(db.Model):
             'env': self.env,
             'url': self.url,
             'timeout': self.timeout,
+            'session_pool_size': self.session_pool_size,
             'status': self.status,
             'is_enabled': self.is_enabled,
             'is_builtin': self.is_builtin,
@@ -104,6 +106,7 @@ class MCPTool(db.Model):
     name = db.Column(db.String(200), nullable=False, comment='工具名称')
     description = db.Column(db.Text, comment='工具描述')
     input_schema = db.Column(db.Text, comment='JSON格式的输入schema')
+    schema_hash = db.Column(db.String(64), comment='输入schema摘要(SHA-256)，同步时据此判断是否需要改写')
 
     # 统计
     usage_count = db.Column(db.Integer, default=0, comment='使用次数')
@@ -85,24 +85,8 @@ class Project(db.Model):
         }
 
     def update_statistics(self):
-        """更新项目统计信息"""
-        from app.models import TestCase, TestSuite, TestPlan, Defect
+        """按实际数据校正项目统计信息（计数平时由项目统计服务增量维护）"""
+        from app.services.project_stats_service import get_project_stats_service
 
-        self.test_suite_count = TestSuite.query.filter_by(
-            project_id=self.id
-        ).count()
-
-        self.test_case_count = TestCase.query.filter(
-            TestCase.is_deleted == False,
-            TestCase.suite_id.isnot(None)
-        ).join(TestSuite).filter(TestSuite.project_id == self.id).count()
-
-        self.test_plan_count = TestPlan.query.filter_by(
-            project_id=self.id
-        ).count()
-
-        self.defect_count = Defect.query.filter_by(
-            project_id=self.id
-        ).count()
-
-        db.session.commit()
+        get_project_stats_service().reconcile(self.id)
+        db.session.refresh(self)
@@ -0,0 +1,30 @@
+"""
+全文检索文档模型
+"""
+from datetime import datetime
+from app import db
+
+
+class SearchDocument(db.Model):
+    """全文检索文档模型 - 测试用例、缺陷等业务数据的检索副本"""
+    __tablename__ = 'search_documents'
+
+    id = db.Column(db.Integer, primary_key=True, comment='主键ID')
+    doc_type = db.Column(db.String(50), nullable=False, comment='文档类型: test_case, defect')
+    doc_id = db.Column(db.Integer, nullable=False, comment='业务数据ID')
+    title = db.Column(db.String(500), comment='标题（编号 + 名称）')
+    content = db.Column(db.Text, comment='正文（描述、步骤、标签等拼接后的纯文本）')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    __table_args__ = (db.UniqueConstraint('doc_type', 'doc_id', name='uq_search_documents_doc'),)
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'doc_type': self.doc_type,
+            'doc_id': self.doc_id,
+            'title': self.title,
+            'content': self.content,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
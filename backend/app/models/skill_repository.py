@@ -88,6 +88,7 @@ class SkillRepository(db.Model):
     last_sync_status = db.Column(db.String(20), comment='最后同步状态: success, error')
     last_sync_message = db.Column(db.Text, comment='最后同步消息')
     skills_count = db.Column(db.Integer, default=0, comment='技能数量')
+    last_synced_commit = db.Column(db.String(64), comment='最后一次成功同步的commit，增量同步的比较基准')
 
     # 配置选项
     is_enabled = db.Column(db.Boolean, default=True, comment='是否启用')
@@ -120,6 +121,7 @@ class SkillRepository(db.Model):
             'last_sync_status': self.last_sync_status,
             'last_sync_message': self.last_sync_message,
             'skills_count': self.skills_count,
+            'last_synced_commit': self.last_synced_commit,
             'is_enabled': self.is_enabled,
             'auto_sync': self.auto_sync,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -157,6 +159,7 @@ class GitSkill(db.Model):
 
     # 文件信息
     file_path = db.Column(db.String(500), comment='文件在仓库中的路径')
+    content_hash = db.Column(db.String(64), comment='技能内容摘要(SHA-256)，同步时据此跳过未变化的技能')
 
     # 统计数据
     usage_count = db.Column(db.Integer, default=0, comment='使用次数')
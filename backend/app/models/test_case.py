@@ -2,6 +2,7 @@
 测试用例模型
 """
 from datetime import datetime
+from sqlalchemy import func, literal
 from app import db
 
 
@@ -14,6 +15,7 @@ class TestSuite(db.Model):
     name = db.Column(db.String(200), nullable=False, comment='测试套件名称')
     description = db.Column(db.Text, comment='描述')
     parent_id = db.Column(db.Integer, db.ForeignKey('test_suites.id'), nullable=True, comment='父级套件ID')
+    path = db.Column(db.String(500), nullable=True, index=True, comment='物化路径，如 /1/5/12/')
     project_id = db.Column(db.Integer, nullable=True, index=True, comment='所属项目ID')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
@@ -27,6 +29,91 @@ class TestSuite(db.Model):
     test_cases = db.relationship('TestCase', backref='suite', lazy='dynamic',
                                  cascade='all, delete-orphan')
 
+    @classmethod
+    def get_case_count_map(cls, project_id=None):
+        """
+        批量获取套件的用例数量
+
+        通过一次 GROUP BY suite_id 聚合查询得到所有套件的用例数
+
+        Args:
+            project_id: 项目ID，为空时统计全部套件
+
+        Returns:
+            dict: {suite_id: 用例数量}
+        """
+        query = db.session.query(
+            TestCase.suite_id,
+            func.count(TestCase.id)
+        ).filter(TestCase.suite_id.isnot(None))
+
+        if project_id:
+            query = query.filter(TestCase.project_id == project_id)
+
+        return dict(query.group_by(TestCase.suite_id).all())
+
+    def build_path(self):
+        """
+        根据父套件计算物化路径（需已分配ID）
+
+        Returns:
+            str: 物化路径，如 /1/5/12/
+        """
+        parent = TestSuite.query.get(self.parent_id) if self.parent_id else None
+        if parent is None:
+            return f'/{self.id}/'
+        return f'{parent.path or parent.build_path()}{self.id}/'
+
+    def refresh_path(self):
+        """
+        重新计算本套件的物化路径，并用一条 UPDATE 同步替换所有子孙套件的路径前缀
+
+        在创建套件（flush 获得ID后）或修改 parent_id 后调用
+        """
+        old_path = self.path
+        new_path = self.build_path()
+        if old_path == new_path:
+            return
+
+        self.path = new_path
+        if old_path:
+            TestSuite.query.filter(
+                TestSuite.path.like(f'{old_path}%'),
+                TestSuite.id != self.id
+            ).update(
+                {TestSuite.path: literal(new_path, db.String) + func.substr(TestSuite.path, len(old_path) + 1, type_=db.String)},
+                synchronize_session=False
+            )
+
+    def is_descendant_of(self, suite):
+        """判断本套件是否为指定套件本身或其子孙套件"""
+        if self.path and suite.path:
+            return self.path.startswith(suite.path)
+        return self.id == suite.id
+
+    @classmethod
+    def subtree_ids_query(cls, suite_id):
+        """
+        获取套件及其所有子孙套件ID的查询（基于物化路径前缀，可走索引）
+
+        Args:
+            suite_id: 套件ID
+
+        Returns:
+            Query: 返回套件ID列的查询，可直接用于 in_() 子查询
+        """
+        suite = cls.query.get(suite_id)
+        if suite is None or not suite.path:
+            return db.session.query(cls.id).filter(cls.id == suite_id)
+        return db.session.query(cls.id).filter(cls.path.like(f'{suite.path}%'))
+
+    def count_subtree_cases(self):
+        """统计本套件及所有子孙套件下的未删除用例数"""
+        return TestCase.query.filter(
+            TestCase.is_deleted == False,
+            TestCase.suite_id.in_(TestSuite.subtree_ids_query(self.id))
+        ).count()
+
     def to_dict(self):
         """转换为字典"""
         return {
@@ -35,6 +122,7 @@ class TestSuite(db.Model):
             'name': self.name,
             'description': self.description,
             'parent_id': self.parent_id,
+            'path': self.path,
             'project_id': self.project_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
@@ -52,6 +140,7 @@ class TestCase(db.Model):
     name = db.Column(db.String(200), nullable=False, comment='用例名称')
     case_no = db.Column(db.String(50), nullable=True, unique=True, comment='用例编号')
     suite_id = db.Column(db.Integer, db.ForeignKey('test_suites.id'), nullable=True, comment='所属测试套件ID')
+    project_id = db.Column(db.Integer, nullable=True, comment='所属项目ID（冗余自所在套件，由 ORM 事件维护）')
     description = db.Column(db.Text, comment='用例描述')
     preconditions = db.Column(db.Text, comment='前置条件')
     steps = db.Column(db.Text, comment='测试步骤(JSON格式)')
@@ -76,6 +165,11 @@ class TestCase(db.Model):
     tenant = db.relationship('Tenant', backref='test_cases')
     executions = db.relationship('TestExecution', backref='test_case', lazy='dynamic')
 
+    __table_args__ = (
+        # 按项目查询未删除的用例并按ID倒序分页
+        db.Index('ix_test_cases_project_deleted_id', 'project_id', 'is_deleted', 'id'),
+    )
+
     def to_dict(self):
         """转换为字典"""
         return {
@@ -84,6 +178,7 @@ class TestCase(db.Model):
             'name': self.name,
             'case_no': self.case_no,
             'suite_id': self.suite_id,
+            'project_id': self.project_id,
             'description': self.description,
             'preconditions': self.preconditions,
             'steps': self.steps,
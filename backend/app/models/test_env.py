@@ -28,6 +28,24 @@ class TestEnvironment(db.Model):
     resources = db.relationship('EnvironmentResource', backref='environment', lazy='dynamic',
                                cascade='all, delete-orphan')
 
+    @property
+    def is_available(self):
+        """环境是否可用于执行测试"""
+        return bool(self.is_active) and self.status == 'active'
+
+    def get_execution_capacity(self):
+        """
+        计算环境可同时执行的用例数
+
+        Returns:
+            int: 激活且在线资源的CPU核心数之和（未填写核心数的资源按 1 计）；
+                 未登记任何资源时返回 None，由调用方使用默认并发数
+        """
+        resources = self.resources.filter_by(is_active=True).all()
+        if not resources:
+            return None
+        return sum(max(resource.cpu_cores or 1, 1) for resource in resources if resource.status == 'online')
+
     def to_dict(self):
         """转换为字典"""
         return {
@@ -103,3 +121,23 @@ class EnvironmentResource(db.Model):
             'created_by': self.created_by,
             'updated_by': self.updated_by
         }
+
+
+class EnvironmentSlot(db.Model):
+    """测试环境执行槽位占用数，各进程以条件更新（in_use < 上限）抢占，保证环境并发数不超过容量"""
+    __tablename__ = 'environment_slots'
+
+    environment_id = db.Column(db.Integer, primary_key=True, autoincrement=False,
+                               comment='测试环境ID，0 表示未指定环境')
+    in_use = db.Column(db.Integer, nullable=False, default=0, comment='占用中的槽位数')
+
+
+class EnvironmentSlotLease(db.Model):
+    """测试环境槽位占用记录，执行进程退出后据此回收未释放的槽位"""
+    __tablename__ = 'environment_slot_leases'
+
+    id = db.Column(db.Integer, primary_key=True, comment='主键ID')
+    environment_id = db.Column(db.Integer, nullable=False, index=True, comment='测试环境ID，0 表示未指定环境')
+    job_id = db.Column(db.Integer, nullable=False, index=True, comment='占用槽位的后台任务ID')
+    worker_id = db.Column(db.String(100), comment='占用槽位的工作进程标识')
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow, comment='占用时间')
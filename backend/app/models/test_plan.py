@@ -2,6 +2,7 @@
 测试计划模型
 """
 from datetime import datetime
+from sqlalchemy import func
 from app import db
 
 
@@ -35,17 +36,26 @@ class TestPlan(db.Model):
     target_environment = db.relationship('TestEnvironment', backref='test_plans')
     folder = db.relationship('TestPlanFolder', backref='test_plans')
 
-    def get_progress(self):
-        """获取执行进度"""
-        total = self.test_plan_cases.count()
+    @staticmethod
+    def _build_progress(status_counts):
+        """
+        根据用例状态计数构建进度信息
+
+        Args:
+            status_counts: {last_status: 数量}
+
+        Returns:
+            dict: 进度信息
+        """
+        total = sum(status_counts.values())
         if total == 0:
             return {'total': 0, 'passed': 0, 'failed': 0, 'skipped': 0, 'progress': 0}
 
-        passed = self.test_plan_cases.filter_by(last_status='passed').count()
-        failed = self.test_plan_cases.filter_by(last_status='failed').count()
-        skipped = self.test_plan_cases.filter_by(last_status='skipped').count()
+        passed = status_counts.get('passed', 0)
+        failed = status_counts.get('failed', 0)
+        skipped = status_counts.get('skipped', 0)
         executed = passed + failed + skipped
-        progress = int((executed / total) * 100) if total > 0 else 0
+        progress = int((executed / total) * 100)
 
         return {
             'total': total,
@@ -55,8 +65,56 @@ class TestPlan(db.Model):
             'progress': progress
         }
 
-    def to_dict(self):
-        """转换为字典"""
+    @classmethod
+    def get_progress_map(cls, plan_ids):
+        """
+        批量获取测试计划执行进度
+
+        通过一次 GROUP BY test_plan_id, last_status 查询得到所有计划的状态分布
+
+        Args:
+            plan_ids: 测试计划ID列表
+
+        Returns:
+            dict: {plan_id: 进度信息}
+        """
+        plan_ids = list(plan_ids)
+        if not plan_ids:
+            return {}
+
+        histograms = {plan_id: {} for plan_id in plan_ids}
+        rows = db.session.query(
+            TestPlanCase.test_plan_id,
+            TestPlanCase.last_status,
+            func.count(TestPlanCase.id)
+        ).filter(
+            TestPlanCase.test_plan_id.in_(plan_ids)
+        ).group_by(
+            TestPlanCase.test_plan_id,
+            TestPlanCase.last_status
+        ).all()
+
+        for plan_id, last_status, count in rows:
+            histograms[plan_id][last_status] = count
+
+        return {plan_id: cls._build_progress(counts) for plan_id, counts in histograms.items()}
+
+    def get_progress(self):
+        """获取执行进度"""
+        return self.get_progress_map([self.id])[self.id]
+
+    def to_dict(self, progress_map=None):
+        """
+        转换为字典
+
+        Args:
+            progress_map: 预先批量计算的进度信息 {plan_id: 进度}，为空时单独查询
+        """
+        if progress_map is not None:
+            progress = progress_map.get(self.id) or self._build_progress({})
+        else:
+            progress = self.get_progress()
+
         return {
             'id': self.id,
             'name': self.name,
@@ -75,7 +133,7 @@ class TestPlan(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'created_by': self.created_by,
             'updated_by': self.updated_by,
-            'progress': self.get_progress()
+            'progress': progress
         }
 
 
@@ -118,6 +176,7 @@ class TestExecution(db.Model):
     test_plan_id = db.Column(db.Integer, db.ForeignKey('test_plans.id'), nullable=True, comment='测试计划ID')
     test_case_id = db.Column(db.Integer, db.ForeignKey('test_cases.id'), nullable=False, comment='测试用例ID')
     test_plan_case_id = db.Column(db.Integer, db.ForeignKey('test_plan_cases.id'), nullable=True, comment='测试计划用例关联ID')
+    project_id = db.Column(db.Integer, nullable=True, comment='所属项目ID（冗余自用例，由 ORM 事件维护）')
     status = db.Column(db.String(20), default='not_executed', comment='状态: passed, failed, blocked, skipped, not_executed')
     execution_time = db.Column(db.DateTime, default=datetime.utcnow, comment='执行时间')
     executed_by = db.Column(db.String(100), comment='执行人')
@@ -131,6 +190,12 @@ class TestExecution(db.Model):
     # 关系
     environment = db.relationship('TestEnvironment', backref='executions')
 
+    __table_args__ = (
+        # 按项目分页查询执行记录、查询最近执行记录
+        db.Index('ix_test_executions_project_id', 'project_id', 'id'),
+        db.Index('ix_test_executions_project_time', 'project_id', 'execution_time'),
+    )
+
     def to_dict(self):
         """转换为字典"""
         return {
@@ -138,6 +203,7 @@ class TestExecution(db.Model):
             'test_plan_id': self.test_plan_id,
             'test_case_id': self.test_case_id,
             'test_plan_case_id': self.test_plan_case_id,
+            'project_id': self.project_id,
             'status': self.status,
             'execution_time': self.execution_time.isoformat() if self.execution_time else None,
             'executed_by': self.executed_by,
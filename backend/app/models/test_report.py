@@ -115,6 +115,9 @@ class TestReport(db.Model):
 class ReportMetric(db.Model):
     """报告度量指标模型"""
     __tablename__ = 'report_metrics'
+    __table_args__ = (
+        db.UniqueConstraint('report_id', 'metric_key', name='uq_report_metrics_report_key'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, comment='主键ID')
     report_id = db.Column(db.Integer, db.ForeignKey('test_reports.id'), nullable=False, comment='报告ID')
@@ -143,3 +146,32 @@ class ReportMetric(db.Model):
             'trend_data': self.trend_data,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class ExecutionDailyStat(db.Model):
+    """执行记录按日汇总（项目 × 测试计划 × 日期 × 状态），随执行记录写入增量维护，供趋势报表查询"""
+    __tablename__ = 'execution_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'test_plan_id', 'stat_date', 'status', name='uq_execution_daily_stats_key'),
+        db.Index('ix_execution_daily_stats_project_date', 'project_id', 'stat_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, comment='主键ID')
+    project_id = db.Column(db.Integer, nullable=False, default=0, comment='项目ID，0 表示未归属项目')
+    test_plan_id = db.Column(db.Integer, nullable=False, default=0, comment='测试计划ID，0 表示不属于测试计划')
+    stat_date = db.Column(db.Date, nullable=False, comment='执行日期(UTC)')
+    status = db.Column(db.String(20), nullable=False, comment='执行状态')
+    execution_count = db.Column(db.Integer, nullable=False, default=0, comment='执行次数')
+    total_duration = db.Column(db.BigInteger, nullable=False, default=0, comment='执行总时长(秒)')
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'test_plan_id': self.test_plan_id,
+            'stat_date': self.stat_date.isoformat() if self.stat_date else None,
+            'status': self.status,
+            'execution_count': self.execution_count,
+            'total_duration': self.total_duration
+        }
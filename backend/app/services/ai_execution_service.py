@@ -0,0 +1,296 @@
+"""
+AI测试执行服务
+AI执行以后台任务（job_type=ai_execution）的形式运行，执行状态保存在任务的 state 中。
+一次执行内的用例按优先级排序后分发到线程池并行执行，并发数受测试环境容量限制：
+- 环境容量为激活且在线资源的CPU核心数之和，各工作进程通过 environment_slots 表共享该容量（见 EnvironmentSlotService）
+- fail_fast 开启时，任一用例失败后不再启动剩余用例（标记为 skipped）
+- 执行记录经 ExecutionResultWriter 合并写入，并回写测试计划用例的最后执行状态
+- 用例状态变化与新日志同时记录为任务增量事件（case_status / log / summary），供状态流按序号推送
+- 执行状态中每个用例只保留最近 EXECUTION_LOG_RING_SIZE 条日志，完整日志由 ExecutionLogStore 压缩落盘
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, Tuple
+
+from flask import current_app
+
+from app import db
+from app.models import TestCase, TestEnvironment
+from app.services.job_queue import register_job_handler, get_job_queue, JobContext
+from app.services.environment_slot_service import get_environment_slot_service
+from app.services.execution_result_writer import ExecutionResultWriter
+from app.services.execution_log_store import get_execution_log_store
+
+AI_EXECUTION_JOB_TYPE = 'ai_execution'
+
+# 每个用例的模拟执行步骤
+EXECUTION_STEPS = [
+    '准备测试环境',
+    '解析测试步骤',
+    '执行测试操作',
+    '验证结果',
+    '生成测试报告'
+]
+
+# 排序权重，数值越小越先执行
+PRIORITY_RANK = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+RISK_LEVEL_RANK = {'high': 0, 'medium': 1, 'low': 2}
+
+# 等待环境槽位时检查取消的间隔（秒）
+SLOT_WAIT_INTERVAL = 1.0
+
+
+def resolve_concurrency(environment_id: Optional[int] = None, requested: Optional[int] = None) -> Tuple[int, int]:
+    """
+    计算环境并发上限及本次执行的并发数
+
+    Args:
+        environment_id: 测试环境ID
+        requested: 请求的并发数，不超过环境并发上限
+
+    Returns:
+        (环境并发上限, 本次执行并发数)
+
+    Raises:
+        ValueError: 环境不存在、不可用或没有在线资源
+    """
+    limit = current_app.config.get('AI_EXECUTION_DEFAULT_CONCURRENCY', 4)
+    if environment_id:
+        environment = db.session.get(TestEnvironment, environment_id)
+        if environment is None:
+            raise ValueError('测试环境不存在')
+        if not environment.is_available:
+            raise ValueError('测试环境不可用')
+        capacity = environment.get_execution_capacity()
+        if capacity == 0:
+            raise ValueError('测试环境没有在线资源')
+        if capacity is not None:
+            limit = capacity
+
+    limit = max(min(limit, current_app.config.get('AI_EXECUTION_MAX_CONCURRENCY', 16)), 1)
+    concurrency = min(requested, limit) if requested and requested > 0 else limit
+    return limit, concurrency
+
+
+def build_execution_state(case_ids, environment_id=None, priority_order=True):
+    """
+    构建AI执行的初始状态
+
+    Args:
+        case_ids: 测试用例ID列表
+        environment_id: 测试环境ID
+        priority_order: 是否按优先级、风险等级排序执行，否则按传入顺序
+
+    Returns:
+        dict: 执行状态
+    """
+    cases = TestCase.query.filter(TestCase.id.in_(case_ids), TestCase.is_deleted == False).all()
+    case_map = {case.id: case for case in cases}
+    ordered_cases = [case_map[case_id] for case_id in case_ids if case_id in case_map]
+    if priority_order:
+        # sorted 是稳定排序，同优先级保持传入顺序
+        ordered_cases.sort(key=lambda case: (
+            PRIORITY_RANK.get(case.priority, len(PRIORITY_RANK)),
+            RISK_LEVEL_RANK.get(case.risk_level, len(RISK_LEVEL_RANK))
+        ))
+
+    test_cases = []
+    for case in ordered_cases:
+        test_cases.append({
+            'id': case.id,
+            'caseName': case.name,
+            'priority': case.priority,
+            'riskLevel': case.risk_level,
+            'status': 'pending',
+            'progress': 0,
+            'currentStep': 0,
+            'totalSteps': len(EXECUTION_STEPS),
+            'currentStepContent': '',
+            'errorInfo': '',
+            'logs': [],
+            'logCount': 0
+        })
+
+    return {
+        'test_cases': test_cases,
+        'success_count': 0,
+        'failed_count': 0,
+        'skipped_count': 0,
+        'start_time': datetime.utcnow().isoformat(),
+        'environment_id': environment_id
+    }
+
+
+# 用例状态事件包含的字段
+CASE_STATUS_FIELDS = ('status', 'progress', 'currentStep', 'totalSteps', 'currentStepContent', 'errorInfo')
+
+
+def _append_log(context: JobContext, case, level, message):
+    """追加用例执行日志，并记录 log 事件（需持有 context.lock）"""
+    log = {
+        'time': datetime.now().strftime('%H:%M:%S'),
+        'level': level,
+        'message': message
+    }
+    log['seq'] = get_execution_log_store().append(context.job_id, case['id'], log)
+    # 执行状态中只保留最近的日志，完整日志通过日志存储按区间读取
+    case['logs'].append(log)
+    case['logCount'] = case.get('logCount', 0) + 1
+    del case['logs'][:-current_app.config.get('EXECUTION_LOG_RING_SIZE', 50)]
+    context.emit('log', dict(log, case_id=case['id']))
+
+
+def _update_case(context: JobContext, case, **fields):
+    """更新用例执行状态，并记录 case_status 事件（需持有 context.lock）"""
+    case.update(fields)
+    data = {field: case.get(field) for field in CASE_STATUS_FIELDS}
+    data['case_id'] = case['id']
+    context.emit('case_status', data)
+
+
+def _emit_summary(context: JobContext):
+    """记录执行汇总事件（需持有 context.lock）"""
+    execution = context.state
+    context.emit('summary', {
+        'success_count': execution['success_count'],
+        'failed_count': execution['failed_count'],
+        'skipped_count': execution['skipped_count']
+    })
+
+
+def _current_limit(environment_id: Optional[int], limit: int) -> int:
+    """环境容量可能在执行期间调整，每次抢占槽位前按当前容量计算上限；环境已不可用时沿用开始时的上限"""
+    try:
+        return resolve_concurrency(environment_id)[0]
+    except ValueError:
+        return limit
+
+
+def _acquire_slot(context: JobContext, environment_id: Optional[int], limit: int,
+                  abort: threading.Event) -> Optional[int]:
+    """等待环境槽位，返回占用记录ID；期间执行被取消或 fail-fast 中止时放弃，返回 None"""
+    service = get_environment_slot_service()
+    queue = get_job_queue()
+    while not (abort.is_set() or context.is_cancelled()):
+        lease_id = service.try_acquire(environment_id, _current_limit(environment_id, limit),
+                                       context.job_id, queue.worker_id)
+        if lease_id is not None:
+            return lease_id
+        # 占用槽位的进程可能已退出，回收后等待本进程释放或下次重试
+        service.reclaim_stale(environment_id, queue.stale_timeout)
+        service.wait_released(SLOT_WAIT_INTERVAL)
+    return None
+
+
+def _execute_case(context: JobContext, case: dict, writer: ExecutionResultWriter) -> bool:
+    """
+    执行单个用例（模拟），返回是否执行完毕；执行中途被取消返回 False
+    """
+    execution = context.state
+    with context.lock:
+        _update_case(context, case, status='running', currentStep=1)
+
+    for step_index, step_name in enumerate(EXECUTION_STEPS, 1):
+        if context.is_cancelled():
+            return False
+
+        with context.lock:
+            _update_case(context, case, currentStep=step_index, currentStepContent=step_name,
+                         progress=int((step_index / len(EXECUTION_STEPS)) * 100))
+            _append_log(context, case, 'INFO', f'正在执行: {step_name}')
+        context.save_state()
+
+        # 模拟执行时间
+        time.sleep(random.uniform(1, 3))
+
+    if context.is_cancelled():
+        return False
+
+    # 随机决定成功或失败
+    with context.lock:
+        if random.random() > 0.2:  # 80%成功率
+            _update_case(context, case, status='completed')
+            execution['success_count'] += 1
+            _append_log(context, case, 'INFO', '测试执行成功')
+        else:
+            _update_case(context, case, status='failed', errorInfo='断言失败: 期望值与实际值不匹配')
+            execution['failed_count'] += 1
+            _append_log(context, case, 'ERROR', '测试执行失败: 断言失败')
+        _emit_summary(context)
+        logs = case['logs'][-5:]
+
+    # 执行记录交给批量写入器，按数量/时间阈值合并写入
+    writer.add(
+        case['id'],
+        'passed' if case['status'] == 'completed' else 'failed',
+        test_plan_id=context.payload.get('test_plan_id'),
+        environment_id=context.payload.get('environment_id'),
+        executed_by='AI Agent',
+        actual_result=json.dumps({'logs': logs, 'ai_execution_id': context.job_id}),
+        duration=random.randint(10, 60)
+    )
+    return True
+
+
+@register_job_handler(AI_EXECUTION_JOB_TYPE)
+def run_ai_execution(context: JobContext):
+    """并行执行用例（模拟AI执行，实际应该调用真实的AI Agent），执行状态随每个用例完成写回，执行记录批量写入"""
+    app = current_app._get_current_object()
+    execution = context.state
+    test_cases = execution.get('test_cases', [])
+    if not test_cases:
+        return
+
+    environment_id = context.payload.get('environment_id')
+    fail_fast = bool(context.payload.get('fail_fast'))
+    limit, concurrency = resolve_concurrency(environment_id, context.payload.get('concurrency'))
+
+    with context.lock:
+        execution['concurrency'] = concurrency
+        execution['fail_fast'] = fail_fast
+    abort = threading.Event()
+    finished = []
+
+    def run_case(case):
+        with app.app_context():
+            lease_id = _acquire_slot(context, environment_id, limit, abort)
+            if lease_id is None:
+                if abort.is_set() and not context.is_cancelled():
+                    with context.lock:
+                        _update_case(context, case, status='skipped')
+                        execution['skipped_count'] += 1
+                        _append_log(context, case, 'WARN', '前序用例失败，已跳过（fail-fast）')
+                        _emit_summary(context)
+                return
+            try:
+                if not _execute_case(context, case, writer):
+                    return
+            finally:
+                get_environment_slot_service().release(lease_id)
+                log_store.flush(context.job_id)
+
+            with context.lock:
+                finished.append(case['id'])
+                progress = int(len(finished) / len(test_cases) * 100)
+                if fail_fast and case['status'] == 'failed':
+                    abort.set()
+            context.save_state(progress=progress)
+
+    log_store = get_execution_log_store()
+    writer = ExecutionResultWriter(
+        app,
+        batch_size=app.config.get('EXECUTION_RESULT_BATCH_SIZE', 100),
+        flush_interval=app.config.get('EXECUTION_RESULT_FLUSH_INTERVAL', 2.0),
+        max_retries=app.config.get('EXECUTION_RESULT_MAX_RETRIES', 3)
+    )
+    # 用例按顺序提交，线程池按提交顺序取用，保证高优先级用例先执行
+    try:
+        with writer, ThreadPoolExecutor(max_workers=min(concurrency, len(test_cases)),
+                                        thread_name_prefix=f'ai-execution-{context.job_id}') as pool:
+            list(pool.map(run_case, test_cases))
+    finally:
+        log_store.close(context.job_id)
@@ -0,0 +1,152 @@
+"""
+测试环境执行槽位
+同一测试环境的并发执行数受环境容量限制，多个工作进程共享 environment_slots 表中的占用数：
+- 抢占：UPDATE environment_slots SET in_use = in_use + 1 WHERE environment_id = ? AND in_use < 上限，
+  更新成功即占到槽位，同时写入占用记录；上限按当前环境容量传入，容量调低后已占用的槽位也计入
+- 释放：删除占用记录并将占用数减一，与抢占在同一张表上原子完成
+- 回收：执行进程退出时未释放的槽位，在所属任务不再由该进程运行（或心跳超时）后由等待方回收
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, delete, or_
+
+from app import db
+from app.models import EnvironmentSlot, EnvironmentSlotLease, BackgroundJob
+from app.utils.upsert import upsert
+
+# 本进程释放槽位时唤醒等待方立即重试，跨进程的释放由等待方定时重试感知
+_slot_released = threading.Condition()
+
+
+class EnvironmentSlotService:
+    """测试环境执行槽位服务"""
+
+    @staticmethod
+    def _slot_key(environment_id: Optional[int]) -> int:
+        return environment_id or 0
+
+    @staticmethod
+    def _lock_slot(key: int):
+        """锁定占用数记录，释放、回收与抢占都先锁该行，再操作占用记录，避免交叉加锁"""
+        slots = EnvironmentSlot.__table__
+        db.session.execute(select(slots.c.in_use).where(slots.c.environment_id == key).with_for_update())
+
+    def try_acquire(self, environment_id: Optional[int], limit: int, job_id: int,
+                    worker_id: Optional[str]) -> Optional[int]:
+        """
+        尝试占用一个槽位（不等待）
+
+        Args:
+            environment_id: 测试环境ID，为空表示未指定环境
+            limit: 环境当前的并发上限
+            job_id: 占用槽位的后台任务ID
+            worker_id: 占用槽位的工作进程标识
+
+        Returns:
+            Optional[int]: 占用记录ID，槽位已满时返回 None
+        """
+        key = self._slot_key(environment_id)
+        slots = EnvironmentSlot.__table__
+        try:
+            claimed = db.session.execute(
+                update(slots).where(slots.c.environment_id == key, slots.c.in_use < limit)
+                .values(in_use=slots.c.in_use + 1)
+            ).rowcount
+            if not claimed and db.session.get(EnvironmentSlot, key) is None:
+                # 首次使用该环境，创建占用数记录后重试（并发创建时只有一个生效）
+                upsert(db.session, slots, [{'environment_id': key, 'in_use': 0}], key_columns=('environment_id',))
+                claimed = db.session.execute(
+                    update(slots).where(slots.c.environment_id == key, slots.c.in_use < limit)
+                    .values(in_use=slots.c.in_use + 1)
+                ).rowcount
+            if not claimed:
+                db.session.commit()
+                return None
+
+            lease = EnvironmentSlotLease(environment_id=key, job_id=job_id, worker_id=worker_id)
+            db.session.add(lease)
+            db.session.commit()
+            return lease.id
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def release(self, lease_id: int):
+        """释放槽位（重复释放安全）"""
+        slots = EnvironmentSlot.__table__
+        leases = EnvironmentSlotLease.__table__
+        try:
+            key = db.session.execute(select(leases.c.environment_id).where(leases.c.id == lease_id)).scalar()
+            if key is not None:
+                self._lock_slot(key)
+            if key is not None and db.session.execute(delete(leases).where(leases.c.id == lease_id)).rowcount:
+                db.session.execute(
+                    update(slots).where(slots.c.environment_id == key, slots.c.in_use > 0)
+                    .values(in_use=slots.c.in_use - 1)
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        with _slot_released:
+            _slot_released.notify_all()
+
+    def reclaim_stale(self, environment_id: Optional[int], stale_timeout: float) -> int:
+        """
+        回收所属任务已不由占用进程运行的槽位（任务已结束、被回收重新排队或心跳超时）
+
+        Returns:
+            int: 回收的槽位数
+        """
+        key = self._slot_key(environment_id)
+        slots = EnvironmentSlot.__table__
+        leases = EnvironmentSlotLease.__table__
+        deadline = datetime.utcnow() - timedelta(seconds=stale_timeout)
+        try:
+            self._lock_slot(key)
+            lease_ids = [row[0] for row in db.session.execute(
+                select(leases.c.id)
+                .select_from(leases)
+                .outerjoin(BackgroundJob, BackgroundJob.id == leases.c.job_id)
+                .where(leases.c.environment_id == key, or_(
+                    BackgroundJob.id.is_(None),
+                    BackgroundJob.status != 'running',
+                    BackgroundJob.worker_id.is_(None),
+                    BackgroundJob.worker_id != leases.c.worker_id,
+                    BackgroundJob.heartbeat_at < deadline
+                ))
+            ).all()]
+            reclaimed = 0
+            if lease_ids:
+                # 以删除的行数为准，多个进程同时回收时每条占用记录只扣减一次
+                reclaimed = db.session.execute(delete(leases).where(leases.c.id.in_(lease_ids))).rowcount
+                if reclaimed:
+                    db.session.execute(
+                        update(slots).where(slots.c.environment_id == key, slots.c.in_use >= reclaimed)
+                        .values(in_use=slots.c.in_use - reclaimed)
+                    )
+            db.session.commit()
+            return reclaimed
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def wait_released(timeout: float):
+        """等待本进程释放槽位，最长等待 timeout 秒"""
+        with _slot_released:
+            _slot_released.wait(timeout)
+
+
+# 全局实例
+_environment_slot_service = None
+
+
+def get_environment_slot_service() -> EnvironmentSlotService:
+    """获取测试环境执行槽位服务实例"""
+    global _environment_slot_service
+    if _environment_slot_service is None:
+        _environment_slot_service = EnvironmentSlotService()
+    return _environment_slot_service
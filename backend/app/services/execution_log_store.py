@@ -0,0 +1,172 @@
+"""
+执行日志存储
+- 内存：每个用例在执行状态中只保留最近 N 条日志（环形缓冲），供页面实时展示
+- 磁盘：完整日志按执行追加写入 gzip 文件（<执行ID>.log.gz），每次落盘写入一个独立的 gzip 成员，
+  同时在索引文件（<执行ID>.idx）中追加一行 "起始序号 字节偏移 行数"，
+  按 offset/limit 读取时只需解压覆盖该区间的成员
+"""
+import os
+import gzip
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionLogStore:
+    """执行日志存储（线程安全，每个进程一个实例）"""
+
+    def __init__(self, base_dir: str, flush_lines: int = 100):
+        """
+        Args:
+            base_dir: 日志文件目录，多实例部署时应为共享存储
+            flush_lines: 单个执行缓冲的日志达到该行数时落盘
+        """
+        self.base_dir = base_dir
+        self.flush_lines = max(flush_lines, 1)
+        self._pending: Dict[int, List[dict]] = {}
+        self._next_seq: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, execution_id: int) -> Tuple[str, str]:
+        """日志文件与索引文件路径"""
+        return (os.path.join(self.base_dir, f'{execution_id}.log.gz'),
+                os.path.join(self.base_dir, f'{execution_id}.idx'))
+
+    def _load_index(self, execution_id: int) -> List[Tuple[int, int, int]]:
+        """读取索引：[(起始序号, 字节偏移, 行数)]"""
+        _, index_path = self._paths(execution_id)
+        if not os.path.exists(index_path):
+            return []
+        index = []
+        with open(index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3:
+                    index.append(tuple(int(part) for part in parts))
+        return index
+
+    def append(self, execution_id: int, case_id: int, entry: dict) -> int:
+        """
+        追加一条日志
+
+        Args:
+            execution_id: 执行ID
+            case_id: 测试用例ID
+            entry: 日志内容，如 {'time', 'level', 'message'}
+
+        Returns:
+            int: 该日志在本次执行中的序号（从0开始）
+        """
+        with self._lock:
+            if execution_id not in self._next_seq:
+                index = self._load_index(execution_id)
+                self._next_seq[execution_id] = index[-1][0] + index[-1][2] if index else 0
+            seq = self._next_seq[execution_id]
+            self._next_seq[execution_id] = seq + 1
+            pending = self._pending.setdefault(execution_id, [])
+            pending.append(dict(entry, seq=seq, case_id=case_id))
+            should_flush = len(pending) >= self.flush_lines
+        if should_flush:
+            self.flush(execution_id)
+        return seq
+
+    def flush(self, execution_id: int):
+        """将缓冲的日志写为一个 gzip 成员，并追加索引"""
+        with self._lock:
+            records = self._pending.pop(execution_id, [])
+            if not records:
+                return
+            log_path, index_path = self._paths(execution_id)
+            data = '\n'.join(json.dumps(record, ensure_ascii=False) for record in records) + '\n'
+            try:
+                os.makedirs(self.base_dir, exist_ok=True)
+                with open(log_path, 'ab') as f:
+                    f.seek(0, os.SEEK_END)
+                    offset = f.tell()
+                    f.write(gzip.compress(data.encode('utf-8')))
+                with open(index_path, 'a', encoding='utf-8') as f:
+                    f.write(f'{records[0]["seq"]} {offset} {len(records)}\n')
+            except OSError as e:
+                logger.error(f'执行 {execution_id} 日志落盘失败({len(records)}条): {e}')
+
+    def close(self, execution_id: int):
+        """执行结束：写入剩余日志并释放内存"""
+        self.flush(execution_id)
+        with self._lock:
+            self._next_seq.pop(execution_id, None)
+
+    def read(self, execution_id: int, offset: int = 0, limit: int = 100,
+             case_id: Optional[int] = None) -> dict:
+        """
+        按序号区间读取日志
+
+        Args:
+            execution_id: 执行ID
+            offset: 起始位置
+            limit: 最多返回条数
+            case_id: 只读取该用例的日志，此时 offset 为该用例日志中的位置
+
+        Returns:
+            dict: {'items', 'offset', 'limit', 'total'}
+        """
+        with self._lock:
+            index = self._load_index(execution_id)
+            pending = list(self._pending.get(execution_id, []))
+        log_path, _ = self._paths(execution_id)
+
+        items, total = [], 0
+        if case_id is None:
+            total = (index[-1][0] + index[-1][2] if index else 0) + len(pending)
+            end = offset + limit
+            members = [member for member in enumerate(index)
+                       if member[1][0] < end and member[1][0] + member[1][2] > offset]
+        else:
+            members = list(enumerate(index))
+
+        if members:
+            with open(log_path, 'rb') as f:
+                for position, (first_seq, byte_offset, _) in members:
+                    next_offset = index[position + 1][1] if position + 1 < len(index) else None
+                    f.seek(byte_offset)
+                    chunk = f.read(next_offset - byte_offset) if next_offset is not None else f.read()
+                    for line in gzip.decompress(chunk).decode('utf-8').splitlines():
+                        record = json.loads(line)
+                        if case_id is None:
+                            if offset <= record['seq'] < offset + limit:
+                                items.append(record)
+                        elif record['case_id'] == case_id:
+                            if offset <= total < offset + limit:
+                                items.append(record)
+                            total += 1
+
+        # 尚未落盘的日志
+        for record in pending:
+            if case_id is None:
+                if offset <= record['seq'] < offset + limit:
+                    items.append(record)
+            elif record['case_id'] == case_id:
+                if offset <= total < offset + limit:
+                    items.append(record)
+                total += 1
+
+        return {'items': items, 'offset': offset, 'limit': limit, 'total': total}
+
+
+# 全局实例
+_execution_log_store = None
+
+
+def get_execution_log_store() -> ExecutionLogStore:
+    """获取执行日志存储实例"""
+    global _execution_log_store
+    if _execution_log_store is None:
+        _execution_log_store = ExecutionLogStore(
+            current_app.config.get('EXECUTION_LOG_DIR', 'execution_logs'),
+            current_app.config.get('EXECUTION_LOG_FLUSH_LINES', 100)
+        )
+    return _execution_log_store
@@ -0,0 +1,203 @@
+"""
+执行结果批量写入器
+执行结果先进入内存缓冲区，达到数量阈值或时间阈值时在独立的应用上下文中批量写入：
+- 一条 INSERT（executemany）写入本批全部 TestExecution
+- 一条 UPDATE 以关联子查询回写本批涉及的 TestPlanCase.last_status / last_execution_id
+- 本批执行记录按 项目 × 计划 × 日期 × 状态 聚合后一次写入执行汇总表（execution_daily_stats）
+- 写入失败的批次放回缓冲区，间隔 flush_interval 后重试；超过重试次数仍失败时丢弃，
+  并在 close() 时抛出 ExecutionResultWriteError，由调用方（执行任务）标记失败
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import insert, update, select, func
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import TestExecution, TestPlanCase
+from app.services.execution_stats_service import get_execution_stats_service
+from app.services.project_scope_service import get_project_scope_service
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionResultWriteError(Exception):
+    """执行结果重试后仍未能写入"""
+    pass
+
+
+class ExecutionResultWriter:
+    """执行结果批量写入器（线程安全）"""
+
+    def __init__(self, app, batch_size: int = 100, flush_interval: float = 2.0, max_retries: int = 3):
+        """
+        Args:
+            app: Flask 应用，写入时在其应用上下文中执行
+            batch_size: 缓冲记录数达到该值时立即写入
+            flush_interval: 距上次写入超过该秒数时写入（由后台线程定时检查），也是写入失败后的重试间隔
+            max_retries: 连续写入失败的最大重试次数
+        """
+        self.app = app
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.max_retries = max(max_retries, 0)
+        # 重试后仍写入失败而丢弃的记录数及最近一次错误
+        self.failed_count = 0
+        self.last_error = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, name='execution-result-writer', daemon=True)
+        self._timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, test_case_id: int, status: str, **fields):
+        """
+        添加一条执行结果
+
+        Args:
+            test_case_id: 测试用例ID
+            status: 执行状态: passed, failed, blocked, skipped
+            **fields: TestExecution 的其他字段，如 test_plan_id、executed_by、actual_result、duration
+        """
+        record = {
+            'test_case_id': test_case_id,
+            'status': status,
+            'execution_time': datetime.utcnow(),
+            'test_plan_id': None,
+            'test_plan_case_id': None,
+            'executed_by': None,
+            'actual_result': None,
+            'duration': None,
+            'environment_id': None
+        }
+        record.update(fields)
+
+        with self._lock:
+            self._buffer.append(record)
+            should_flush = len(self._buffer) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def flush(self, force: bool = False):
+        """
+        立即写入缓冲区中的全部记录
+
+        Args:
+            force: 忽略写入失败后的重试间隔
+        """
+        with self._flush_lock:
+            if not force and time.monotonic() < self._retry_at:
+                return
+            with self._lock:
+                records, self._buffer = self._buffer, []
+                self._last_flush = time.monotonic()
+            if not records:
+                return
+
+            with self.app.app_context():
+                try:
+                    self._write(records)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    self._handle_failure(records, e)
+                    return
+            self._failures = 0
+
+    def _handle_failure(self, records: List[Dict], error: Exception):
+        """写入失败：未超过重试次数时放回缓冲区头部，否则丢弃并记录"""
+        self._failures += 1
+        self.last_error = error
+        if self._failures <= self.max_retries:
+            logger.warning(f'批量写入执行结果失败({len(records)}条)，第 {self._failures} 次，稍后重试: {error}')
+            with self._lock:
+                self._buffer[:0] = records
+            self._retry_at = time.monotonic() + self.flush_interval
+            return
+        logger.error(f'批量写入执行结果失败({len(records)}条)，重试 {self.max_retries} 次后放弃: {error}')
+        self.failed_count += len(records)
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def close(self):
+        """
+        停止定时写入并写入剩余记录
+
+        Raises:
+            ExecutionResultWriteError: 有执行结果重试后仍未写入
+        """
+        self._closed.set()
+        self._timer.join()
+        while True:
+            self.flush(force=True)
+            with self._lock:
+                pending = bool(self._buffer)
+            if not pending:
+                break
+            # 写入失败的记录已放回缓冲区，等待重试间隔后再写（每次失败都计入重试次数，循环必然结束）
+            time.sleep(self.flush_interval)
+        if self.failed_count:
+            raise ExecutionResultWriteError(f'{self.failed_count} 条执行结果写入失败: {self.last_error}')
+
+    def _flush_periodically(self):
+        """后台线程：超过时间阈值仍未写入时写入"""
+        while not self._closed.wait(min(self.flush_interval, 1.0)):
+            with self._lock:
+                due = self._buffer and time.monotonic() - self._last_flush >= self.flush_interval
+            if due:
+                self.flush()
+
+    @staticmethod
+    def _write(records: List[Dict]):
+        """批量写入执行记录并回写测试计划用例的最后执行状态"""
+        # 补全测试计划用例关联ID（每个测试计划一次查询）
+        missing = {}
+        for record in records:
+            if record['test_plan_id'] and not record['test_plan_case_id']:
+                missing.setdefault(record['test_plan_id'], set()).add(record['test_case_id'])
+        for plan_id, case_ids in missing.items():
+            plan_case_map = dict(db.session.query(TestPlanCase.test_case_id, TestPlanCase.id).filter(
+                TestPlanCase.test_plan_id == plan_id,
+                TestPlanCase.test_case_id.in_(case_ids)
+            ).all())
+            for record in records:
+                if record['test_plan_id'] == plan_id and not record['test_plan_case_id']:
+                    record['test_plan_case_id'] = plan_case_map.get(record['test_case_id'])
+
+        # 批量插入不触发 ORM 事件，按用例补全冗余的项目ID（一次查询）
+        case_projects = get_project_scope_service().case_projects(record['test_case_id'] for record in records)
+        for record in records:
+            record['project_id'] = case_projects.get(record['test_case_id'])
+
+        db.session.execute(insert(TestExecution), records)
+        # 批量插入不触发 ORM 事件，执行汇总在同一事务内按批更新
+        get_execution_stats_service().record(records)
+
+        plan_case_ids = {record['test_plan_case_id'] for record in records if record['test_plan_case_id']}
+        if plan_case_ids:
+            latest_execution = aliased(TestExecution)
+            latest_id = select(func.max(latest_execution.id)).where(
+                latest_execution.test_plan_case_id == TestPlanCase.id
+            ).correlate(TestPlanCase).scalar_subquery()
+            latest_status = select(TestExecution.status).where(
+                TestExecution.id == latest_id
+            ).correlate(TestPlanCase).scalar_subquery()
+            db.session.execute(
+                update(TestPlanCase)
+                .where(TestPlanCase.id.in_(plan_case_ids))
+                .values(last_execution_id=latest_id, last_status=latest_status)
+                .execution_options(synchronize_session=False)
+            )
@@ -0,0 +1,311 @@
+"""
+执行记录按日汇总
+execution_daily_stats 表按 项目 × 测试计划 × 日期 × 状态 记录执行次数与执行总时长，趋势报表只读取汇总表：
+- 通过 ORM 创建、修改、删除执行记录时，由映射事件在同一事务内增量更新（修改时先减去旧值再加上新值）
+- 执行结果批量写入器（绕过 ORM 事件）写入后调用 record() 按批更新
+- 用例改归其他项目时，由项目归属服务在同步执行记录前调用 move_case_executions() 移动汇总
+- 汇总表可通过 flask execution-stats rebuild 从 test_executions 全量重建
+
+执行记录所属项目：优先取测试计划的项目，其次取用例所在套件的项目（test_cases.project_id），都没有时记为 0
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select, insert, delete, func
+
+from app import db
+from app.models import ExecutionDailyStat, TestExecution, TestPlan, TestCase
+from app.utils.upsert import upsert
+
+# 参与汇总的执行记录字段，任一变化时需要调整汇总
+STAT_FIELDS = ('test_plan_id', 'test_case_id', 'status', 'execution_time', 'duration')
+# 趋势报表中单独统计的状态
+TREND_STATUSES = ('passed', 'failed', 'blocked', 'skipped', 'not_executed')
+GRANULARITIES = ('day', 'week', 'month')
+# 单次趋势查询的最大周期数
+MAX_TREND_PERIODS = 1000
+
+# 汇总键: (项目ID, 测试计划ID, 日期, 状态)
+StatKey = Tuple[int, int, date, str]
+
+
+def _stat_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        # SQLite 的 date() 返回字符串
+        return date.fromisoformat(value)
+    return value
+
+
+def period_start(day: date, granularity: str) -> date:
+    """日期所在周期的第一天（周从周一开始）"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start: date, granularity: str) -> date:
+    """下一个周期的第一天"""
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+class ExecutionStatsService:
+    """执行记录按日汇总服务"""
+
+    @staticmethod
+    def _resolve_projects(executor, records: List[Dict]) -> Tuple[Dict[int, Optional[int]], Dict[int, Optional[int]]]:
+        """查询执行记录关联的测试计划项目与用例套件项目（每类一次查询）"""
+        plan_ids = {record['test_plan_id'] for record in records if record.get('test_plan_id')}
+        case_ids = {record['test_case_id'] for record in records if record.get('test_case_id')}
+        plan_projects = dict(executor.execute(
+            select(TestPlan.id, TestPlan.project_id).where(TestPlan.id.in_(plan_ids))
+        ).all()) if plan_ids else {}
+        case_projects = dict(executor.execute(
+            select(TestCase.id, TestCase.project_id).where(TestCase.id.in_(case_ids))
+        ).all()) if case_ids else {}
+        return plan_projects, case_projects
+
+    def record(self, records: Iterable[Dict], sign: int = 1, executor=None):
+        """
+        按执行记录增量更新汇总
+
+        Args:
+            records: 执行记录，包含 test_plan_id、test_case_id、status、execution_time、duration
+            sign: 1 表示新增，-1 表示撤销（删除或修改前的旧值）
+            executor: 数据库连接，ORM 事件内需传入当前 flush 的连接，默认使用 db.session
+        """
+        executor = executor if executor is not None else db.session
+        records = [record for record in records if record.get('execution_time') is not None]
+        if not records:
+            return
+        plan_projects, case_projects = self._resolve_projects(executor, records)
+
+        deltas: Dict[StatKey, List[int]] = {}
+        for record in records:
+            plan_id = record.get('test_plan_id') or 0
+            project_id = plan_projects.get(plan_id)
+            if project_id is None:
+                project_id = case_projects.get(record.get('test_case_id'))
+            key = (project_id or 0, plan_id, _stat_date(record['execution_time']), record.get('status') or 'not_executed')
+            delta = deltas.setdefault(key, [0, 0])
+            delta[0] += sign
+            delta[1] += sign * (record.get('duration') or 0)
+
+        upsert(executor, ExecutionDailyStat.__table__, [
+            {
+                'project_id': project_id,
+                'test_plan_id': plan_id,
+                'stat_date': stat_date,
+                'status': status,
+                'execution_count': count,
+                'total_duration': duration
+            }
+            for (project_id, plan_id, stat_date, status), (count, duration) in sorted(deltas.items())
+        ], key_columns=('project_id', 'test_plan_id', 'stat_date', 'status'),
+            increment_columns=('execution_count', 'total_duration'))
+
+    def move_case_executions(self, case_filter, executor=None):
+        """
+        用例改归其他项目时，把其执行记录的汇总从原项目移到用例的新项目（一次分组查询）
+        须在用例的 project_id 已更新、执行记录的 project_id 尚未同步时调用；
+        测试计划属于某个项目的执行记录按计划的项目汇总，不受影响
+
+        Args:
+            case_filter: test_cases 表上的筛选条件
+            executor: 数据库连接，ORM 事件内需传入当前 flush 的连接，默认使用 db.session
+        """
+        executor = executor if executor is not None else db.session
+        executions = TestExecution.__table__
+        cases = TestCase.__table__
+        old_project = func.coalesce(executions.c.project_id, 0)
+        new_project = func.coalesce(cases.c.project_id, 0)
+        plan = func.coalesce(executions.c.test_plan_id, 0)
+        day = func.date(executions.c.execution_time)
+        status = func.coalesce(executions.c.status, 'not_executed')
+        rows = executor.execute(
+            select(old_project, new_project, plan, day, status, func.count(executions.c.id),
+                   func.coalesce(func.sum(executions.c.duration), 0))
+            .select_from(executions)
+            .join(cases, cases.c.id == executions.c.test_case_id)
+            .outerjoin(TestPlan, TestPlan.id == executions.c.test_plan_id)
+            .where(case_filter, TestPlan.project_id.is_(None), executions.c.execution_time.isnot(None),
+                   old_project != new_project)
+            .group_by(old_project, new_project, plan, day, status)
+        ).all()
+        if not rows:
+            return
+
+        deltas: Dict[StatKey, List[int]] = {}
+        for from_project, to_project, plan_id, stat_date, status_value, count, duration in rows:
+            for project_id, sign in ((from_project, -1), (to_project, 1)):
+                delta = deltas.setdefault((project_id, plan_id, _stat_date(stat_date), status_value), [0, 0])
+                delta[0] += sign * count
+                delta[1] += sign * int(duration)
+
+        upsert(executor, ExecutionDailyStat.__table__, [
+            {
+                'project_id': project_id,
+                'test_plan_id': plan_id,
+                'stat_date': stat_date,
+                'status': status_value,
+                'execution_count': count,
+                'total_duration': duration
+            }
+            for (project_id, plan_id, stat_date, status_value), (count, duration) in sorted(deltas.items())
+        ], key_columns=('project_id', 'test_plan_id', 'stat_date', 'status'),
+            increment_columns=('execution_count', 'total_duration'))
+
+    def rebuild(self, project_id: Optional[int] = None) -> int:
+        """
+        从 test_executions 全量重建汇总
+
+        Args:
+            project_id: 只重建该项目的汇总，默认全部
+
+        Returns:
+            int: 写入的汇总行数
+        """
+        stats = ExecutionDailyStat.__table__
+        project = func.coalesce(TestPlan.project_id, TestExecution.project_id, 0)
+        plan = func.coalesce(TestExecution.test_plan_id, 0)
+        day = func.date(TestExecution.execution_time)
+        status = func.coalesce(TestExecution.status, 'not_executed')
+        query = (
+            select(project, plan, day, status, func.count(TestExecution.id),
+                   func.coalesce(func.sum(TestExecution.duration), 0))
+            .select_from(TestExecution)
+            .outerjoin(TestPlan, TestPlan.id == TestExecution.test_plan_id)
+            .where(TestExecution.execution_time.isnot(None))
+            .group_by(project, plan, day, status)
+        )
+        clear = delete(stats)
+        if project_id is not None:
+            query = query.where(project == project_id)
+            clear = clear.where(stats.c.project_id == project_id)
+
+        db.session.execute(clear)
+        result = db.session.execute(insert(stats).from_select(
+            ['project_id', 'test_plan_id', 'stat_date', 'status', 'execution_count', 'total_duration'], query
+        ))
+        db.session.commit()
+        return result.rowcount
+
+    def trends(self, date_from: date, date_to: date, granularity: str = 'day',
+               project_id: Optional[int] = None, test_plan_id: Optional[int] = None) -> List[Dict]:
+        """
+        按周期汇总执行趋势，没有执行记录的周期补零
+
+        Args:
+            date_from: 开始日期（含）
+            date_to: 结束日期（含）
+            granularity: 周期: day, week, month
+            project_id: 项目ID，为空时统计全部项目
+            test_plan_id: 测试计划ID
+
+        Returns:
+            List[Dict]: 每个周期的 {'period', 'total', 各状态次数, 'pass_rate', 'total_duration'}
+        """
+        query = select(
+            ExecutionDailyStat.stat_date, ExecutionDailyStat.status,
+            func.sum(ExecutionDailyStat.execution_count), func.sum(ExecutionDailyStat.total_duration)
+        ).where(
+            ExecutionDailyStat.stat_date >= date_from,
+            ExecutionDailyStat.stat_date <= date_to
+        ).group_by(ExecutionDailyStat.stat_date, ExecutionDailyStat.status)
+        if project_id is not None:
+            query = query.where(ExecutionDailyStat.project_id == project_id)
+        if test_plan_id is not None:
+            query = query.where(ExecutionDailyStat.test_plan_id == test_plan_id)
+
+        periods: Dict[date, Dict] = {}
+        start = period_start(date_from, granularity)
+        while start <= date_to:
+            periods[start] = dict({'period': start.isoformat(), 'total': 0, 'total_duration': 0},
+                                  **{status: 0 for status in TREND_STATUSES})
+            start = next_period(start, granularity)
+
+        for stat_date, status, count, duration in db.session.execute(query).all():
+            item = periods[period_start(_stat_date(stat_date), granularity)]
+            count, duration = int(count or 0), int(duration or 0)
+            item['total'] += count
+            item['total_duration'] += duration
+            if status in TREND_STATUSES:
+                item[status] += count
+
+        items = list(periods.values())
+        for item in items:
+            item['pass_rate'] = round(item['passed'] / item['total'] * 100, 2) if item['total'] else 0.0
+        return items
+
+
+# 全局实例
+_execution_stats_service = None
+
+
+def get_execution_stats_service() -> ExecutionStatsService:
+    """获取执行汇总服务实例"""
+    global _execution_stats_service
+    if _execution_stats_service is None:
+        _execution_stats_service = ExecutionStatsService()
+    return _execution_stats_service
+
+
+def _current_values(target: TestExecution) -> Dict:
+    return {name: getattr(target, name) for name in STAT_FIELDS}
+
+
+def _on_after_insert(mapper, connection, target):
+    """新建执行记录后计入汇总"""
+    get_execution_stats_service().record([_current_values(target)], executor=connection)
+
+
+def _on_after_update(mapper, connection, target):
+    """执行记录的汇总字段变化时，撤销旧值并计入新值"""
+    attrs = inspect(target).attrs
+    if not any(attrs[name].history.has_changes() for name in STAT_FIELDS):
+        return
+    previous = {}
+    for name in STAT_FIELDS:
+        history = attrs[name].history
+        previous[name] = history.deleted[0] if history.deleted else getattr(target, name)
+    service = get_execution_stats_service()
+    service.record([previous], sign=-1, executor=connection)
+    service.record([_current_values(target)], executor=connection)
+
+
+def _on_after_delete(mapper, connection, target):
+    """物理删除执行记录后从汇总中扣除"""
+    attrs = inspect(target).attrs
+    previous = {}
+    for name in STAT_FIELDS:
+        history = attrs[name].history
+        previous[name] = history.deleted[0] if history.deleted else getattr(target, name)
+    get_execution_stats_service().record([previous], sign=-1, executor=connection)
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+def register_execution_stats_hooks():
+    """注册执行汇总增量维护的 ORM 事件（重复调用安全）"""
+    handlers = (
+        ('after_insert', _on_after_insert),
+        ('after_update', _on_after_update),
+        ('after_delete', _on_after_delete),
+    )
+    for identifier, handler in handlers:
+        if not event.contains(TestExecution, identifier, handler):
+            event.listen(TestExecution, identifier, handler)
+    # 对象提交后属性已过期，赋值前需先加载原值，否则修改历史中没有旧值，无法撤销旧的汇总
+    for name in STAT_FIELDS:
+        attribute = getattr(TestExecution, name)
+        if not event.contains(attribute, 'set', _keep_previous_value):
+            event.listen(attribute, 'set', _keep_previous_value, active_history=True, retval=True)
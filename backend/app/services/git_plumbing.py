@@ -0,0 +1,195 @@
+"""
+Git 底层命令封装
+供 Git 仓库同步服务使用，尽量减少子进程数量：
+- commit 信息通过一次 git log -1 --format 获取
+- 树对象与文件内容通过常驻的 git cat-file --batch 进程按需读取，不依赖工作区
+"""
+import subprocess
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+
+class GitError(Exception):
+    """Git 命令执行失败"""
+    pass
+
+
+# git log 输出中字段之间以 NUL 分隔（提交信息中不会出现 NUL），格式串中用占位符 %x00 表示
+_FIELD_SEPARATOR = '\x00'
+_COMMIT_FORMAT = '%x00'.join(['%H', '%an', '%ct', '%B'])
+
+# 树对象条目类型
+TREE_MODE = '40000'
+SUBMODULE_MODE = '160000'
+
+
+class CatFileBatch:
+    """常驻的 git cat-file --batch 进程（线程安全）"""
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ['git', 'cat-file', '--batch'],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        return self._process
+
+    def read(self, object_name: str) -> Optional[Tuple[str, str, bytes]]:
+        """
+        读取对象
+
+        Args:
+            object_name: 对象名，可以是 sha 或 <rev>:<path> 形式
+
+        Returns:
+            Optional[Tuple[str, str, bytes]]: (对象sha, 对象类型, 内容)，对象不存在时返回 None
+        """
+        if '\n' in object_name:
+            raise ValueError('对象名不能包含换行')
+        with self._lock:
+            process = self._ensure_process()
+            try:
+                process.stdin.write(object_name.encode('utf-8') + b'\n')
+                process.stdin.flush()
+                header = process.stdout.readline().decode('utf-8').rstrip('\n')
+                if not header:
+                    raise GitError('git cat-file 进程已退出')
+                parts = header.split(' ')
+                if len(parts) != 3:
+                    # "<object> missing" / "<object> ambiguous"
+                    return None
+                sha, object_type, size = parts[0], parts[1], int(parts[2])
+                content = process.stdout.read(size)
+                process.stdout.read(1)  # 内容后的换行
+                return sha, object_type, content
+            except (OSError, ValueError) as e:
+                self.close()
+                raise GitError(f'git cat-file 读取失败: {e}')
+
+    def close(self):
+        """结束进程"""
+        process, self._process = self._process, None
+        if process is not None and process.poll() is None:
+            try:
+                process.stdin.close()
+                process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+
+
+class GitRepo:
+    """本地 Git 仓库"""
+
+    def __init__(self, repo_path: str, env: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            repo_path: 仓库路径
+            env: 执行 git 命令时的环境变量（如 GIT_SSH_COMMAND），为空时继承当前进程
+        """
+        self.repo_path = repo_path
+        self.env = env
+        self._cat_file: Optional[CatFileBatch] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def run(self, *args: str) -> str:
+        """
+        执行 git 命令并返回标准输出
+
+        Raises:
+            GitError: 命令执行失败
+        """
+        try:
+            result = subprocess.run(['git', *args], cwd=self.repo_path, env=self.env,
+                                    capture_output=True, text=True, encoding='utf-8', check=True)
+        except subprocess.CalledProcessError as e:
+            raise GitError((e.stderr or str(e)).strip())
+        return result.stdout
+
+    def commit_info(self, rev: str = 'HEAD') -> Dict:
+        """
+        获取 commit 信息（一次 git log 调用）
+
+        Returns:
+            Dict: {'hash', 'message', 'author', 'date'}，date 为 UTC 时间（不含时区信息）
+        """
+        output = self.run('log', '-1', f'--format={_COMMIT_FORMAT}', rev)
+        commit_hash, author, timestamp, message = output.split(_FIELD_SEPARATOR, 3)
+        return {
+            'hash': commit_hash.strip(),
+            'message': message.strip(),
+            'author': author,
+            'date': datetime.fromtimestamp(int(timestamp), tz=timezone.utc).replace(tzinfo=None)
+        }
+
+    def diff_names(self, old_rev: str, new_rev: str, path: str = '') -> List[str]:
+        """两个版本之间有变化的文件路径（不做重命名检测，重命名表现为删除+新增）"""
+        args = ['diff', '--name-only', '-z', '--no-renames', old_rev, new_rev]
+        if path:
+            args += ['--', path]
+        return [name for name in self.run(*args).split('\0') if name]
+
+    @property
+    def cat_file(self) -> CatFileBatch:
+        """常驻的 cat-file 进程，首次使用时启动"""
+        if self._cat_file is None:
+            self._cat_file = CatFileBatch(self.repo_path)
+        return self._cat_file
+
+    def read_tree(self, object_name: str) -> Optional[Dict[str, Tuple[str, str]]]:
+        """
+        读取树对象的直接子项
+
+        Args:
+            object_name: 树对象，如 'HEAD:skills' 或树的 sha
+
+        Returns:
+            Optional[Dict[str, Tuple[str, str]]]: {名称: (模式, sha)}，对象不存在或不是目录时返回 None
+        """
+        result = self.cat_file.read(object_name)
+        if result is None or result[1] != 'tree':
+            return None
+        tree_sha, _, content = result
+        # 树对象格式: "<模式> <名称>\0<二进制sha>"，sha 长度与对象名一致（SHA-1 为20字节，SHA-256 为32字节）
+        sha_size = len(tree_sha) // 2
+        entries = {}
+        position = 0
+        while position < len(content):
+            space = content.index(b' ', position)
+            nul = content.index(b'\0', space)
+            mode = content[position:space].decode('ascii')
+            name = content[space + 1:nul].decode('utf-8', 'surrogateescape')
+            entries[name] = (mode, content[nul + 1:nul + 1 + sha_size].hex())
+            position = nul + 1 + sha_size
+        return entries
+
+    def read_blob(self, object_name: str) -> Optional[bytes]:
+        """读取文件内容，对象不存在或不是文件时返回 None"""
+        result = self.cat_file.read(object_name)
+        if result is None or result[1] != 'blob':
+            return None
+        return result[2]
+
+    def close(self):
+        """结束常驻进程"""
+        if self._cat_file is not None:
+            self._cat_file.close()
+            self._cat_file = None
+
+
+def rev_path(rev: str, path: str) -> str:
+    """构造 <rev>:<path> 形式的对象名，path 为空时表示根目录"""
+    return f'{rev}:{path.strip("/")}' if path.strip('/') else f'{rev}^{{tree}}'
@@ -1,11 +1,11 @@
 """
 Git 仓库同步服务
-用于从 Git 仓库同步技能文件
+用于从 Git 仓库同步技能文件；技能文件通过 git cat-file --batch 从 HEAD 的树对象中读取（app.services.git_plumbing）
 """
 import os
-import re
+import hashlib
+import posixpath
 import json
-import yaml
 import shutil
 import subprocess
 import stat
@@ -14,10 +14,13 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from flask import current_app
+from sqlalchemy import delete, insert, update
 
 from app import db
 from app.models.skill_repository import SkillRepository, GitSkill, SkillSyncLog, GitCredential
 from app.utils.crypto import decrypt_data
+from app.services.git_plumbing import GitRepo, GitError, TREE_MODE, SUBMODULE_MODE, rev_path
+from app.services.skill_parser import find_skill_file, get_skill_parse_pool
 
 
 class GitSyncService:
@@ -32,14 +35,19 @@ class GitSyncService:
         # 确保目录存在
         os.makedirs(self.git_repos_dir, exist_ok=True)
 
-    def sync(self, repository_id: int, sync_type: str = 'manual', triggered_by: str = None) -> Dict:
+    def sync(self, repository_id: int, sync_type: str = 'manual', triggered_by: str = None, full: bool = False) -> Dict:
         """
         同步仓库
 
+        增量同步：HEAD 与上次成功同步的 commit 相同时跳过解析与入库；
+        否则通过 git diff 找出有变化的技能目录，只重新解析这些目录并更新对应记录。
+        首次同步、上次的 commit 在本地不可用或 full=True 时全量同步。
+
         Args:
             repository_id: 仓库ID
             sync_type: 同步类型 (manual, scheduled, webhook)
             triggered_by: 触发人/触发源
+            full: 是否强制全量同步
 
         Returns:
             Dict: 同步结果
@@ -68,11 +76,24 @@ class GitSyncService:
             # 克隆或拉取仓库
             repo_path, commit_info = self._clone_or_pull(repository)
 
-            # 解析技能文件
-            skills = self._parse_skills(repository, repo_path)
-
-            # 同步到数据库
-            stats = self._sync_skills_to_db(repository, skills)
+            last_commit = None if full else repository.last_synced_commit
+            if last_commit and last_commit == commit_info.get('hash'):
+                # HEAD 未变化，无需解析和入库
+                mode = 'skipped'
+                stats = {'added': 0, 'updated': 0, 'deleted': 0}
+            else:
+                changed_dirs = self._get_changed_skill_dirs(repository, repo_path, last_commit, commit_info.get('hash')) \
+                    if last_commit else None
+                if changed_dirs is None:
+                    mode = 'full'
+                    skills = self._parse_skills(repository, repo_path)
+                    stats = self._sync_skills_to_db(repository, skills)
+                else:
+                    # 只重新解析有变化的技能目录，入库范围限定为这些目录
+                    mode = 'incremental'
+                    skills = self._parse_skills(repository, repo_path, only_dirs=changed_dirs)
+                    scope = {self._skill_file_path(repository, name) for name in changed_dirs}
+                    stats = self._sync_skills_to_db(repository, skills, scope=scope)
 
             # 更新同步日志
             sync_log.status = 'success'
@@ -88,13 +109,16 @@ class GitSyncService:
             repository.status = 'success'
             repository.last_sync_at = datetime.utcnow()
             repository.last_sync_status = 'success'
-            repository.last_sync_message = '同步成功'
-            repository.skills_count = GitSkill.query.filter_by(repository_id=repository_id).count()
+            repository.last_sync_message = '同步成功' if mode != 'skipped' else '同步成功（无变更）'
+            repository.last_synced_commit = commit_info.get('hash') or None
+            if mode != 'skipped':
+                repository.skills_count = GitSkill.query.filter_by(repository_id=repository_id).count()
 
             db.session.commit()
 
             return {
                 'success': True,
+                'mode': mode,
                 'stats': stats,
                 'commit_info': commit_info
             }
@@ -232,85 +256,20 @@ class GitSyncService:
                 env['GIT_SSH_COMMAND'] = f'ssh -i {ssh_key_path} -o IdentitiesOnly=yes -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null'
 
         try:
-            cmd = ['git', 'fetch', 'origin', branch]
-            subprocess.run(cmd, cwd=repo_path, env=env, check=True, capture_output=True, text=True)
-
-            cmd = ['git', 'checkout', branch]
-            subprocess.run(cmd, cwd=repo_path, check=True, capture_output=True, text=True)
-
-            cmd = ['git', 'reset', '--hard', f'origin/{branch}']
-            subprocess.run(cmd, cwd=repo_path, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            raise Exception(f'Git pull failed: {e.stderr}')
+            repo = GitRepo(repo_path, env=env)
+            repo.run('fetch', 'origin', branch)
+            # 切换到分支并重置为远程最新版本（等同于 checkout + reset --hard）
+            repo.run('checkout', '--force', '-B', branch, f'origin/{branch}')
+        except GitError as e:
+            raise Exception(f'Git pull failed: {e}')
 
     def _get_commit_info(self, repo_path: str, branch: str) -> Dict:
         """获取commit信息"""
         try:
-            # 获取commit hash
-            result = subprocess.run(
-                ['git', 'rev-parse', 'HEAD'],
-                cwd=repo_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            commit_hash = result.stdout.strip() if result.stdout else ''
-
-            # 获取commit message
-            result = subprocess.run(
-                ['git', 'log', '-1', '--pretty=%B'],
-                cwd=repo_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            commit_message = result.stdout.strip() if result.stdout else ''
-
-            # 获取commit author
-            result = subprocess.run(
-                ['git', 'log', '-1', '--pretty=%an'],
-                cwd=repo_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            commit_author = result.stdout.strip() if result.stdout else ''
-
-            # 获取commit date
-            result = subprocess.run(
-                ['git', 'log', '-1', '--pretty=%ci'],
-                cwd=repo_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            commit_date_str = result.stdout.strip() if result.stdout else ''
-
-            try:
-                commit_date = datetime.strptime(commit_date_str, '%Y-%m-%d %H:%M:%S %z')
-                # 转换为UTC并去掉时区信息
-                commit_date = commit_date.replace(tzinfo=None)
-            except:
-                commit_date = datetime.utcnow()
-
-            return {
-                'hash': commit_hash,
-                'message': commit_message,
-                'author': commit_author,
-                'date': commit_date
-            }
-        except subprocess.CalledProcessError as e:
-            # Git命令失败，返回默认值
-            current_app.logger.error(f'Failed to get commit info: {e.stderr if e.stderr else str(e)}')
-            return {
-                'hash': '',
-                'message': '',
-                'author': '',
-                'date': datetime.utcnow()
-            }
+            return GitRepo(repo_path).commit_info('HEAD')
         except Exception as e:
-            # 其他错误，返回默认值
-            current_app.logger.error(f'Error getting commit info: {str(e)}')
+            # Git命令失败，返回默认值
+            current_app.logger.error(f'Failed to get commit info: {str(e)}')
             return {
                 'hash': '',
                 'message': '',
@@ -318,7 +277,57 @@ class GitSyncService:
                 'date': datetime.utcnow()
             }
 
-    def _parse_skills(self, repository: SkillRepository, repo_path: str) -> List[Dict]:
+    @staticmethod
+    def _skills_rel_path(repository: SkillRepository) -> str:
+        """技能路径相对仓库根目录的路径（仓库根目录为空字符串）"""
+        rel_path = posixpath.normpath((repository.skills_path or '/').replace('\\', '/').strip('/') or '.')
+        return '' if rel_path == '.' else rel_path
+
+    def _skill_file_path(self, repository: SkillRepository, skill_dir_name: str) -> str:
+        """技能目录对应的 GitSkill.file_path（相对仓库根目录）"""
+        skills_rel = self._skills_rel_path(repository)
+        return posixpath.join(skills_rel, skill_dir_name) if skills_rel else skill_dir_name
+
+    def _get_changed_skill_dirs(self, repository: SkillRepository, repo_path: str,
+                                old_hash: str, new_hash: str) -> Optional[List[str]]:
+        """
+        获取两个 commit 之间有文件变化的技能目录
+
+        Args:
+            repository: 仓库对象
+            repo_path: 仓库路径
+            old_hash: 上次同步的 commit
+            new_hash: 当前 commit
+
+        Returns:
+            Optional[List[str]]: 技能目录名列表（含已删除的目录）；无法比较时返回 None，需全量同步
+        """
+        if not old_hash or not new_hash:
+            return None
+
+        skills_rel = self._skills_rel_path(repository)
+        try:
+            changed_paths = GitRepo(repo_path).diff_names(old_hash, new_hash, skills_rel)
+        except GitError as e:
+            # 上次的 commit 在本地不可用（如仓库被重新克隆），回退为全量同步
+            current_app.logger.warning(f'无法比较 {old_hash[:8]}..{new_hash[:8]}，将全量同步: {e}')
+            return None
+
+        prefix = f'{skills_rel}/' if skills_rel else ''
+        changed_dirs = set()
+        for path in changed_paths:
+            if not path.startswith(prefix):
+                continue
+            parts = path[len(prefix):].split('/')
+            # 技能路径下的文件不属于任何技能目录，隐藏目录不作为技能
+            if len(parts) > 1 and not parts[0].startswith('.'):
+                changed_dirs.add(parts[0])
+
+        current_app.logger.info(f'{old_hash[:8]}..{new_hash[:8]} 有 {len(changed_dirs)} 个技能目录变化')
+        return sorted(changed_dirs)
+
+    def _parse_skills(self, repository: SkillRepository, repo_path: str,
+                      only_dirs: Optional[List[str]] = None) -> List[Dict]:
         """
         解析技能目录 - 参考 Claude Code Skills 格式
 
@@ -338,345 +347,152 @@ class GitSyncService:
         Args:
             repository: 仓库对象
             repo_path: 仓库路径
+            only_dirs: 只解析这些技能目录（增量同步），已不存在的目录会被忽略
 
         Returns:
             List[Dict]: 技能列表
         """
         skills = []
-        skills_path = os.path.join(repo_path, repository.skills_path.lstrip('/'))
-
-        if not os.path.exists(skills_path):
-            current_app.logger.warning(f'技能路径不存在: {skills_path}')
-            return skills
-
-        # 遍历技能路径下的直接子目录（每个目录代表一个技能）
-        try:
-            for item in sorted(os.listdir(skills_path)):
-                item_path = os.path.join(skills_path, item)
+        skills_rel = self._skills_rel_path(repository)
+        tasks = []
 
-                # 只处理目录，跳过文件
-                if not os.path.isdir(item_path):
-                    continue
-
-                # 跳过隐藏目录
-                if item.startswith('.'):
-                    continue
+        # 从 HEAD 的树对象读取技能路径下的直接子目录（每个目录代表一个技能），文件内容共用一个 cat-file 进程读取
+        with GitRepo(repo_path) as repo:
+            try:
+                entries = repo.read_tree(rev_path('HEAD', skills_rel))
+                if entries is None:
+                    current_app.logger.warning(f'技能路径不存在: {repository.skills_path}')
+                    return skills
+
+                items = only_dirs if only_dirs is not None else entries.keys()
+                for item in sorted(items):
+                    entry = entries.get(item)
+
+                    # 只处理目录，跳过文件
+                    if entry is None or entry[0] != TREE_MODE:
+                        continue
+
+                    # 跳过隐藏目录
+                    if item.startswith('.'):
+                        continue
+
+                    # 技能目录下的文件（不含子目录与子模块）
+                    files = {
+                        name: sha
+                        for name, (mode, sha) in (repo.read_tree(entry[1]) or {}).items()
+                        if mode not in (TREE_MODE, SUBMODULE_MODE)
+                    }
+
+                    # 优先 SKILL.md，其次脚本文件
+                    skill_file = find_skill_file(files)
+                    if skill_file is None:
+                        current_app.logger.warning(f'跳过技能目录 {item}: 没有 SKILL.md 或支持的脚本文件')
+                        continue
+
+                    try:
+                        content = self._read_text(repo, files[skill_file])
+                    except Exception as e:
+                        current_app.logger.warning(f'解析技能目录失败 {item}: {str(e)}')
+                        continue
+                    tasks.append((item, self._skill_file_path(repository, item), skill_file, content))
 
-                # 解析技能目录
-                skill = self._parse_skill_directory(repository, item, item_path, repo_path)
-                if skill:
-                    skills.append(skill)
+            except Exception as e:
+                current_app.logger.error(f'遍历技能目录失败: {str(e)}')
 
-        except Exception as e:
-            current_app.logger.error(f'遍历技能目录失败: {str(e)}')
+        # 解析 front matter 等 CPU 密集部分，技能目录较多时分发到进程池，结果保持目录名顺序
+        for skill, level, message in get_skill_parse_pool().map(tasks):
+            current_app.logger.log(level, message)
+            if skill:
+                skills.append(skill)
 
         current_app.logger.info(f'成功解析 {len(skills)} 个技能')
         return skills
 
-    def _parse_skill_directory(self, repository: SkillRepository, skill_dir_name: str, skill_dir_path: str, repo_path: str) -> Optional[Dict]:
-        """
-        解析单个技能目录 - 参考 Claude Code Skills 格式
-
-        SKILL.md 格式:
-        ---
-        name: pdf
-        description: Extract and analyze text from PDF documents. Use when users ask to process or read PDFs.
-        ---
-
-        # PDF Processing Skill
-
-        Use the extract_text.py script in this folder to extract text from PDFs...
-
-        Args:
-            repository: 仓库对象
-            skill_dir_name: 技能目录名
-            skill_dir_path: 技能目录完整路径
-            repo_path: 仓库根路径
-
-        Returns:
-            Optional[Dict]: 技能信息
-        """
-        try:
-            # 优先查找 SKILL.md（Claude Code 标准）
-            skill_md_files = ['SKILL.md', 'skill.md']
-            skill_md_path = None
-
-            for md_file in skill_md_files:
-                test_path = os.path.join(skill_dir_path, md_file)
-                if os.path.exists(test_path):
-                    skill_md_path = test_path
-                    break
-
-            # 默认技能信息
-            skill_info = {
-                'name': skill_dir_name,
-                'code': skill_dir_name.lower().replace('-', '_').replace(' ', '_'),
-                'description': f'The {skill_dir_name} skill',
-                'script_content': '',
-                'script_type': 'markdown',
-                'params_schema': None,
-                'file_path': os.path.relpath(skill_dir_path, repo_path).replace('\\', '/')
-            }
-
-            if skill_md_path:
-                # 读取 SKILL.md 文件
-                with open(skill_md_path, 'r', encoding='utf-8') as f:
-                    md_content = f.read()
-
-                # 提取 YAML front matter 和描述
-                metadata = self._extract_skill_metadata(md_content)
-                skill_info.update(metadata)
-
-                # 完整的 SKILL.md 内容作为技能内容
-                skill_info['script_content'] = md_content
-                skill_info['script_type'] = 'markdown'
-
-                current_app.logger.info(f'解析技能: {skill_info["name"]} - {skill_info["description"][:50]}...')
-            else:
-                # 没有 SKILL.md，尝试找其他脚本文件
-                script_file = self._find_script_file(skill_dir_path)
-                if script_file:
-                    with open(script_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-
-                    file_ext = os.path.splitext(script_file)[1].lower()
-                    skill_info['script_content'] = content
-                    skill_info['script_type'] = self._get_script_type(file_ext)
-
-                    # 尝试从脚本文件提取元数据
-                    metadata = self._extract_metadata(content, file_ext)
-                    if metadata.get('name'):
-                        skill_info.update(metadata)
-
-                    current_app.logger.info(f'解析技能(从脚本): {skill_info["name"]}')
-                else:
-                    current_app.logger.warning(f'跳过技能目录 {skill_dir_name}: 没有 SKILL.md 或支持的脚本文件')
-                    return None
-
-            return skill_info
-
-        except Exception as e:
-            current_app.logger.warning(f'解析技能目录失败 {skill_dir_path}: {str(e)}')
-            return None
-
-    def _find_script_file(self, skill_dir_path: str) -> Optional[str]:
-        """
-        在技能目录中查找脚本文件
-
-        Args:
-            skill_dir_path: 技能目录路径
-
-        Returns:
-            Optional[str]: 脚本文件路径
-        """
-        # 优先级顺序：.py > .js > .yaml > .yml > .json
-        for ext in ['.py', '.js', '.yaml', '.yml', '.json']:
-            for filename in os.listdir(skill_dir_path):
-                if filename.endswith(ext):
-                    return os.path.join(skill_dir_path, filename)
-        return None
-
-    def _extract_skill_metadata(self, md_content: str) -> Dict:
-        """
-        从 skill.md 中提取技能元数据
-
-        支持格式：
-        ---
-        name: skill-name
-        description: Skill description
-        ---
-
-        Args:
-            md_content: Markdown 文件内容
-
-        Returns:
-            Dict: 元数据
-        """
-        metadata = {}
-
-        # 尝试提取 YAML front matter
-        front_matter = self._extract_front_matter(md_content)
-
-        if front_matter and isinstance(front_matter, dict):
-            # 从 front matter 提取字段
-            if front_matter.get('name'):
-                metadata['name'] = front_matter.get('name')
-                # 如果没有 code 字段，从 name 生成
-                if front_matter.get('code'):
-                    metadata['code'] = front_matter.get('code')
-                else:
-                    metadata['code'] = front_matter.get('name').lower().replace('-', '_').replace(' ', '_')
-            if front_matter.get('description'):
-                metadata['description'] = front_matter.get('description')
-
-            # 处理参数定义
-            params = front_matter.get('parameters')
-            if params:
-                metadata['params_schema'] = json.dumps(params, ensure_ascii=False)
-        else:
-            # 没有 front matter，尝试从 Markdown 内容中提取
-            lines = md_content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith('# '):
-                    metadata['name'] = line[2:].strip()
-                    metadata['code'] = metadata['name'].lower().replace('-', '_').replace(' ', '_')
-                    break
-
-            # 如果没有找到描述，使用前几行非标题内容
-            if not metadata.get('description'):
-                desc_lines = []
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        desc_lines.append(line)
-                        if len(desc_lines) >= 3:
-                            break
-                metadata['description'] = ' '.join(desc_lines)[:200] if desc_lines else ''
-
-        return metadata
-
-    def _get_script_type(self, file_ext: str) -> str:
-        """获取脚本类型"""
-        type_map = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.yaml': 'yaml',
-            '.yml': 'yaml',
-            '.json': 'json'
-        }
-        return type_map.get(file_ext, 'unknown')
-
-    def _extract_metadata(self, content: str, file_ext: str) -> Dict:
-        """
-        从文件内容中提取元数据
-
-        Args:
-            content: 文件内容
-            file_ext: 文件扩展名
-
-        Returns:
-            Dict: 元数据
-        """
-        metadata = {}
-
-        if file_ext in ['.yaml', '.yml']:
-            # YAML格式，整个文件就是技能定义
-            try:
-                data = yaml.safe_load(content)
-                if isinstance(data, dict):
-                    metadata['name'] = data.get('name', metadata.get('name'))
-                    metadata['code'] = data.get('code', metadata.get('code'))
-                    metadata['description'] = data.get('description', '')
-                    metadata['params_schema'] = json.dumps(data.get('parameters')) if data.get('parameters') else None
-            except:
-                pass
-
-        elif file_ext == '.json':
-            # JSON格式
-            try:
-                data = json.loads(content)
-                if isinstance(data, dict):
-                    metadata['name'] = data.get('name', metadata.get('name'))
-                    metadata['code'] = data.get('code', metadata.get('code'))
-                    metadata['description'] = data.get('description', '')
-                    metadata['params_schema'] = json.dumps(data.get('parameters')) if data.get('parameters') else None
-            except:
-                pass
-
-        elif file_ext in ['.py', '.js']:
-            # 从注释中提取YAML front matter
-            front_matter = self._extract_front_matter(content)
-            if front_matter:
-                metadata['name'] = front_matter.get('name', metadata.get('name'))
-                metadata['code'] = front_matter.get('code', metadata.get('code'))
-                metadata['description'] = front_matter.get('description', '')
-                metadata['params_schema'] = json.dumps(front_matter.get('parameters')) if front_matter.get('parameters') else None
-
-        return metadata
-
-    def _extract_front_matter(self, content: str) -> Optional[Dict]:
-        """
-        提取YAML front matter
-
-        Args:
-            content: 文件内容
-
-        Returns:
-            Optional[Dict]: front matter数据
-        """
-        # 匹配 --- 分隔的YAML front matter
-        pattern = r'^---\s*\n(.*?)\n---\s*\n'
-        match = re.match(pattern, content, re.DOTALL)
-
-        if match:
-            try:
-                return yaml.safe_load(match.group(1))
-            except:
-                pass
-
-        return None
-
-    def _sync_skills_to_db(self, repository: SkillRepository, skills: List[Dict]) -> Dict:
+    @staticmethod
+    def _read_text(repo: GitRepo, blob_sha: str) -> str:
+        """读取文本文件内容，换行统一为 LF（与按文本模式读取工作区文件一致）"""
+        content = repo.read_blob(blob_sha)
+        if content is None:
+            raise GitError(f'文件对象不存在: {blob_sha}')
+        return content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+    # 由技能文件解析得到、参与内容摘要的字段
+    SKILL_FIELDS = ('name', 'code', 'description', 'script_content', 'script_type', 'params_schema')
+
+    @classmethod
+    def _content_hash(cls, skill_data: Dict) -> str:
+        """技能内容摘要（解析结果各字段的 SHA-256）"""
+        content = {field: skill_data.get(field) for field in cls.SKILL_FIELDS}
+        return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _sync_skills_to_db(self, repository: SkillRepository, skills: List[Dict],
+                           scope: Optional[set] = None) -> Dict:
         """
         同步技能到数据库
 
+        按内容摘要判断变化：摘要相同的技能不写库，有变化的技能批量 UPDATE，新技能批量 INSERT，
+        不再存在的技能批量 DELETE
+
         Args:
             repository: 仓库对象
             skills: 技能列表
+            scope: 增量同步时本次涉及的技能路径（file_path），范围外的记录保持不变；None 表示全量
 
         Returns:
             Dict: 统计信息
         """
         stats = {'added': 0, 'updated': 0, 'deleted': 0}
+        if scope is not None and not scope:
+            return stats
+
+        # 获取当前数据库中的技能（只取比对所需的列，不加载技能内容）
+        query = db.session.query(GitSkill.id, GitSkill.file_path, GitSkill.content_hash) \
+            .filter(GitSkill.repository_id == repository.id)
+        if scope is not None:
+            query = query.filter(GitSkill.file_path.in_(scope))
+        existing_skills = {row.file_path: row for row in query.all()}
+
+        # 尚未记录摘要的旧记录按字段比对一次，内容相同时只补写摘要，不计为更新
+        legacy_ids = [row.id for row in existing_skills.values() if row.content_hash is None]
+        legacy_contents = {
+            row.id: {field: getattr(row, field) for field in self.SKILL_FIELDS}
+            for row in db.session.query(GitSkill.id, *(getattr(GitSkill, field) for field in self.SKILL_FIELDS))
+            .filter(GitSkill.id.in_(legacy_ids)).all()
+        } if legacy_ids else {}
+
+        now = datetime.utcnow()
+        inserts, updates, hash_only = [], [], []
+        current_paths = set()
 
-        # 获取当前数据库中的技能
-        existing_skills = {
-            skill.file_path: skill
-            for skill in GitSkill.query.filter_by(repository_id=repository.id).all()
-        }
-
-        # 当前同步的技能路径集合
-        current_paths = {skill['file_path'] for skill in skills}
-
-        # 更新或添加技能
         for skill_data in skills:
-            existing_skill = existing_skills.get(skill_data['file_path'])
-
-            if existing_skill:
-                # 更新现有技能
-                existing_skill.name = skill_data['name']
-                existing_skill.code = skill_data['code']
-                existing_skill.description = skill_data['description']
-                existing_skill.script_content = skill_data['script_content']
-                existing_skill.script_type = skill_data['script_type']
-                existing_skill.params_schema = skill_data['params_schema']
-                existing_skill.file_path = skill_data['file_path']
-                existing_skill.updated_at = datetime.utcnow()
-                stats['updated'] += 1
+            current_paths.add(skill_data['file_path'])
+            content_hash = self._content_hash(skill_data)
+            existing = existing_skills.get(skill_data['file_path'])
+            values = {field: skill_data[field] for field in self.SKILL_FIELDS}
+
+            if existing is None:
+                inserts.append(dict(values, repository_id=repository.id, file_path=skill_data['file_path'],
+                                    content_hash=content_hash, created_at=now, updated_at=now))
+            elif existing.content_hash == content_hash:
+                continue
+            elif existing.content_hash is None and legacy_contents.get(existing.id) == values:
+                hash_only.append({'id': existing.id, 'content_hash': content_hash})
             else:
-                # 添加新技能
-                new_skill = GitSkill(
-                    repository_id=repository.id,
-                    name=skill_data['name'],
-                    code=skill_data['code'],
-                    description=skill_data['description'],
-                    script_content=skill_data['script_content'],
-                    script_type=skill_data['script_type'],
-                    params_schema=skill_data['params_schema'],
-                    file_path=skill_data['file_path']
-                )
-                db.session.add(new_skill)
-                stats['added'] += 1
-
-        # 删除不再存在的技能
-        for file_path, skill in existing_skills.items():
-            if file_path not in current_paths:
-                db.session.delete(skill)
-                stats['deleted'] += 1
+                updates.append(dict(values, id=existing.id, content_hash=content_hash, updated_at=now))
+
+        deleted_ids = [row.id for file_path, row in existing_skills.items() if file_path not in current_paths]
 
+        if inserts:
+            db.session.execute(insert(GitSkill), inserts)
+        if updates or hash_only:
+            db.session.execute(update(GitSkill), updates + hash_only)
+        if deleted_ids:
+            db.session.execute(delete(GitSkill).where(GitSkill.id.in_(deleted_ids)))
         db.session.commit()
 
+        stats['added'] = len(inserts)
+        stats['updated'] = len(updates)
+        stats['deleted'] = len(deleted_ids)
         return stats
 
     def _remove_readonly(self, func, path, excinfo):
@@ -0,0 +1,448 @@
+"""
+后台任务队列
+任务持久化在 background_jobs 表中，无需额外的消息中间件：
+- submit() 写入 pending 状态的任务
+- 每个进程内有一个调度线程轮询待执行任务，通过条件更新抢占，
+  多 worker 部署时同一任务只会被一个进程执行
+- 抢占到的任务交给有界线程池执行，处理函数通过 JobContext 汇报进度、检查取消
+- 心跳超时的 running 任务（所在进程已退出）按 max_attempts 重新排队或标记失败
+- 处理函数通过 JobContext.emit() 记录增量事件（background_job_events），
+  订阅方按事件序号 since 拉取增量，无需反复读取完整 state
+- schedule() 登记的周期任务由调度线程按间隔自动提交，同一类型同时只保留一个未完成的任务
+- 调度线程定期清理结束超过保留天数的任务事件，以及周期任务自身的历史记录
+"""
+import os
+import json
+import socket
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import select, insert, delete, func
+
+from app import db
+from app.models import BackgroundJob, BackgroundJobEvent
+
+logger = logging.getLogger(__name__)
+
+# 任务类型 -> 处理函数
+_job_handlers: Dict[str, Callable] = {}
+
+
+def register_job_handler(job_type: str):
+    """
+    注册任务处理函数的装饰器
+
+    处理函数接收一个 JobContext 参数，正常返回视为完成，抛出异常视为失败
+    """
+    def decorator(func):
+        _job_handlers[job_type] = func
+        return func
+    return decorator
+
+
+class JobCancelled(Exception):
+    """任务已被取消，处理函数可抛出该异常提前结束"""
+    pass
+
+
+class JobContext:
+    """任务执行上下文"""
+
+    # 取消标记的最小检查间隔（秒），避免频繁查询数据库
+    CANCEL_CHECK_INTERVAL = 1.0
+
+    def __init__(self, job_id: int, payload: dict, state: dict):
+        self.job_id = job_id
+        self.payload = payload
+        self.state = state
+        # 处理函数内部并行修改 state 时需持有该锁
+        self.lock = threading.RLock()
+        # 保证同一任务的事件按序号顺序提交，订阅方按 since 拉取时不会漏掉序号更小、提交更晚的事件
+        self._save_lock = threading.Lock()
+        self._pending_events: List[dict] = []
+        self._cancelled = False
+        self._last_cancel_check = 0.0
+
+    def is_cancelled(self, refresh: bool = False) -> bool:
+        """
+        是否已请求取消
+
+        Args:
+            refresh: 忽略检查间隔，强制读取最新状态
+        """
+        if self._cancelled:
+            return True
+        now = time.monotonic()
+        if refresh or now - self._last_cancel_check >= self.CANCEL_CHECK_INTERVAL:
+            self._last_cancel_check = now
+            # 使用独立连接读取，避免处理函数所在事务的快照读到旧值
+            with db.engine.connect() as connection:
+                self._cancelled = bool(connection.execute(
+                    select(BackgroundJob.cancel_requested).where(BackgroundJob.id == self.job_id)
+                ).scalar())
+        return self._cancelled
+
+    def emit(self, event_type: str, data: dict):
+        """
+        记录一条增量事件，随下一次 save_state 与 state 在同一事务中写入
+
+        Args:
+            event_type: 事件类型
+            data: 事件数据
+        """
+        with self.lock:
+            self._pending_events.append({
+                'job_id': self.job_id,
+                'event_type': event_type,
+                'data': json.dumps(data, ensure_ascii=False),
+                'created_at': datetime.utcnow()
+            })
+
+    def save_state(self, progress: Optional[int] = None):
+        """持久化当前 state、进度及待写入的增量事件，同时刷新心跳"""
+        with self._save_lock:
+            with self.lock:
+                state = json.dumps(self.state, ensure_ascii=False)
+                events, self._pending_events = self._pending_events, []
+            values = {'state': state, 'heartbeat_at': datetime.utcnow()}
+            if progress is not None:
+                values['progress'] = progress
+            if events:
+                db.session.execute(insert(BackgroundJobEvent), events)
+            BackgroundJob.query.filter_by(id=self.job_id).update(values, synchronize_session=False)
+            db.session.commit()
+
+
+class JobQueue:
+    """后台任务队列（每个进程一个实例）"""
+
+    # 过期任务事件的清理间隔（秒）
+    CLEANUP_INTERVAL = 3600
+    # 每批清理事件的任务数
+    CLEANUP_BATCH_SIZE = 500
+
+    def __init__(self):
+        self.app = None
+        self.max_workers = 4
+        self.poll_interval = 2.0
+        self.stale_timeout = 120
+        self.event_retention_days = 7
+        self.worker_id = None
+        self._executor = None
+        self._dispatcher = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._running_ids = set()
+        # 周期任务: 任务类型 -> 间隔秒数
+        self._periodic_jobs: Dict[str, float] = {}
+        # 周期任务下次检查的时间（time.monotonic）
+        self._periodic_due: Dict[str, float] = {}
+        # 下次清理过期事件的时间（time.monotonic）
+        self._cleanup_due = 0.0
+
+    def init_app(self, app):
+        """绑定应用，并在处理第一个请求时启动调度线程（命令行场景不启动）"""
+        self.app = app
+        self.max_workers = app.config.get('JOB_WORKER_COUNT', 4)
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', 2.0)
+        self.stale_timeout = app.config.get('JOB_STALE_TIMEOUT', 120)
+        self.event_retention_days = app.config.get('JOB_EVENT_RETENTION_DAYS', 7)
+
+        @app.before_request
+        def start_job_queue():
+            self.start()
+
+    def start(self):
+        """启动调度线程与工作线程池（重复调用安全）"""
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        with self._lock:
+            if self._dispatcher is not None and self._dispatcher.is_alive():
+                return
+            # 在 fork 之后才生成标识，保证每个 worker 进程不同
+            self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+            # 启动后满一个清理周期再首次清理，避免各进程启动时同时扫描事件表
+            self._cleanup_due = time.monotonic() + self.CLEANUP_INTERVAL
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job-worker')
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True)
+            self._dispatcher.start()
+            logger.info(f'后台任务队列已启动: worker={self.worker_id}, 并发数={self.max_workers}')
+
+    def submit(self, job_type: str, payload: Optional[dict] = None, state: Optional[dict] = None,
+               created_by: Optional[str] = None, max_attempts: int = 1) -> BackgroundJob:
+        """
+        提交任务
+
+        Args:
+            job_type: 任务类型，需已通过 register_job_handler 注册
+            payload: 任务参数
+            state: 初始运行状态
+            created_by: 创建人
+            max_attempts: 最大执行次数
+
+        Returns:
+            BackgroundJob: 已持久化的任务
+        """
+        if job_type not in _job_handlers:
+            raise ValueError(f'未注册的任务类型: {job_type}')
+
+        job = BackgroundJob(
+            job_type=job_type,
+            status='pending',
+            payload=json.dumps(payload or {}, ensure_ascii=False),
+            state=json.dumps(state or {}, ensure_ascii=False),
+            created_by=created_by,
+            max_attempts=max_attempts
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def schedule(self, job_type: str, interval: float):
+        """
+        登记周期任务：距该类型最近一次提交超过 interval 秒且没有未完成的同类任务时，由调度线程提交
+
+        Args:
+            job_type: 任务类型，需已通过 register_job_handler 注册
+            interval: 间隔（秒）
+        """
+        if job_type not in _job_handlers:
+            raise ValueError(f'未注册的任务类型: {job_type}')
+        self._periodic_jobs[job_type] = interval
+        self._periodic_due.pop(job_type, None)
+
+    def get(self, job_id: int, job_type: Optional[str] = None) -> Optional[BackgroundJob]:
+        """获取任务"""
+        query = BackgroundJob.query.filter_by(id=job_id)
+        if job_type:
+            query = query.filter_by(job_type=job_type)
+        return query.first()
+
+    def cancel(self, job_id: int, job_type: Optional[str] = None) -> Optional[BackgroundJob]:
+        """
+        取消任务：未开始的任务直接置为 stopped，运行中的任务由处理函数检查到取消标记后结束
+
+        Returns:
+            BackgroundJob: 任务，不存在返回 None
+        """
+        job = self.get(job_id, job_type)
+        if job is None:
+            return None
+        if not job.is_finished:
+            job.cancel_requested = True
+            if job.status == 'pending':
+                job.status = 'stopped'
+                job.finished_at = datetime.utcnow()
+            db.session.commit()
+        return job
+
+    def get_events(self, job_id: int, since: int = 0, limit: int = 500) -> List[BackgroundJobEvent]:
+        """
+        获取任务在序号 since 之后的增量事件
+
+        Args:
+            job_id: 任务ID
+            since: 已收到的最大事件序号
+            limit: 最多返回条数
+        """
+        return BackgroundJobEvent.query.filter(
+            BackgroundJobEvent.job_id == job_id,
+            BackgroundJobEvent.id > since
+        ).order_by(BackgroundJobEvent.id).limit(limit).all()
+
+    def _dispatch_loop(self):
+        """调度循环：回收超时任务、刷新心跳、抢占待执行任务"""
+        while True:
+            try:
+                with self.app.app_context():
+                    self._recover_stale_jobs()
+                    self._heartbeat()
+                    self._submit_periodic_jobs()
+                    self._claim_jobs()
+                    self._cleanup_expired()
+            except Exception as e:
+                logger.error(f'后台任务调度失败: {e}')
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _recover_stale_jobs(self):
+        """回收心跳超时的任务（所在进程已退出）"""
+        deadline = datetime.utcnow() - timedelta(seconds=self.stale_timeout)
+        stale_jobs = BackgroundJob.query.filter(
+            BackgroundJob.status == 'running',
+            BackgroundJob.heartbeat_at < deadline
+        ).all()
+        for job in stale_jobs:
+            job.worker_id = None
+            if job.attempts < job.max_attempts and not job.cancel_requested:
+                job.status = 'pending'
+            else:
+                job.status = 'stopped' if job.cancel_requested else 'failed'
+                job.error_message = job.error_message or '执行进程已退出，任务中断'
+                job.finished_at = datetime.utcnow()
+        if stale_jobs:
+            db.session.commit()
+
+    def _heartbeat(self):
+        """刷新本进程运行中任务的心跳"""
+        with self._lock:
+            running_ids = list(self._running_ids)
+        if running_ids:
+            BackgroundJob.query.filter(BackgroundJob.id.in_(running_ids)).update(
+                {'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+
+    def _submit_periodic_jobs(self):
+        """提交到期的周期任务（多进程部署时各进程都会检查，以数据库中最近一次提交时间为准）"""
+        now = time.monotonic()
+        for job_type, interval in list(self._periodic_jobs.items()):
+            if now < self._periodic_due.get(job_type, 0):
+                continue
+            active = db.session.query(BackgroundJob.id).filter(
+                BackgroundJob.job_type == job_type,
+                BackgroundJob.status.in_(['pending', 'running'])
+            ).first()
+            last_created = db.session.query(func.max(BackgroundJob.created_at)).filter(
+                BackgroundJob.job_type == job_type
+            ).scalar()
+            elapsed = (datetime.utcnow() - last_created).total_seconds() if last_created else None
+            if active is None and (elapsed is None or elapsed >= interval):
+                self.submit(job_type, created_by='system')
+                elapsed = 0
+            # 距下次到期前不再查询数据库
+            self._periodic_due[job_type] = now + max(interval - (elapsed or 0), self.poll_interval)
+
+    def _cleanup_expired(self):
+        """
+        清理结束超过保留天数的任务事件（完整日志已另存日志文件，事件只用于运行中的增量推送），
+        并删除过期的周期任务记录；保留天数为 0 时不清理
+        """
+        now = time.monotonic()
+        if self.event_retention_days <= 0 or now < self._cleanup_due:
+            return
+        self._cleanup_due = now + self.CLEANUP_INTERVAL
+        cutoff = datetime.utcnow() - timedelta(days=self.event_retention_days)
+
+        expired_jobs = select(BackgroundJob.id).where(
+            BackgroundJob.status.in_(BackgroundJob.FINISHED_STATUSES),
+            BackgroundJob.finished_at < cutoff
+        )
+        purged = 0
+        while True:
+            # 分批删除，避免单个大事务长时间锁表
+            job_ids = [row[0] for row in db.session.execute(
+                expired_jobs.where(
+                    select(BackgroundJobEvent.id).where(BackgroundJobEvent.job_id == BackgroundJob.id).exists()
+                ).limit(self.CLEANUP_BATCH_SIZE)
+            ).all()]
+            if not job_ids:
+                break
+            purged += db.session.execute(
+                delete(BackgroundJobEvent).where(BackgroundJobEvent.job_id.in_(job_ids))
+            ).rowcount
+            db.session.commit()
+
+        # 先查出ID再删除（MySQL 不允许 DELETE 的子查询引用被删除的表），事件已在上一步清理
+        removed = 0
+        if self._periodic_jobs:
+            job_ids = [row[0] for row in db.session.execute(
+                expired_jobs.where(BackgroundJob.job_type.in_(list(self._periodic_jobs)))
+            ).all()]
+            for start in range(0, len(job_ids), self.CLEANUP_BATCH_SIZE):
+                removed += db.session.execute(
+                    delete(BackgroundJob).where(BackgroundJob.id.in_(job_ids[start:start + self.CLEANUP_BATCH_SIZE]))
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.session.commit()
+        if purged or removed:
+            logger.info(f'已清理过期任务事件 {purged} 条、周期任务记录 {removed} 条')
+
+    def _claim_jobs(self):
+        """按提交顺序抢占待执行任务，数量不超过线程池空闲数"""
+        with self._lock:
+            free_slots = self.max_workers - len(self._running_ids)
+        if free_slots <= 0:
+            return
+
+        candidate_ids = [row[0] for row in db.session.query(BackgroundJob.id).filter(
+            BackgroundJob.status == 'pending',
+            BackgroundJob.job_type.in_(list(_job_handlers))
+        ).order_by(BackgroundJob.id).limit(free_slots).all()]
+
+        now = datetime.utcnow()
+        for job_id in candidate_ids:
+            # 条件更新保证只有一个进程能抢到
+            claimed = BackgroundJob.query.filter_by(id=job_id, status='pending').update({
+                'status': 'running',
+                'worker_id': self.worker_id,
+                'started_at': now,
+                'heartbeat_at': now,
+                'attempts': BackgroundJob.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                with self._lock:
+                    self._running_ids.add(job_id)
+                self._executor.submit(self._run_job, job_id)
+
+    def _run_job(self, job_id: int):
+        """在工作线程中执行任务"""
+        try:
+            with self.app.app_context():
+                job = db.session.get(BackgroundJob, job_id)
+                context = JobContext(job_id, job.get_payload(), job.get_state())
+                handler = _job_handlers[job.job_type]
+
+                status, error_message = 'completed', None
+                try:
+                    handler(context)
+                    if context.is_cancelled(refresh=True):
+                        status = 'stopped'
+                except JobCancelled:
+                    status = 'stopped'
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f'后台任务 {job_id} 执行失败: {e}')
+                    status, error_message = 'failed', str(e)
+
+                # 写入处理函数尚未持久化的增量事件
+                context.save_state()
+                values = {
+                    'status': status,
+                    'state': json.dumps(context.state, ensure_ascii=False),
+                    'error_message': error_message,
+                    'finished_at': datetime.utcnow()
+                }
+                if status == 'completed':
+                    values['progress'] = 100
+                # 仅当任务仍归属本进程时写入终态，避免覆盖已被回收的任务
+                BackgroundJob.query.filter_by(id=job_id, status='running', worker_id=self.worker_id).update(
+                    values, synchronize_session=False
+                )
+                db.session.commit()
+        except Exception as e:
+            logger.error(f'后台任务 {job_id} 状态更新失败: {e}')
+        finally:
+            with self._lock:
+                self._running_ids.discard(job_id)
+            self._wakeup.set()
+
+
+# 全局实例
+_job_queue = None
+
+
+def get_job_queue() -> JobQueue:
+    """获取后台任务队列实例"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
@@ -0,0 +1,146 @@
+"""
+MCP 工具/资源目录缓存
+- 按 MCPServer.id 缓存最近一次发现的工具和资源列表，条目记录连接配置摘要（传输类型、命令、参数、环境变量、URL），
+  配置变化后旧条目不再命中；超过 TTL 的条目视为过期
+- MCPServer 记录更新或删除时通过 ORM 事件使本进程的缓存失效，其他进程依靠配置摘要与 TTL 保证一致
+- 工具的 input_schema 摘要用于同步时的条件写入，只改写 schema 有变化的 MCPTool 记录
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from app.models import MCPServer
+
+logger = logging.getLogger(__name__)
+
+# 参与配置摘要的字段
+CONFIG_FIELDS = ('transport_type', 'command', 'arguments', 'env', 'url')
+# 变化时使缓存失效的字段（同步、测试写入的统计字段不影响目录）
+INVALIDATING_FIELDS = CONFIG_FIELDS + ('is_enabled', 'is_deleted')
+
+
+def schema_hash(input_schema: Any) -> str:
+    """input_schema 摘要（键排序后计算，与键顺序无关）"""
+    return hashlib.sha256(
+        json.dumps(input_schema or {}, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+class MCPCatalogCache:
+    """MCP 目录缓存（线程安全，每个进程一个实例）"""
+
+    def __init__(self, ttl: float = 300):
+        """
+        Args:
+            ttl: 缓存有效期（秒），0 表示不缓存
+        """
+        self.ttl = ttl
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def config_hash(mcp_server: MCPServer) -> str:
+        """连接配置摘要"""
+        config = {name: getattr(mcp_server, name) for name in CONFIG_FIELDS}
+        return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, mcp_server: MCPServer) -> Optional[Dict[str, Any]]:
+        """
+        读取未过期且配置未变化的目录
+
+        Returns:
+            {'tools', 'resources', 'resources_error', 'fetched_at'}，未命中返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(mcp_server.id)
+        if entry is None:
+            return None
+        if entry['config_hash'] != self.config_hash(mcp_server) or time.time() - entry['fetched_at'] >= self.ttl:
+            self.invalidate(mcp_server.id)
+            return None
+        return entry['catalog']
+
+    def put(self, mcp_server: MCPServer, discovered: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        写入发现结果，资源获取失败的结果不缓存
+
+        Returns:
+            带 fetched_at 的目录
+        """
+        catalog = dict(discovered, fetched_at=time.time())
+        if self.ttl > 0 and not discovered.get('resources_error'):
+            with self._lock:
+                self._entries[mcp_server.id] = {
+                    'config_hash': self.config_hash(mcp_server),
+                    'fetched_at': catalog['fetched_at'],
+                    'catalog': catalog
+                }
+        return catalog
+
+    def get_or_fetch(self, mcp_server: MCPServer, fetch: Callable[[], Dict[str, Any]],
+                     force: bool = False) -> Dict[str, Any]:
+        """
+        读取目录，未命中或 force 时调用 fetch 重新发现
+
+        Returns:
+            目录，cached 表示是否来自缓存
+        """
+        if not force:
+            catalog = self.get(mcp_server)
+            if catalog is not None:
+                return dict(catalog, cached=True)
+        return dict(self.put(mcp_server, fetch()), cached=False)
+
+    def invalidate(self, mcp_id: int):
+        """使某个服务器的缓存失效"""
+        with self._lock:
+            self._entries.pop(mcp_id, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局实例
+_mcp_catalog_cache = None
+
+
+def get_mcp_catalog_cache() -> MCPCatalogCache:
+    """获取 MCP 目录缓存实例"""
+    global _mcp_catalog_cache
+    if _mcp_catalog_cache is None:
+        _mcp_catalog_cache = MCPCatalogCache(current_app.config.get('MCP_CATALOG_CACHE_TTL', 300))
+    return _mcp_catalog_cache
+
+
+def _on_after_update(mapper, connection, target):
+    """MCPServer 连接配置或启用状态变化后使缓存失效"""
+    if _mcp_catalog_cache is None:
+        return
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in INVALIDATING_FIELDS):
+        _mcp_catalog_cache.invalidate(target.id)
+
+
+def _on_after_delete(mapper, connection, target):
+    """MCPServer 物理删除后使缓存失效"""
+    if _mcp_catalog_cache is not None:
+        _mcp_catalog_cache.invalidate(target.id)
+
+
+def register_mcp_catalog_hooks():
+    """注册目录缓存失效的 ORM 事件（重复调用安全）"""
+    handlers = (
+        ('after_update', _on_after_update),
+        ('after_delete', _on_after_delete),
+    )
+    for identifier, handler in handlers:
+        if not event.contains(MCPServer, identifier, handler):
+            event.listen(MCPServer, identifier, handler)
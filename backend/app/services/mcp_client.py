@@ -6,6 +6,12 @@ import logging
 from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any, List, AsyncIterator
 
+import anyio
+import anyio.lowlevel
+import anyio.to_thread
+import mcp.types as types
+from mcp.shared.message import SessionMessage
+
 try:
     from exceptiongroup import ExceptionGroup
 except ImportError:
@@ -15,6 +21,8 @@ from mcp.client.stdio import stdio_client, StdioServerParameters
 from mcp.client.sse import sse_client
 from mcp.client.session import ClientSession
 
+from app.services.mcp_process_manager import get_mcp_process_manager
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,6 +41,84 @@ class MCPTimeoutError(MCPClientError):
     pass
 
 
+@asynccontextmanager
+async def resident_stdio_client(mcp_id: int):
+    """
+    在 MCPProcessManager 管理的常驻进程管道上收发 JSON-RPC 消息（与 stdio_client 的读写流接口一致）
+
+    进程的 stdout 由进程管理器的读取线程按行回调，经 call_soon_threadsafe 转入事件循环；
+    写入在线程中执行，避免进程不读 stdin 时阻塞事件循环。
+    请求ID的分配与响应匹配由 ClientSession 完成，多个并发请求共用同一进程。
+
+    Args:
+        mcp_id: MCP Server ID，进程需已由进程管理器启动
+
+    Raises:
+        MCPConnectionError: 进程未运行或已被其他会话占用
+    """
+    process_manager = get_mcp_process_manager()
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue()
+
+    def on_line(line: Optional[bytes]):
+        loop.call_soon_threadsafe(lines.put_nowait, line)
+
+    try:
+        generation = process_manager.attach(mcp_id, on_line)
+    except ConnectionError as e:
+        raise MCPConnectionError(str(e)) from e
+
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    async def stdout_reader():
+        try:
+            async with read_stream_writer:
+                while True:
+                    line = await lines.get()
+                    if line is None:
+                        logger.warning(f"MCP Server {mcp_id} 进程输出已结束")
+                        return
+                    line = line.decode('utf-8', 'replace').strip()
+                    if not line:
+                        continue
+                    try:
+                        message = types.JSONRPCMessage.model_validate_json(line)
+                    except Exception as exc:
+                        await read_stream_writer.send(exc)
+                        continue
+                    await read_stream_writer.send(SessionMessage(message))
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async def stdin_writer():
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    json_text = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                    await anyio.to_thread.run_sync(
+                        process_manager.write, mcp_id, generation, (json_text + '\n').encode('utf-8')
+                    )
+        except (anyio.ClosedResourceError, BrokenPipeError, OSError):
+            await anyio.lowlevel.checkpoint()
+        finally:
+            # 写入失败（进程退出）时关闭读端，让等待中的请求尽快结束
+            read_stream_writer.close()
+
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(stdout_reader)
+            tg.start_soon(stdin_writer)
+            try:
+                yield read_stream, write_stream
+            finally:
+                tg.cancel_scope.cancel()
+    finally:
+        process_manager.detach(mcp_id, on_line)
+        await read_stream.aclose()
+        await write_stream.aclose()
+
+
 class MCPClientManager:
     """MCP 客户端管理器"""
 
@@ -44,7 +130,6 @@ class MCPClientManager:
             timeout: 默认超时时间（秒）
         """
         self.timeout = timeout
-        self._connections: Dict[int, Any] = {}  # 连接缓存
 
     @asynccontextmanager
     async def get_session(
@@ -54,18 +139,22 @@ class MCPClientManager:
         args: Optional[List[str]] = None,
         env: Optional[Dict[str, str]] = None,
         url: Optional[str] = None,
-        headers: Optional[Dict[str, str]] = None
+        headers: Optional[Dict[str, str]] = None,
+        mcp_id: Optional[int] = None,
+        generation: Optional[int] = None
     ) -> AsyncIterator[ClientSession]:
         """
         获取 MCP 会话（上下文管理器）
 
         Args:
-            transport_type: 传输类型 (stdio, sse)
+            transport_type: 传输类型 (stdio, sse, resident)，resident 表示使用进程管理器的常驻进程
             command: 执行命令 (stdio 类型)
             args: 命令参数 (stdio 类型)
             env: 环境变量 (stdio 类型)
             url: SSE/HTTP URL (sse 类型)
             headers: HTTP 请求头 (sse 类型)
+            mcp_id: MCP Server ID (resident 类型)
+            generation: 常驻进程代数 (resident 类型)，仅用于区分重启前后的会话
 
         Yields:
             ClientSession 实例
@@ -90,6 +179,16 @@ class MCPClientManager:
                     logger.info("MCP 会话初始化成功")
                     yield session
 
+        elif transport_type == 'resident':
+            logger.info(f"创建常驻进程 MCP 会话: mcp_id={mcp_id}, generation={generation}")
+
+            async with resident_stdio_client(mcp_id) as (read, write):
+                async with ClientSession(read, write) as session:
+                    # 初始化会话
+                    await session.initialize()
+                    logger.info("常驻进程 MCP 会话初始化成功")
+                    yield session
+
         elif transport_type == 'sse':
             logger.info(f"创建 SSE MCP 会话: url={url}, headers={headers}")
 
@@ -1,9 +1,11 @@
 """
 MCP 操作封装
+会话从 MCP 会话池获取并跨请求复用，操作在会话池的事件循环中执行
 """
 import asyncio
 import json
 import logging
+import time
 from typing import Dict, Any, List, Optional
 
 try:
@@ -11,13 +13,16 @@ try:
 except ImportError:
     ExceptionGroup = BaseException
 
+import anyio
+from mcp.shared.exceptions import McpError
+
 from app.services.mcp_client import (
-    get_mcp_client_manager,
     MCPConnectionError,
     MCPTimeoutError,
     MCPClientError
 )
-from app.utils.async_helper import run_async
+from app.services.mcp_session_pool import get_mcp_session_pool
+from app.services.mcp_process_manager import get_mcp_process_manager
 
 logger = logging.getLogger(__name__)
 
@@ -33,18 +38,28 @@ class MCPOperations:
             mcp_server: MCPServer 模型实例
         """
         self.mcp_server = mcp_server
-        self.manager = get_mcp_client_manager(timeout=mcp_server.timeout)
+        self.timeout = mcp_server.timeout or 30
+        self.pool = get_mcp_session_pool()
 
-    def _prepare_connection_params(self) -> Dict[str, Any]:
+    def prepare_connection_params(self) -> Dict[str, Any]:
         """准备连接参数"""
         params = {
             'transport_type': self.mcp_server.transport_type
         }
 
         if self.mcp_server.transport_type == 'stdio':
-            params['command'] = self.mcp_server.command
-            params['args'] = json.loads(self.mcp_server.arguments) if self.mcp_server.arguments else []
-            params['env'] = json.loads(self.mcp_server.env) if self.mcp_server.env else None
+            # stdio 类型复用进程管理器的常驻进程，本 worker 尚未启动时按需启动
+            if not self.mcp_server.is_enabled:
+                raise MCPConnectionError("MCP Server 已禁用")
+            args = json.loads(self.mcp_server.arguments) if self.mcp_server.arguments else []
+            env = json.loads(self.mcp_server.env) if self.mcp_server.env else None
+            process_manager = get_mcp_process_manager()
+            if not process_manager.ensure_process(self.mcp_server.id, self.mcp_server.command, args, env):
+                raise MCPConnectionError("MCP Server 进程未运行（启动失败或正在重启）")
+            params['transport_type'] = 'resident'
+            params['mcp_id'] = self.mcp_server.id
+            # 进程重启后代数变化，会话池据此丢弃旧会话
+            params['generation'] = process_manager.get_process_info(self.mcp_server.id).generation
         elif self.mcp_server.transport_type == 'sse':
             params['url'] = self.mcp_server.url
             # SSE 需要设置正确的 Accept 头
@@ -52,46 +67,102 @@ class MCPOperations:
 
         return params
 
-    async def _list_tools_async(self) -> List[Dict[str, Any]]:
-        """异步获取工具列表"""
-        params = self._prepare_connection_params()
+    async def _execute(self, operation, params: Dict[str, Any]):
+        """使用会话池中该服务器的会话执行操作，operation 接收 ClientSession"""
+        # 常驻进程只能承载一个会话，并发请求在该会话上按请求ID多路复用
+        pool_size = 1 if params['transport_type'] == 'resident' else (self.mcp_server.session_pool_size or 1)
+        return await self.pool.execute(self.mcp_server.id, params, operation, pool_size=pool_size, timeout=self.timeout)
+
+    def _run(self, async_func, *args):
+        """
+        准备连接参数（可能需要启动常驻进程）后，在后台事件循环中执行异步操作，
+        建立连接与操作各自受 timeout 限制
 
+        Raises:
+            MCPTimeoutError: 建立连接与操作的整体等待超时
+        """
+        params = self.prepare_connection_params()
         try:
-            async with self.manager.get_session(**params) as session:
-                tools_response = await session.list_tools()
-
-                logger.info(f"tools_response 类型: {type(tools_response)}")
-
-                tools = []
-
-                # 处理不同的响应格式
-                if hasattr(tools_response, 'tools'):
-                    tool_list = tools_response.tools
-                elif isinstance(tools_response, list):
-                    tool_list = tools_response
-                else:
-                    logger.warning(f"未知的响应格式: {type(tools_response)}")
-                    return []
-
-                logger.info(f"tool_list 长度: {len(tool_list) if hasattr(tool_list, '__len__') else 'N/A'}")
-
-                for tool in tool_list:
-                    # 处理 Pydantic 模型
-                    if hasattr(tool, 'model_dump'):
-                        tool_dict = tool.model_dump()
-                    elif hasattr(tool, 'dict'):
-                        tool_dict = tool.dict()
-                    else:
-                        tool_dict = tool
-
-                    tools.append({
-                        'name': tool_dict.get('name', ''),
-                        'description': tool_dict.get('description', ''),
-                        'input_schema': tool_dict.get('inputSchema', tool_dict.get('input_schema', {}))
-                    })
+            return self.pool.run(async_func(params, *args), timeout=self.timeout * 2)
+        except asyncio.TimeoutError:
+            raise MCPTimeoutError("操作超时")
+
+    @staticmethod
+    def _parse_tools(tools_response) -> List[Dict[str, Any]]:
+        """解析工具列表响应"""
+        logger.info(f"tools_response 类型: {type(tools_response)}")
+
+        tools = []
 
-                logger.info(f"获取到 {len(tools)} 个工具")
-                return tools
+        # 处理不同的响应格式
+        if hasattr(tools_response, 'tools'):
+            tool_list = tools_response.tools
+        elif isinstance(tools_response, list):
+            tool_list = tools_response
+        else:
+            logger.warning(f"未知的响应格式: {type(tools_response)}")
+            return []
+
+        logger.info(f"tool_list 长度: {len(tool_list) if hasattr(tool_list, '__len__') else 'N/A'}")
+
+        for tool in tool_list:
+            # 处理 Pydantic 模型
+            if hasattr(tool, 'model_dump'):
+                tool_dict = tool.model_dump()
+            elif hasattr(tool, 'dict'):
+                tool_dict = tool.dict()
+            else:
+                tool_dict = tool
+
+            tools.append({
+                'name': tool_dict.get('name', ''),
+                'description': tool_dict.get('description', ''),
+                'input_schema': tool_dict.get('inputSchema', tool_dict.get('input_schema', {}))
+            })
+
+        logger.info(f"获取到 {len(tools)} 个工具")
+        return tools
+
+    @staticmethod
+    def _parse_resources(resources_response) -> List[Dict[str, Any]]:
+        """解析资源列表响应"""
+        logger.info(f"resources_response 类型: {type(resources_response)}")
+
+        resources = []
+
+        # 处理不同的响应格式
+        if hasattr(resources_response, 'resources'):
+            resource_list = resources_response.resources
+        elif isinstance(resources_response, list):
+            resource_list = resources_response
+        else:
+            logger.warning(f"未知的响应格式: {type(resources_response)}")
+            return []
+
+        for resource in resource_list:
+            # 处理 Pydantic 模型
+            if hasattr(resource, 'model_dump'):
+                resource_dict = resource.model_dump()
+            elif hasattr(resource, 'dict'):
+                resource_dict = resource.dict()
+            else:
+                resource_dict = resource
+
+            resources.append({
+                'uri': str(resource_dict.get('uri', '')),
+                'name': resource_dict.get('name', ''),
+                'description': resource_dict.get('description', ''),
+                'mime_type': resource_dict.get('mimeType', resource_dict.get('mime_type'))
+            })
+
+        logger.info(f"获取到 {len(resources)} 个资源")
+        return resources
+
+    async def _list_tools_async(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """异步获取工具列表"""
+        try:
+            tools_response = await self._execute(lambda session: session.list_tools(), params)
+            return self._parse_tools(tools_response)
         except asyncio.TimeoutError:
             logger.error(f"获取工具列表超时")
             raise MCPTimeoutError("操作超时")
@@ -110,42 +181,49 @@ class MCPOperations:
             MCPConnectionError: 连接失败
             MCPTimeoutError: 超时
         """
-        return run_async(self._list_tools_async())
+        return self._run(self._list_tools_async)
 
     async def _call_tool_async(
         self,
+        params: Dict[str, Any],
         tool_name: str,
         arguments: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """异步调用工具"""
-        params = self._prepare_connection_params()
-
-        async with self.manager.get_session(**params) as session:
-            result = await session.call_tool(tool_name, arguments or {})
+        result = await self._execute(lambda session: session.call_tool(tool_name, arguments or {}), params)
+        return self._parse_call_result(tool_name, result)
+
+    @staticmethod
+    def _parse_call_result(tool_name: str, result) -> Dict[str, Any]:
+        """解析工具调用结果"""
+        # 处理返回结果
+        response = {
+            'tool_name': tool_name,
+            'success': True,
+            'result': None,
+            'error': None,
+            'content': []
+        }
 
-            # 处理返回结果
-            response = {
-                'tool_name': tool_name,
-                'success': True,
-                'result': None,
-                'error': None,
-                'content': []
-            }
+        if hasattr(result, 'content'):
+            for content in result.content:
+                if hasattr(content, 'text'):
+                    response['content'].append({
+                        'type': 'text',
+                        'text': content.text
+                    })
+                elif hasattr(content, 'data'):
+                    response['content'].append({
+                        'type': 'resource',
+                        'data': content.data
+                    })
 
-            if hasattr(result, 'content'):
-                for content in result.content:
-                    if hasattr(content, 'text'):
-                        response['content'].append({
-                            'type': 'text',
-                            'text': content.text
-                        })
-                    elif hasattr(content, 'data'):
-                        response['content'].append({
-                            'type': 'resource',
-                            'data': content.data
-                        })
+        # 工具执行出错时服务器返回 isError，错误信息在 content 中
+        if getattr(result, 'isError', False):
+            response['success'] = False
+            response['error'] = '\n'.join(item['text'] for item in response['content'] if item['type'] == 'text') or '工具执行失败'
 
-            return response
+        return response
 
     def call_tool(
         self,
@@ -166,50 +244,92 @@ class MCPOperations:
             MCPConnectionError: 连接失败
             MCPTimeoutError: 超时
         """
-        return run_async(
-            self._call_tool_async(tool_name, arguments)
-        )
+        return self._run(self._call_tool_async, tool_name, arguments)
 
-    async def _list_resources_async(self) -> List[Dict[str, Any]]:
-        """异步获取资源列表"""
-        params = self._prepare_connection_params()
+    async def call_tools_async(
+        self,
+        params: Dict[str, Any],
+        calls: List[Dict[str, Any]],
+        parallel: bool = False,
+        concurrency: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        异步批量调用工具：所有调用共用一个会话，顺序执行或并发执行（并发数不超过 concurrency）
 
+        Args:
+            params: 连接参数
+            calls: [{'tool_name', 'params', 'timeout'}]，timeout 为单次调用超时（秒）
+            parallel: 是否并发执行
+            concurrency: 并发执行时的最大并发数
+
+        Returns:
+            与 calls 顺序一致的结果，单个调用失败时 success 为 False 并记录 error，不影响其他调用
+        """
+        pool_size = 1 if params['transport_type'] == 'resident' else (self.mcp_server.session_pool_size or 1)
+        semaphore = asyncio.Semaphore(max(concurrency, 1) if parallel else 1)
+
+        async def invoke(session, call):
+            tool_name = call['tool_name']
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    result = await asyncio.wait_for(
+                        session.call_tool(tool_name, call.get('params') or {}), call.get('timeout') or self.timeout)
+                    response = self._parse_call_result(tool_name, result)
+                except asyncio.TimeoutError:
+                    response = {'tool_name': tool_name, 'success': False, 'result': None,
+                                'error': '调用超时', 'content': []}
+                except Exception as e:
+                    logger.warning(f"批量调用工具 {tool_name} 失败: {e!r}")
+                    response = {'tool_name': tool_name, 'success': False, 'result': None,
+                                'error': str(e) or type(e).__name__, 'content': []}
+                response['elapsed'] = round(time.monotonic() - started, 3)
+                return response
+
+        async with self.pool.session(self.mcp_server.id, params, pool_size, self.timeout) as session:
+            return list(await asyncio.gather(*(invoke(session, call) for call in calls)))
+
+    def call_tools(
+        self,
+        calls: List[Dict[str, Any]],
+        parallel: bool = False,
+        concurrency: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        批量调用 MCP 工具
+
+        Args:
+            calls: [{'tool_name', 'params', 'timeout'}]
+            parallel: 是否并发执行
+            concurrency: 并发执行时的最大并发数
+
+        Returns:
+            与 calls 顺序一致的执行结果
+
+        Raises:
+            MCPConnectionError: 连接失败
+            MCPTimeoutError: 超时
+        """
+        params = self.prepare_connection_params()
+        # 整体等待时间：建立连接 + 顺序执行时各调用超时之和（并发时按批次估算）
+        call_timeouts = [call.get('timeout') or self.timeout for call in calls]
+        if parallel:
+            batches = -(-len(calls) // max(concurrency, 1))
+            total_timeout = self.timeout + batches * max(call_timeouts, default=0)
+        else:
+            total_timeout = self.timeout + sum(call_timeouts)
         try:
-            async with self.manager.get_session(**params) as session:
-                resources_response = await session.list_resources()
-
-                logger.info(f"resources_response 类型: {type(resources_response)}")
-
-                resources = []
-
-                # 处理不同的响应格式
-                if hasattr(resources_response, 'resources'):
-                    resource_list = resources_response.resources
-                elif isinstance(resources_response, list):
-                    resource_list = resources_response
-                else:
-                    logger.warning(f"未知的响应格式: {type(resources_response)}")
-                    return []
-
-                for resource in resource_list:
-                    # 处理 Pydantic 模型
-                    if hasattr(resource, 'model_dump'):
-                        resource_dict = resource.model_dump()
-                    elif hasattr(resource, 'dict'):
-                        resource_dict = resource.dict()
-                    else:
-                        resource_dict = resource
-
-                    resources.append({
-                        'uri': resource_dict.get('uri', ''),
-                        'name': resource_dict.get('name', ''),
-                        'description': resource_dict.get('description', ''),
-                        'mime_type': resource_dict.get('mimeType', resource_dict.get('mime_type'))
-                    })
+            return self.pool.run(self.call_tools_async(params, calls, parallel, concurrency), timeout=total_timeout)
+        except asyncio.TimeoutError:
+            raise MCPTimeoutError("批量调用超时")
 
-                logger.info(f"获取到 {len(resources)} 个资源")
-                return resources
-        except ExceptionGroup as e:
+    async def _list_resources_async(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """异步获取资源列表"""
+        try:
+            resources_response = await self._execute(lambda session: session.list_resources(), params)
+
+            return self._parse_resources(resources_response)
+        except (McpError, ExceptionGroup) as e:
             # 处理 TaskGroup 错误 - 可能是服务器不支持 resources
             logger.warning(f"MCP Server 可能不支持 resources: {e}")
             return []
@@ -228,38 +348,92 @@ class MCPOperations:
             MCPConnectionError: 连接失败
             MCPTimeoutError: 超时
         """
-        return run_async(self._list_resources_async())
+        return self._run(self._list_resources_async)
 
-    async def _read_resource_async(self, resource_uri: str) -> Dict[str, Any]:
-        """异步读取资源内容"""
-        params = self._prepare_connection_params()
+    async def discover_async(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步获取工具和资源列表：在同一个会话上并发发出两个请求
+        （需在会话池的事件循环中调用，params 由 prepare_connection_params 在同步线程中准备）
+        """
+        pool_size = 1 if params['transport_type'] == 'resident' else (self.mcp_server.session_pool_size or 1)
+        try:
+            for attempt in range(2):
+                try:
+                    async with self.pool.session(self.mcp_server.id, params, pool_size, self.timeout) as session:
+                        tools_response, resources_response = await asyncio.gather(
+                            asyncio.wait_for(session.list_tools(), self.timeout),
+                            asyncio.wait_for(session.list_resources(), self.timeout),
+                            return_exceptions=True
+                        )
+                        # 工具列表失败时在会话上下文内抛出，由会话池判断是否丢弃该会话
+                        if isinstance(tools_response, BaseException):
+                            raise tools_response
+                    break
+                except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                    # 与 MCPSessionPool.execute 一致：连接已关闭时请求未发出，换新会话重试一次
+                    if attempt:
+                        raise
+        except MCPClientError:
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"获取工具列表超时")
+            raise MCPTimeoutError("操作超时")
+        except Exception as e:
+            logger.error(f"获取工具列表失败: {e}", exc_info=True)
+            raise MCPClientError(f"获取工具列表失败: {str(e)}")
 
+        result = {'tools': self._parse_tools(tools_response), 'resources': [], 'resources_error': None}
+        if isinstance(resources_response, McpError):
+            # 服务器不支持 resources
+            logger.warning(f"MCP Server 可能不支持 resources: {resources_response}")
+        elif isinstance(resources_response, BaseException):
+            # 资源获取失败不影响工具同步
+            logger.warning(f"获取资源列表失败: {resources_response!r}")
+            result['resources_error'] = str(resources_response) or type(resources_response).__name__
+        else:
+            result['resources'] = self._parse_resources(resources_response)
+        return result
+
+    def discover(self) -> Dict[str, Any]:
+        """
+        获取 MCP 工具和资源列表
+
+        Returns:
+            {'tools', 'resources', 'resources_error'}，资源获取失败时 resources 为空并记录 resources_error
+
+        Raises:
+            MCPConnectionError: 连接失败
+            MCPTimeoutError: 超时
+        """
+        return self._run(self.discover_async)
+
+    async def _read_resource_async(self, params: Dict[str, Any], resource_uri: str) -> Dict[str, Any]:
+        """异步读取资源内容"""
         try:
-            async with self.manager.get_session(**params) as session:
-                result = await session.read_resource(resource_uri)
-
-                response = {
-                    'uri': resource_uri,
-                    'success': True,
-                    'content': []
-                }
-
-                for content in result.contents:
-                    if hasattr(content, 'text'):
-                        response['content'].append({
-                            'type': 'text',
-                            'text': content.text,
-                            'mime_type': content.mimeType if hasattr(content, 'mimeType') else None
-                        })
-                    elif hasattr(content, 'blob'):
-                        response['content'].append({
-                            'type': 'blob',
-                            'data': content.blob,
-                            'mime_type': content.mimeType if hasattr(content, 'mimeType') else None
-                        })
+            result = await self._execute(lambda session: session.read_resource(resource_uri), params)
 
-                return response
-        except ExceptionGroup as e:
+            response = {
+                'uri': resource_uri,
+                'success': True,
+                'content': []
+            }
+
+            for content in result.contents:
+                if hasattr(content, 'text'):
+                    response['content'].append({
+                        'type': 'text',
+                        'text': content.text,
+                        'mime_type': content.mimeType if hasattr(content, 'mimeType') else None
+                    })
+                elif hasattr(content, 'blob'):
+                    response['content'].append({
+                        'type': 'blob',
+                        'data': content.blob,
+                        'mime_type': content.mimeType if hasattr(content, 'mimeType') else None
+                    })
+
+            return response
+        except (McpError, ExceptionGroup) as e:
             # 处理 TaskGroup 错误 - 可能是服务器不支持 resources
             logger.warning(f"MCP Server 可能不支持 resources: {e}")
             return {
@@ -286,4 +460,4 @@ class MCPOperations:
             MCPConnectionError: 连接失败
             MCPTimeoutError: 超时
         """
-        return run_async(self._read_resource_async(resource_uri))
+        return self._run(self._read_resource_async, resource_uri)
@@ -1,17 +1,24 @@
 """
 MCP Server 进程管理器
-用于管理 stdio 类型的常驻进程
+用于管理 stdio 类型的常驻进程：
+- 每个进程有一个 stdout 读取线程，按行把 JSON-RPC 消息交给当前挂接的监听者（MCP 会话的传输层），
+  stderr 由独立线程持续读出，避免管道写满阻塞进程
+- 客户端通过 attach()/write() 在常驻进程的管道上收发消息，不再另起进程
+- 监控线程检测进程意外退出，按指数退避自动重启；重启后 generation 递增，旧会话随之失效
 """
-import asyncio
-import json
+import os
 import logging
 import subprocess
 import threading
-from typing import Dict, Optional
-from dataclasses import dataclass
+import time
+from typing import Callable, Dict, Optional
+from dataclasses import dataclass, field
 
 logger = logging.getLogger(__name__)
 
+# 监听者：接收 stdout 的一行（bytes），进程输出结束时收到 None
+ProcessListener = Callable[[Optional[bytes]], None]
+
 
 @dataclass
 class ProcessInfo:
@@ -21,6 +28,16 @@ class ProcessInfo:
     command: str
     args: list
     env: dict
+    # 进程代数，每次（重新）启动递增
+    generation: int = 1
+    started_at: float = field(default_factory=time.monotonic)
+    # 连续重启次数，进程稳定运行一段时间后清零
+    restart_attempts: int = 0
+    next_restart_at: Optional[float] = None
+    listener: Optional[ProcessListener] = None
+    # 当前代进程的 stdout 是否已读到结尾
+    eof: bool = False
+    write_lock: threading.Lock = field(default_factory=threading.Lock)
 
 
 class MCPProcessManager:
@@ -29,6 +46,14 @@ class MCPProcessManager:
     _instance = None
     _lock = threading.Lock()
 
+    # 监控线程检查间隔（秒）
+    MONITOR_INTERVAL = 1.0
+    # 自动重启的初始退避与最大退避（秒）
+    RESTART_BACKOFF_BASE = 1.0
+    RESTART_BACKOFF_MAX = 60.0
+    # 进程持续运行超过该秒数视为稳定，重启退避清零
+    STABLE_PERIOD = 60.0
+
     def __new__(cls):
         if cls._instance is None:
             with cls._lock:
@@ -42,8 +67,75 @@ class MCPProcessManager:
             return
         self._initialized = True
         self._processes: Dict[int, ProcessInfo] = {}
+        # 各服务器最近一次启动的进程代数，停止后保留，保证重新启动时代数仍然递增
+        self._generations: Dict[int, int] = {}
+        self._processes_lock = threading.RLock()
+        self._monitor = None
         logger.info("MCP进程管理器初始化完成")
 
+    def _spawn(self, command: str, args: list, env: Optional[dict]) -> subprocess.Popen:
+        """启动进程"""
+        # 构建完整命令
+        full_command = [command] + args
+
+        # 准备环境变量
+        process_env = None
+        if env:
+            process_env = os.environ.copy()
+            process_env.update(env)
+
+        return subprocess.Popen(
+            full_command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=process_env,
+            text=False  # 使用字节模式，MCP使用JSON-RPC
+        )
+
+    def _start_readers(self, info: ProcessInfo):
+        """启动 stdout/stderr 读取线程"""
+        process, generation = info.process, info.generation
+        threading.Thread(target=self._read_stdout, args=(info, process, generation),
+                         name=f'mcp-{info.mcp_id}-stdout', daemon=True).start()
+        threading.Thread(target=self._drain_stderr, args=(info.mcp_id, process),
+                         name=f'mcp-{info.mcp_id}-stderr', daemon=True).start()
+
+    @staticmethod
+    def _read_stdout(info: ProcessInfo, process: subprocess.Popen, generation: int):
+        """读取 stdout，每行交给当前监听者"""
+        try:
+            for line in iter(process.stdout.readline, b''):
+                listener = info.listener if info.generation == generation else None
+                if listener is not None:
+                    listener(line)
+                else:
+                    logger.debug(f"MCP Server {info.mcp_id} 无会话挂接，丢弃输出: {line[:200]!r}")
+        except (OSError, ValueError):
+            pass
+        finally:
+            # 先标记结束再读取监听者，与 attach() 的顺序相反，保证结束通知不会丢失
+            if info.generation == generation:
+                info.eof = True
+            listener = info.listener if info.generation == generation else None
+            if listener is not None:
+                listener(None)
+
+    @staticmethod
+    def _drain_stderr(mcp_id: int, process: subprocess.Popen):
+        """持续读出 stderr 并记录日志"""
+        try:
+            for line in iter(process.stderr.readline, b''):
+                logger.debug(f"MCP Server {mcp_id} stderr: {line.decode('utf-8', 'replace').rstrip()}")
+        except (OSError, ValueError):
+            pass
+
+    def _ensure_monitor(self):
+        """启动进程监控线程"""
+        if self._monitor is None or not self._monitor.is_alive():
+            self._monitor = threading.Thread(target=self._monitor_loop, name='mcp-process-monitor', daemon=True)
+            self._monitor.start()
+
     def start_process(self, mcp_id: int, command: str, args: list, env: Optional[dict] = None) -> bool:
         """
         启动 MCP Server 进程
@@ -57,46 +149,49 @@ class MCPProcessManager:
         Returns:
             bool: 是否启动成功
         """
-        # 如果进程已存在，先停止
-        if mcp_id in self._processes:
-            self.stop_process(mcp_id)
+        with self._processes_lock:
+            # 如果进程已存在，先停止
+            if mcp_id in self._processes:
+                self.stop_process(mcp_id)
+            generation = self._generations.get(mcp_id, 0) + 1
 
-        try:
-            # 构建完整命令
-            full_command = [command] + args
-
-            # 准备环境变量
-            process_env = None
-            if env:
-                import os
-                process_env = os.environ.copy()
-                process_env.update(env)
-
-            # 启动进程
-            process = subprocess.Popen(
-                full_command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=process_env,
-                text=False  # 使用字节模式，MCP使用JSON-RPC
-            )
-
-            # 保存进程信息
-            self._processes[mcp_id] = ProcessInfo(
-                mcp_id=mcp_id,
-                process=process,
-                command=command,
-                args=args,
-                env=env or {}
-            )
-
-            logger.info(f"MCP Server {mcp_id} 进程启动成功: PID={process.pid}")
-            return True
+            try:
+                process = self._spawn(command, args, env)
+
+                # 保存进程信息
+                info = ProcessInfo(
+                    mcp_id=mcp_id,
+                    process=process,
+                    command=command,
+                    args=args,
+                    env=env or {},
+                    generation=generation
+                )
+                self._processes[mcp_id] = info
+                self._generations[mcp_id] = generation
+                self._start_readers(info)
+                self._ensure_monitor()
+
+                logger.info(f"MCP Server {mcp_id} 进程启动成功: PID={process.pid}")
+                return True
+
+            except Exception as e:
+                logger.error(f"MCP Server {mcp_id} 进程启动失败: {e}", exc_info=True)
+                return False
+
+    def ensure_process(self, mcp_id: int, command: str, args: list, env: Optional[dict] = None) -> bool:
+        """
+        确保进程在运行：本进程内尚未启动时启动（多 worker 部署时每个 worker 各自持有常驻进程）；
+        启动配置（命令、参数、环境变量）变化时按新配置重启；等待退避重启中的进程不会提前重启
 
-        except Exception as e:
-            logger.error(f"MCP Server {mcp_id} 进程启动失败: {e}", exc_info=True)
-            return False
+        Returns:
+            bool: 进程是否在运行
+        """
+        with self._processes_lock:
+            info = self._processes.get(mcp_id)
+            if info is None or (info.command, info.args, info.env) != (command, args, env or {}):
+                return self.start_process(mcp_id, command, args, env)
+            return info.process.poll() is None
 
     def stop_process(self, mcp_id: int) -> bool:
         """
@@ -108,12 +203,15 @@ class MCPProcessManager:
         Returns:
             bool: 是否停止成功
         """
-        if mcp_id not in self._processes:
-            logger.warning(f"MCP Server {mcp_id} 进程不存在")
-            return True
+        with self._processes_lock:
+            if mcp_id not in self._processes:
+                logger.warning(f"MCP Server {mcp_id} 进程不存在")
+                return True
+
+            # 先移出管理列表，监控线程不会再重启
+            process_info = self._processes.pop(mcp_id)
 
         try:
-            process_info = self._processes[mcp_id]
             process = process_info.process
 
             # 尝试优雅终止
@@ -130,22 +228,107 @@ class MCPProcessManager:
             # 清理资源
             if process.stdin:
                 process.stdin.close()
-            if process.stdout:
-                process.stdout.close()
-            if process.stderr:
-                process.stderr.close()
 
-            del self._processes[mcp_id]
             logger.info(f"MCP Server {mcp_id} 进程已停止")
             return True
 
         except Exception as e:
             logger.error(f"MCP Server {mcp_id} 进程停止失败: {e}", exc_info=True)
-            # 即使出错也尝试清理
-            if mcp_id in self._processes:
-                del self._processes[mcp_id]
             return False
 
+    def attach(self, mcp_id: int, listener: ProcessListener) -> int:
+        """
+        挂接到常驻进程的 stdout（同一时间只允许一个会话挂接）
+
+        Args:
+            mcp_id: MCP Server ID
+            listener: 接收 stdout 每一行的回调，进程输出结束时收到 None
+
+        Returns:
+            int: 进程代数，写入时需携带
+
+        Raises:
+            ConnectionError: 进程未运行或已有会话挂接
+        """
+        with self._processes_lock:
+            info = self._processes.get(mcp_id)
+            if info is None or info.process.poll() is not None:
+                raise ConnectionError(f"MCP Server {mcp_id} 进程未运行")
+            if info.listener is not None:
+                raise ConnectionError(f"MCP Server {mcp_id} 进程已被其他会话占用")
+            info.listener = listener
+            if info.eof:
+                info.listener = None
+                raise ConnectionError(f"MCP Server {mcp_id} 进程已退出")
+            return info.generation
+
+    def detach(self, mcp_id: int, listener: ProcessListener):
+        """解除挂接"""
+        with self._processes_lock:
+            info = self._processes.get(mcp_id)
+            if info is not None and info.listener is listener:
+                info.listener = None
+
+    def write(self, mcp_id: int, generation: int, data: bytes):
+        """
+        向常驻进程的 stdin 写入数据
+
+        Raises:
+            BrokenPipeError: 进程已退出或已重启
+        """
+        info = self._processes.get(mcp_id)
+        if info is None or info.generation != generation or info.process.poll() is not None:
+            raise BrokenPipeError(f"MCP Server {mcp_id} 进程已退出")
+        with info.write_lock:
+            info.process.stdin.write(data)
+            info.process.stdin.flush()
+
+    def _monitor_loop(self):
+        """监控线程：检测意外退出的进程，按指数退避重启"""
+        while True:
+            time.sleep(self.MONITOR_INTERVAL)
+            with self._processes_lock:
+                if not self._processes:
+                    continue
+                now = time.monotonic()
+                for info in list(self._processes.values()):
+                    try:
+                        self._check_process(info, now)
+                    except Exception as e:
+                        logger.error(f"MCP Server {info.mcp_id} 进程监控失败: {e}", exc_info=True)
+
+    def _check_process(self, info: ProcessInfo, now: float):
+        """检查单个进程，必要时安排或执行重启"""
+        if info.process.poll() is None:
+            if info.restart_attempts and now - info.started_at >= self.STABLE_PERIOD:
+                info.restart_attempts = 0
+            return
+
+        if info.next_restart_at is None:
+            delay = min(self.RESTART_BACKOFF_BASE * (2 ** info.restart_attempts), self.RESTART_BACKOFF_MAX)
+            info.next_restart_at = now + delay
+            logger.warning(f"MCP Server {info.mcp_id} 进程意外退出(code={info.process.returncode})，"
+                           f"{delay:.0f}秒后重启")
+            return
+
+        if now >= info.next_restart_at:
+            info.next_restart_at = None
+            info.restart_attempts += 1
+            try:
+                info.process = self._spawn(info.command, info.args, info.env or None)
+            except Exception as e:
+                # 启动失败时按下一级退避继续重试
+                logger.error(f"MCP Server {info.mcp_id} 进程重启失败: {e}")
+                return
+            info.generation += 1
+            self._generations[info.mcp_id] = info.generation
+            info.started_at = now
+            info.listener = None
+            info.eof = False
+            self._start_readers(info)
+            logger.info(f"MCP Server {info.mcp_id} 进程已重启: PID={info.process.pid}, "
+                        f"第{info.restart_attempts}次")
+
     def is_running(self, mcp_id: int) -> bool:
         """
         检查进程是否在运行
@@ -187,7 +370,7 @@ class MCPProcessManager:
     def get_running_count(self) -> int:
         """获取运行中的进程数量"""
         count = 0
-        for mcp_id, process_info in self._processes.items():
+        for mcp_id, process_info in list(self._processes.items()):
             if process_info.process.poll() is None:
                 count += 1
         return count
@@ -0,0 +1,355 @@
+"""
+MCP 会话池
+按 MCPServer.id 维护常驻的 MCP 会话，跨请求复用，避免每次调用都重新启动 stdio 进程并握手：
+- 所有会话运行在进程级后台事件循环线程中（app.utils.async_helper），同步代码通过 run() 提交协程
+- MCP 会话支持请求多路复用，优先复用在途请求最少的会话，
+  全部繁忙且未达到该服务器的会话数上限(session_pool_size)时才新建
+- 空闲超过健康检查间隔的会话在复用前先 ping，失败则重建；
+  选择会话时只在锁内预留，建立连接与 ping 在锁外进行，慢启动或慢 ping 不阻塞其他请求复用健康会话
+- 调用过程中出现非协议错误（进程退出、连接断开等）的会话会被丢弃，下次调用自动重连；
+  请求尚未发出即发现连接已关闭时，execute() 换用新会话重试一次
+- 空闲超过 idle_timeout 的会话由后台任务回收（常驻进程上的会话除外，进程本身常驻）；
+  服务器连接配置变化或常驻进程重启时旧会话自动失效
+"""
+import asyncio
+import atexit
+import hashlib
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import anyio
+from flask import current_app
+from mcp.client.session import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from app.services.mcp_client import get_mcp_client_manager, MCPConnectionError
+from app.utils.async_helper import get_event_loop_thread, run_async
+
+logger = logging.getLogger(__name__)
+
+
+class PooledSession:
+    """池中的单个常驻会话，由独立的协程持有连接上下文直至关闭"""
+
+    def __init__(self, server_id: int, config_key: str, resident: bool = False):
+        self.server_id = server_id
+        self.config_key = config_key
+        self.resident = resident
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+        # 正在建立连接或健康检查，其他请求暂不选用
+        self.pending = False
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def open(self, params: Dict[str, Any], timeout: float):
+        """建立连接并完成初始化握手"""
+        ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run(params, ready))
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), timeout)
+        except BaseException as e:
+            await self.close()
+            # 连接上下文内部的 TaskGroup 会把异常包装为 ExceptionGroup，取出实际原因
+            if isinstance(e, Exception) and getattr(e, 'exceptions', None):
+                cause = e
+                while getattr(cause, 'exceptions', None):
+                    cause = cause.exceptions[0]
+                raise MCPConnectionError(f'MCP 会话建立失败: {cause}') from e
+            raise
+
+    async def _run(self, params: Dict[str, Any], ready: asyncio.Future):
+        """持有连接上下文：stdio_client/sse_client 与 ClientSession 必须在同一个任务中进入和退出"""
+        try:
+            async with get_mcp_client_manager().get_session(**params) as session:
+                self.session = session
+                ready.set_result(True)
+                await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not self._stop.is_set():
+                logger.warning(f'MCP Server {self.server_id} 会话已断开: {e}')
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self.closed = True
+
+    @property
+    def is_alive(self) -> bool:
+        """会话是否可用"""
+        return not self.closed and self.session is not None and self._task is not None and not self._task.done()
+
+    async def ping(self, timeout: float) -> bool:
+        """健康检查"""
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            return True
+        except Exception as e:
+            logger.warning(f'MCP Server {self.server_id} 会话健康检查失败: {e}')
+            return False
+
+    async def close(self):
+        """关闭会话并等待连接上下文退出（stdio 进程随之结束）"""
+        self.closed = True
+        self._stop.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), 5)
+            except BaseException:
+                self._task.cancel()
+
+
+class ServerSessions:
+    """单个 MCP Server 的会话集合"""
+
+    def __init__(self):
+        self.sessions: List[PooledSession] = []
+        self.lock = asyncio.Lock()
+        # 会话完成建立连接或健康检查时通知，会话数已满且都在处理中的请求等待该条件
+        self.changed = asyncio.Condition(self.lock)
+
+
+class MCPSessionPool:
+    """MCP 会话池（每个进程一个实例）"""
+
+    # 空闲会话回收检查间隔（秒）
+    REAP_INTERVAL = 30
+
+    def __init__(self, idle_timeout: float = 300, health_check_interval: float = 60):
+        """
+        Args:
+            idle_timeout: 会话空闲超过该秒数后关闭
+            health_check_interval: 会话空闲超过该秒数时，复用前先 ping
+        """
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._servers: Dict[int, ServerSessions] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """
+        在后台事件循环中运行协程并同步等待结果
+
+        Args:
+            coro: 协程对象
+            timeout: 等待超时（秒），超时后取消协程并抛出 asyncio.TimeoutError
+        """
+        return run_async(coro, timeout)
+
+    @staticmethod
+    def config_key(params: Dict[str, Any]) -> str:
+        """连接参数摘要，配置变化后旧会话不再复用"""
+        return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    @asynccontextmanager
+    async def session(self, server_id: int, params: Dict[str, Any], pool_size: int = 1,
+                      timeout: float = 30) -> AsyncIterator[ClientSession]:
+        """
+        从池中获取会话（需在会话池的事件循环中调用）
+
+        Args:
+            server_id: MCPServer.id
+            params: MCPClientManager.get_session 的连接参数
+            pool_size: 该服务器的会话数上限
+            timeout: 建立连接/健康检查超时（秒）
+
+        Yields:
+            ClientSession 实例，退出上下文后归还池中
+        """
+        # 返回的会话已计入本次在途请求
+        pooled = await self._acquire(server_id, params, max(pool_size or 1, 1), timeout)
+        try:
+            yield pooled.session
+        except McpError as e:
+            # 协议层错误（如工具不存在）不影响会话本身，连接关闭除外
+            if e.error.code == CONNECTION_CLOSED:
+                await self._discard(server_id, pooled)
+            raise
+        except BaseException:
+            await self._discard(server_id, pooled)
+            raise
+        finally:
+            pooled.in_flight -= 1
+            pooled.last_used = time.monotonic()
+
+    async def execute(self, server_id: int, params: Dict[str, Any],
+                      operation: Callable[[ClientSession], Awaitable[Any]],
+                      pool_size: int = 1, timeout: float = 30) -> Any:
+        """
+        使用池中会话执行一次操作（需在会话池的事件循环中调用）
+
+        Args:
+            server_id: MCPServer.id
+            params: 连接参数
+            operation: 接收 ClientSession 并返回 awaitable 的函数，如 lambda s: s.list_tools()
+            pool_size: 该服务器的会话数上限
+            timeout: 建立连接及操作的超时（秒）
+
+        Returns:
+            操作结果
+        """
+        for attempt in range(2):
+            try:
+                async with self.session(server_id, params, pool_size, timeout) as session:
+                    return await asyncio.wait_for(operation(session), timeout)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                # 写入请求时连接已关闭，请求未发出，可安全地换新会话重试
+                if attempt:
+                    raise
+                logger.info(f'MCP Server {server_id} 会话已关闭，重新连接')
+
+    async def _acquire(self, server_id: int, params: Dict[str, Any], pool_size: int,
+                       timeout: float) -> PooledSession:
+        """
+        选择在途请求最少的可用会话，必要时新建，返回的会话已计入一次在途请求
+
+        锁内只选择并预留会话（计入在途请求、标记 pending），建立连接与健康检查在锁外进行，
+        完成后重新加锁确认会话仍在池中且可用，否则释放预留并重新选择
+        """
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle_sessions())
+        key = self.config_key(params)
+        while True:
+            server = self._servers.setdefault(server_id, ServerSessions())
+            async with server.changed:
+                stale = [s for s in server.sessions if not s.pending and (not s.is_alive or s.config_key != key)]
+                server.sessions = [s for s in server.sessions if s not in stale]
+                pooled, action = self._reserve(server, server_id, key, params, pool_size)
+                if action == 'wait':
+                    # 会话数已满且都在建立连接或健康检查，等待其完成后重新选择
+                    await server.changed.wait()
+            for stale_session in stale:
+                await stale_session.close()
+            if action == 'use':
+                return pooled
+            if action == 'wait':
+                continue
+
+            error = None
+            try:
+                if action == 'open':
+                    await pooled.open(params, timeout)
+                    healthy = True
+                else:
+                    healthy = await pooled.ping(timeout)
+            except BaseException as e:
+                healthy, error = False, e
+
+            async with server.changed:
+                pooled.pending = False
+                # 锁外处理期间会话可能已被关闭或移出池（服务器关闭、出错丢弃）
+                usable = healthy and pooled.is_alive and pooled in server.sessions
+                if usable:
+                    pooled.last_used = time.monotonic()
+                else:
+                    pooled.in_flight -= 1
+                    if pooled in server.sessions:
+                        server.sessions.remove(pooled)
+                server.changed.notify_all()
+
+            if usable:
+                if action == 'open':
+                    logger.info(f'MCP Server {server_id} 新建常驻会话，当前会话数: {len(server.sessions)}')
+                return pooled
+            await pooled.close()
+            if error is not None:
+                raise error
+
+    def _reserve(self, server: ServerSessions, server_id: int, key: str, params: Dict[str, Any],
+                 pool_size: int):
+        """
+        在锁内选择会话并预留（计入在途请求）
+
+        Returns:
+            (会话, 动作): use 直接使用；check 需先健康检查；open 需建立连接；wait 需等待其他会话处理完成
+        """
+        ready = [s for s in server.sessions if not s.pending]
+        pooled = min(ready, key=lambda s: s.in_flight) if ready else None
+        if pooled is None or (pooled.in_flight > 0 and len(server.sessions) < pool_size):
+            if len(server.sessions) >= pool_size:
+                return None, 'wait'
+            pooled = PooledSession(server_id, key, resident=params.get('transport_type') == 'resident')
+            server.sessions.append(pooled)
+            action = 'open'
+        elif pooled.in_flight == 0 and time.monotonic() - pooled.last_used >= self.health_check_interval:
+            action = 'check'
+        else:
+            action = 'use'
+        pooled.in_flight += 1
+        pooled.pending = action != 'use'
+        return pooled, action
+
+    async def _discard(self, server_id: int, pooled: PooledSession):
+        """丢弃出错的会话"""
+        server = self._servers.get(server_id)
+        if server is not None and pooled in server.sessions:
+            server.sessions.remove(pooled)
+        await pooled.close()
+
+    async def _close_server(self, server_id: int):
+        server = self._servers.pop(server_id, None)
+        if server is not None:
+            for pooled in server.sessions:
+                await pooled.close()
+
+    async def _reap_idle_sessions(self):
+        """后台任务：关闭空闲超时的会话"""
+        while True:
+            await asyncio.sleep(self.REAP_INTERVAL)
+            now = time.monotonic()
+            for server_id, server in list(self._servers.items()):
+                idle = [s for s in server.sessions if s.in_flight == 0 and (
+                    not s.is_alive or (not s.resident and now - s.last_used >= self.idle_timeout))]
+                for pooled in idle:
+                    server.sessions.remove(pooled)
+                    await pooled.close()
+                    logger.info(f'MCP Server {server_id} 空闲会话已回收')
+
+    def close_server(self, server_id: int):
+        """关闭某个服务器的全部会话（服务器被禁用、删除时调用）"""
+        if server_id not in self._servers:
+            return
+        try:
+            self.run(self._close_server(server_id), timeout=10)
+        except Exception as e:
+            logger.warning(f'关闭 MCP Server {server_id} 会话失败: {e}')
+
+    def close_all(self):
+        """关闭全部会话"""
+        for server_id in list(self._servers):
+            self.close_server(server_id)
+
+    def stats(self) -> Dict[int, Dict[str, int]]:
+        """各服务器的会话数与在途请求数"""
+        return {
+            server_id: {
+                'sessions': len(server.sessions),
+                'in_flight': sum(s.in_flight for s in server.sessions)
+            }
+            for server_id, server in self._servers.items()
+        }
+
+
+# 全局实例
+_mcp_session_pool = None
+
+
+def get_mcp_session_pool() -> MCPSessionPool:
+    """获取 MCP 会话池实例"""
+    global _mcp_session_pool
+    if _mcp_session_pool is None:
+        _mcp_session_pool = MCPSessionPool(
+            idle_timeout=current_app.config.get('MCP_SESSION_IDLE_TIMEOUT', 300),
+            health_check_interval=current_app.config.get('MCP_SESSION_HEALTH_CHECK_INTERVAL', 60)
+        )
+        # 先确保事件循环线程已注册退出处理，进程退出时按后注册先执行的顺序，先关闭会话再停止循环
+        get_event_loop_thread()
+        atexit.register(_mcp_session_pool.close_all)
+    return _mcp_session_pool
@@ -0,0 +1,231 @@
+"""
+MCP Server 工具/资源同步服务
+- 每个服务器在同一个会话上并发获取工具和资源列表（MCPOperations.discover_async）
+- 多个服务器的发现过程在后台事件循环中并发执行，同时连接的服务器数受 MCP_SYNC_CONCURRENCY 限制
+- 同步结果按差异写入数据库：工具按名称、资源按 URI 比对，只新增、更新、删除有变化的记录，
+  未变化的工具保留原有ID与调用记录；工具的 input_schema 按摘要比对，未变化时不改写
+- 目录缓存（mcp_catalog_cache）未过期时直接使用缓存的发现结果，不再连接服务器
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from flask import current_app
+
+from app import db
+from app.models import MCPServer, MCPTool, MCPResource
+from app.services.mcp_client import MCPConnectionError, MCPTimeoutError, MCPClientError
+from app.services.mcp_operations import MCPOperations
+from app.services.mcp_catalog_cache import get_mcp_catalog_cache, schema_hash
+from app.utils.async_helper import run_async
+
+logger = logging.getLogger(__name__)
+
+
+class MCPSyncService:
+    """MCP Server 同步服务"""
+
+    def __init__(self, concurrency: int = 8):
+        """
+        Args:
+            concurrency: 同时连接的 MCP Server 数量上限
+        """
+        self.concurrency = max(concurrency, 1)
+
+    def sync(self, servers: List[MCPServer], force: bool = False) -> List[Dict[str, Any]]:
+        """
+        并发同步多个 MCP Server 的工具和资源
+
+        Args:
+            servers: 待同步的 MCPServer 列表（调用方负责过滤已删除、已禁用的服务器）
+            force: 忽略目录缓存，重新连接服务器获取
+
+        Returns:
+            每个服务器的同步结果，顺序与 servers 一致：
+            {'id', 'name', 'success', 'error', 'code', 'tools', 'resources', 'resources_error', 'cached'}
+        """
+        cache = get_mcp_catalog_cache()
+        results: Dict[int, Dict[str, Any]] = {}
+        pending = []
+
+        # 连接参数在当前线程准备（stdio 需要确保常驻进程已启动）
+        for server in servers:
+            catalog = None if force else cache.get(server)
+            if catalog is not None:
+                results[server.id] = self._apply(server, catalog, cached=True)
+                continue
+            operations = MCPOperations(server)
+            try:
+                pending.append((server, operations, operations.prepare_connection_params()))
+            except MCPClientError as e:
+                results[server.id] = self._failure(server, e)
+
+        if pending:
+            outcomes = run_async(self._discover_all(pending))
+            for (server, _, _), outcome in zip(pending, outcomes):
+                if isinstance(outcome, BaseException):
+                    results[server.id] = self._failure(server, outcome)
+                else:
+                    results[server.id] = self._apply(server, cache.put(server, outcome))
+
+        return [results[server.id] for server in servers]
+
+    async def _discover_all(self, pending) -> List[Any]:
+        """在后台事件循环中并发执行发现，返回结果或异常"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def discover(operations: MCPOperations, params: Dict[str, Any]):
+            async with semaphore:
+                # 建立连接与请求各自受 timeout 限制
+                return await asyncio.wait_for(operations.discover_async(params), operations.timeout * 2)
+
+        return await asyncio.gather(
+            *(discover(operations, params) for _, operations, params in pending),
+            return_exceptions=True
+        )
+
+    @staticmethod
+    def _failure(server: MCPServer, error: BaseException) -> Dict[str, Any]:
+        """同步失败的结果，code 与单个同步接口的错误码一致"""
+        if isinstance(error, MCPConnectionError):
+            code, message = 503, f'MCP连接失败: {error}'
+        elif isinstance(error, (MCPTimeoutError, asyncio.TimeoutError)):
+            code, message = 504, f'MCP连接超时: {error}'
+        elif isinstance(error, MCPClientError):
+            code, message = 500, f'MCP客户端错误: {error}'
+        else:
+            code, message = 500, f'同步失败: {error}'
+        logger.error(f'MCP Server {server.id} 同步失败: {message}')
+        return {
+            'id': server.id,
+            'name': server.name,
+            'success': False,
+            'error': message,
+            'code': code
+        }
+
+    def _apply(self, server: MCPServer, discovered: Dict[str, Any], cached: bool = False) -> Dict[str, Any]:
+        """按差异写入工具和资源，每个服务器单独提交"""
+        try:
+            tools = self._apply_tools(server, discovered['tools'])
+            resources = self._apply_resources(server, discovered['resources']) \
+                if discovered['resources_error'] is None else None
+
+            server.tools_count = tools['total']
+            if resources is not None:
+                server.resources_count = resources['total']
+            server.last_sync_at = datetime.utcnow()
+            server.status = 'active'
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'MCP Server {server.id} 同步结果写入失败: {e}', exc_info=True)
+            return self._failure(server, e)
+
+        return {
+            'id': server.id,
+            'name': server.name,
+            'success': True,
+            'tools': tools,
+            'resources': resources,
+            'resources_error': discovered['resources_error'],
+            'cached': cached,
+            'tool_list': discovered['tools'],
+            'resource_list': discovered['resources']
+        }
+
+    @staticmethod
+    def _apply_tools(server: MCPServer, tools: List[Dict[str, Any]]) -> Dict[str, int]:
+        """工具按名称比对差异"""
+        existing = {tool.name: tool for tool in MCPTool.query.filter_by(mcp_id=server.id).all()}
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'total': 0}
+        seen = set()
+
+        for tool_data in tools:
+            name = tool_data.get('name', '')
+            if name in seen:
+                continue
+            seen.add(name)
+            description = tool_data.get('description', '')
+            input_schema = tool_data.get('input_schema', {})
+            input_schema_hash = schema_hash(input_schema)
+
+            tool = existing.pop(name, None)
+            if tool is None:
+                db.session.add(MCPTool(
+                    mcp_id=server.id,
+                    name=name,
+                    description=description,
+                    input_schema=json.dumps(input_schema),
+                    schema_hash=input_schema_hash
+                ))
+                counts['added'] += 1
+                continue
+
+            changed = False
+            if tool.schema_hash != input_schema_hash:
+                # 只有 schema 摘要变化（或尚未记录摘要）时才改写 schema
+                tool.input_schema = json.dumps(input_schema)
+                tool.schema_hash = input_schema_hash
+                changed = True
+            if tool.description != description:
+                tool.description = description
+                changed = True
+            if changed:
+                counts['updated'] += 1
+
+        # 已不存在的工具连同其调用记录一起删除
+        for tool in existing.values():
+            db.session.delete(tool)
+            counts['removed'] += 1
+
+        counts['total'] = len(seen)
+        return counts
+
+    @staticmethod
+    def _apply_resources(server: MCPServer, resources: List[Dict[str, Any]]) -> Dict[str, int]:
+        """资源按 URI 比对差异"""
+        existing = {resource.uri: resource for resource in MCPResource.query.filter_by(mcp_id=server.id).all()}
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'total': 0}
+        seen = set()
+
+        for resource_data in resources:
+            uri = resource_data.get('uri', '')
+            if uri in seen:
+                continue
+            seen.add(uri)
+            fields = {
+                'name': resource_data.get('name', ''),
+                'description': resource_data.get('description', ''),
+                'mime_type': resource_data.get('mime_type', '')
+            }
+
+            resource = existing.pop(uri, None)
+            if resource is None:
+                db.session.add(MCPResource(mcp_id=server.id, uri=uri, **fields))
+                counts['added'] += 1
+            elif any(getattr(resource, key) != value for key, value in fields.items()):
+                for key, value in fields.items():
+                    setattr(resource, key, value)
+                counts['updated'] += 1
+
+        for resource in existing.values():
+            db.session.delete(resource)
+            counts['removed'] += 1
+
+        counts['total'] = len(seen)
+        return counts
+
+
+# 全局实例
+_mcp_sync_service = None
+
+
+def get_mcp_sync_service() -> MCPSyncService:
+    """获取 MCP 同步服务实例"""
+    global _mcp_sync_service
+    if _mcp_sync_service is None:
+        _mcp_sync_service = MCPSyncService(current_app.config.get('MCP_SYNC_CONCURRENCY', 8))
+    return _mcp_sync_service
@@ -0,0 +1,144 @@
+"""
+用例与执行记录的项目归属
+test_cases.project_id、test_executions.project_id 冗余自用例所在套件的项目，按项目过滤时无需关联套件：
+- 通过 ORM 创建用例或修改用例的 suite_id 时，写入前按套件取项目；用例项目变化时同步其执行记录，
+  并把执行记录的按日汇总移到新项目
+- 通过 ORM 创建执行记录时，写入前按用例取项目；执行结果批量写入器（绕过 ORM 事件）调用 case_projects() 按批填充
+- 套件修改所属项目时由映射事件同步其中的用例与执行记录；批量移动用例等批量更新由调用方调用 sync_cases()
+"""
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event, inspect, select, update
+
+from app import db
+from app.models import TestSuite, TestCase, TestExecution
+from app.services.execution_stats_service import get_execution_stats_service
+
+
+class ProjectScopeService:
+    """用例与执行记录项目归属服务"""
+
+    @staticmethod
+    def suite_project(suite_id: Optional[int], executor=None) -> Optional[int]:
+        """套件所属项目"""
+        if not suite_id:
+            return None
+        executor = executor if executor is not None else db.session
+        return executor.execute(select(TestSuite.project_id).where(TestSuite.id == suite_id)).scalar()
+
+    @staticmethod
+    def case_projects(case_ids: Iterable[int], executor=None) -> Dict[int, Optional[int]]:
+        """
+        查询用例所属项目（一次查询）
+
+        Returns:
+            Dict[int, Optional[int]]: {用例ID: 项目ID}
+        """
+        case_ids = set(case_ids)
+        if not case_ids:
+            return {}
+        executor = executor if executor is not None else db.session
+        return dict(executor.execute(
+            select(TestCase.id, TestCase.project_id).where(TestCase.id.in_(case_ids))
+        ).all())
+
+    @staticmethod
+    def sync_cases(case_ids: Optional[Iterable[int]] = None, suite_id: Optional[int] = None, executor=None):
+        """
+        按所在套件重新计算用例的项目，并同步这些用例的执行记录
+
+        Args:
+            case_ids: 需同步的用例ID
+            suite_id: 同步该套件下的全部用例（与 case_ids 二选一）
+            executor: 数据库连接，ORM 事件内需传入当前 flush 的连接，默认使用 db.session
+        """
+        executor = executor if executor is not None else db.session
+        cases = TestCase.__table__
+        executions = TestExecution.__table__
+        if suite_id is not None:
+            case_filter = cases.c.suite_id == suite_id
+        else:
+            case_ids = list(case_ids or [])
+            if not case_ids:
+                return
+            case_filter = cases.c.id.in_(case_ids)
+
+        suite_project = select(TestSuite.project_id).where(
+            TestSuite.id == cases.c.suite_id
+        ).scalar_subquery()
+        # 冗余字段同步不视为用例本身的修改，保持 updated_at 不变
+        executor.execute(
+            update(cases).where(case_filter).values({
+                cases.c.project_id: suite_project,
+                cases.c.updated_at: cases.c.updated_at
+            })
+        )
+        # 执行记录改归新项目前，先把按日汇总从原项目移到新项目
+        get_execution_stats_service().move_case_executions(case_filter, executor=executor)
+        case_project = select(cases.c.project_id).where(cases.c.id == executions.c.test_case_id).scalar_subquery()
+        executor.execute(
+            update(executions)
+            .where(executions.c.test_case_id.in_(select(cases.c.id).where(case_filter)))
+            .values({executions.c.project_id: case_project})
+        )
+
+
+# 全局实例
+_project_scope_service = None
+
+
+def get_project_scope_service() -> ProjectScopeService:
+    """获取项目归属服务实例"""
+    global _project_scope_service
+    if _project_scope_service is None:
+        _project_scope_service = ProjectScopeService()
+    return _project_scope_service
+
+
+def _on_case_before_insert(mapper, connection, target):
+    """新建用例写入前取所在套件的项目"""
+    target.project_id = get_project_scope_service().suite_project(target.suite_id, executor=connection)
+
+
+def _on_case_before_update(mapper, connection, target):
+    """用例更换套件时改为新套件的项目"""
+    if inspect(target).attrs.suite_id.history.has_changes():
+        project_id = get_project_scope_service().suite_project(target.suite_id, executor=connection)
+        if project_id != target.project_id:
+            target.project_id = project_id
+
+
+def _on_case_after_update(mapper, connection, target):
+    """用例项目变化时同步其执行记录及按日汇总"""
+    if inspect(target).attrs.project_id.history.has_changes():
+        get_execution_stats_service().move_case_executions(TestCase.__table__.c.id == target.id, executor=connection)
+        executions = TestExecution.__table__
+        connection.execute(
+            update(executions).where(executions.c.test_case_id == target.id).values(project_id=target.project_id)
+        )
+
+
+def _on_execution_before_insert(mapper, connection, target):
+    """新建执行记录写入前取用例的项目"""
+    projects = get_project_scope_service().case_projects([target.test_case_id], executor=connection)
+    target.project_id = projects.get(target.test_case_id)
+
+
+def _on_suite_after_update(mapper, connection, target):
+    """套件修改所属项目时同步其中的用例与执行记录"""
+    if inspect(target).attrs.project_id.history.has_changes():
+        get_project_scope_service().sync_cases(suite_id=target.id, executor=connection)
+
+
+def register_project_scope_hooks():
+    """注册项目归属冗余字段维护的 ORM 事件（重复调用安全）"""
+    handlers = (
+        (TestCase, 'before_insert', _on_case_before_insert),
+        (TestCase, 'before_update', _on_case_before_update),
+        (TestCase, 'after_update', _on_case_after_update),
+        (TestExecution, 'before_insert', _on_execution_before_insert),
+        (TestSuite, 'after_update', _on_suite_after_update),
+    )
+    for model, identifier, handler in handlers:
+        if not event.contains(model, identifier, handler):
+            event.listen(model, identifier, handler)
@@ -0,0 +1,228 @@
+"""
+项目统计计数维护
+projects 表的 test_suite_count / test_case_count / test_plan_count / defect_count 由映射事件增量维护，
+统计接口直接读取项目行：
+- 通过 ORM 创建、删除、软删除套件/用例/计划/缺陷，或修改其所属项目时，在同一事务内以 count = count ± n 原子更新
+- 批量删除、批量移动用例等绕过 ORM 事件的写入，由调用方在批量更新前调用 count_live_cases() 取得变化量并 adjust()
+- 后台任务定期执行 reconcile()，按实际数据校正漂移的计数；也可通过 flask project-stats reconcile 手动执行
+
+计数口径：套件、缺陷按所属项目统计；用例按所在套件的项目（test_cases.project_id）统计，不含软删除；计划不含软删除
+"""
+import logging
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event, inspect, select, update, func, or_
+
+from app import db
+from app.models import Project, TestSuite, TestCase, TestPlan, Defect
+from app.services.job_queue import register_job_handler, get_job_queue
+
+logger = logging.getLogger(__name__)
+
+PROJECT_STATS_RECONCILE_JOB_TYPE = 'project_stats_reconcile'
+
+COUNTER_FIELDS = ('test_suite_count', 'test_case_count', 'test_plan_count', 'defect_count')
+
+
+class ProjectStatsService:
+    """项目统计计数服务"""
+
+    @staticmethod
+    def adjust(field: str, deltas: Dict[Optional[int], int], executor=None):
+        """
+        原子调整项目计数
+
+        Args:
+            field: 计数字段，见 COUNTER_FIELDS
+            deltas: {项目ID: 变化量}，项目ID为空或变化量为0的项忽略
+            executor: 数据库连接，ORM 事件内需传入当前 flush 的连接，默认使用 db.session
+        """
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f'未知的计数字段: {field}')
+        executor = executor if executor is not None else db.session
+        projects = Project.__table__
+        column = projects.c[field]
+        for project_id, delta in sorted((key, value) for key, value in deltas.items() if key and value):
+            # 计数变化不视为项目本身的修改，保持 updated_at 不变
+            executor.execute(
+                update(projects).where(projects.c.id == project_id).values({
+                    column: func.coalesce(column, 0) + delta,
+                    projects.c.updated_at: projects.c.updated_at
+                })
+            )
+
+    @staticmethod
+    def count_live_cases(case_ids: Iterable[int], executor=None) -> Dict[int, int]:
+        """
+        统计指定用例中未删除用例按项目的数量，供批量更新用例前计算计数变化
+
+        Returns:
+            Dict[int, int]: {项目ID: 用例数}
+        """
+        case_ids = list(case_ids)
+        if not case_ids:
+            return {}
+        executor = executor if executor is not None else db.session
+        return {project_id: count for project_id, count in executor.execute(
+            select(TestCase.project_id, func.count(TestCase.id))
+            .where(TestCase.id.in_(case_ids), TestCase.is_deleted == False)
+            .group_by(TestCase.project_id)
+        ).all() if project_id}
+
+    @staticmethod
+    def actual_counts():
+        """各计数字段按实际数据统计的关联子查询（关联 projects.id）"""
+        project_id = Project.__table__.c.id
+        return {
+            'test_suite_count': select(func.count(TestSuite.id))
+            .where(TestSuite.project_id == project_id).scalar_subquery(),
+            'test_case_count': select(func.count(TestCase.id))
+            .where(TestCase.project_id == project_id, TestCase.is_deleted == False).scalar_subquery(),
+            'test_plan_count': select(func.count(TestPlan.id))
+            .where(TestPlan.project_id == project_id, TestPlan.is_deleted == False).scalar_subquery(),
+            'defect_count': select(func.count(Defect.id))
+            .where(Defect.project_id == project_id).scalar_subquery(),
+        }
+
+    def reconcile(self, project_id: Optional[int] = None) -> int:
+        """
+        按实际数据校正计数，只更新存在偏差的项目（一条 UPDATE 语句）
+
+        Args:
+            project_id: 只校正该项目，默认全部
+
+        Returns:
+            int: 被校正的项目数
+        """
+        projects = Project.__table__
+        actual = self.actual_counts()
+        statement = update(projects).where(or_(*(
+            func.coalesce(projects.c[field], -1) != actual[field] for field in COUNTER_FIELDS
+        ))).values({projects.c[field]: actual[field] for field in COUNTER_FIELDS})
+        statement = statement.values({projects.c.updated_at: projects.c.updated_at})
+        if project_id is not None:
+            statement = statement.where(projects.c.id == project_id)
+
+        result = db.session.execute(statement.execution_options(synchronize_session=False))
+        db.session.commit()
+        if result.rowcount:
+            logger.warning(f'项目统计计数存在偏差，已校正 {result.rowcount} 个项目')
+        return result.rowcount
+
+
+# 全局实例
+_project_stats_service = None
+
+
+def get_project_stats_service() -> ProjectStatsService:
+    """获取项目统计计数服务实例"""
+    global _project_stats_service
+    if _project_stats_service is None:
+        _project_stats_service = ProjectStatsService()
+    return _project_stats_service
+
+
+@register_job_handler(PROJECT_STATS_RECONCILE_JOB_TYPE)
+def run_project_stats_reconcile(context):
+    """定期校正项目统计计数的后台任务"""
+    corrected = get_project_stats_service().reconcile(context.payload.get('project_id'))
+    with context.lock:
+        context.state['corrected'] = corrected
+
+
+def _live_project(connection, values: Dict) -> Optional[int]:
+    """软删除的记录不计入项目"""
+    return None if values['is_deleted'] else values['project_id']
+
+
+def _own_project(connection, values: Dict) -> Optional[int]:
+    return values['project_id']
+
+
+# 模型 -> (计数字段, 影响计数的字段, 计入的项目)
+_COUNTERS = {
+    TestSuite: ('test_suite_count', ('project_id',), _own_project),
+    TestCase: ('test_case_count', ('project_id', 'is_deleted'), _live_project),
+    TestPlan: ('test_plan_count', ('project_id', 'is_deleted'), _live_project),
+    Defect: ('defect_count', ('project_id',), _own_project),
+}
+
+
+def _current_values(target, names) -> Dict:
+    return {name: getattr(target, name) for name in names}
+
+
+def _previous_values(target, names) -> Dict:
+    attrs = inspect(target).attrs
+    previous = {}
+    for name in names:
+        history = attrs[name].history
+        previous[name] = history.deleted[0] if history.deleted else getattr(target, name)
+    return previous
+
+
+def _on_after_insert(mapper, connection, target):
+    """新建记录后计入所属项目"""
+    field, names, resolve = _COUNTERS[mapper.class_]
+    project_id = resolve(connection, _current_values(target, names))
+    get_project_stats_service().adjust(field, {project_id: 1}, executor=connection)
+
+
+def _on_after_update(mapper, connection, target):
+    """所属项目或删除标记变化时，从原项目扣除并计入新项目"""
+    field, names, resolve = _COUNTERS[mapper.class_]
+    attrs = inspect(target).attrs
+    if not any(attrs[name].history.has_changes() for name in names):
+        return
+    previous = _previous_values(target, names)
+    old_project = resolve(connection, previous)
+    new_project = resolve(connection, _current_values(target, names))
+    if old_project == new_project:
+        return
+
+    service = get_project_stats_service()
+    service.adjust(field, {old_project: -1, new_project: 1}, executor=connection)
+
+    if mapper.class_ is TestSuite:
+        # 套件换项目时，其中的用例随之计入新项目
+        live_cases = connection.execute(
+            select(func.count(TestCase.id)).where(TestCase.suite_id == target.id, TestCase.is_deleted == False)
+        ).scalar()
+        if live_cases:
+            service.adjust('test_case_count', {old_project: -live_cases, new_project: live_cases}, executor=connection)
+
+
+def _on_after_delete(mapper, connection, target):
+    """物理删除记录后从所属项目扣除"""
+    field, names, resolve = _COUNTERS[mapper.class_]
+    project_id = resolve(connection, _previous_values(target, names))
+    get_project_stats_service().adjust(field, {project_id: -1}, executor=connection)
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+def register_project_stats_hooks():
+    """注册项目统计计数增量维护的 ORM 事件（重复调用安全）"""
+    handlers = (
+        ('after_insert', _on_after_insert),
+        ('after_update', _on_after_update),
+        ('after_delete', _on_after_delete),
+    )
+    for model, (_, names, _) in _COUNTERS.items():
+        for identifier, handler in handlers:
+            if not event.contains(model, identifier, handler):
+                event.listen(model, identifier, handler)
+        # 对象提交后属性已过期，赋值前需先加载原值，否则修改历史中没有旧值，无法从原项目扣除
+        for name in names:
+            attribute = getattr(model, name)
+            if not event.contains(attribute, 'set', _keep_previous_value):
+                event.listen(attribute, 'set', _keep_previous_value, active_history=True, retval=True)
+
+
+def schedule_project_stats_reconcile(app):
+    """按配置登记定期校正任务，间隔为 0 时不定期校正"""
+    interval = app.config.get('PROJECT_STATS_RECONCILE_INTERVAL', 3600)
+    if interval > 0:
+        get_job_queue().schedule(PROJECT_STATS_RECONCILE_JOB_TYPE, interval)
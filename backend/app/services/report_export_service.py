@@ -0,0 +1,387 @@
+"""
+测试报告导出服务
+- 导出在后台任务队列中执行（report_export 任务），请求线程只负责提交任务或返回已缓存的文件
+- 用例与缺陷按批从数据库流式读取（yield_per），边读边写入文件，不在内存中保留完整结果
+- 导出文件按 <报告ID>/<内容摘要>.<格式> 存放在 REPORT_EXPORT_DIR 下；内容摘要由报告字段、度量指标
+  以及计划用例、缺陷的聚合指纹（数量、ID与执行记录之和、最后更新时间）计算，
+  报告内容未变化时再次导出直接返回已有文件
+- 支持 HTML、CSV、XLSX；PDF 需要本机安装 WeasyPrint 或 wkhtmltopdf
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, Iterator, Optional, Tuple
+
+from flask import current_app
+from jinja2 import Environment
+from sqlalchemy import select, func
+
+from app import db
+from app.models import TestReport, ReportMetric, TestPlanCase, TestCase, Defect
+from app.services.job_queue import register_job_handler, JobContext, JobCancelled
+from app.utils.xlsx_writer import XlsxWriter
+
+logger = logging.getLogger(__name__)
+
+REPORT_EXPORT_JOB_TYPE = 'report_export'
+
+# 导出格式 -> MIME 类型
+EXPORT_FORMATS = {
+    'html': 'text/html',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf'
+}
+
+# 导出内容或模板变化时递增，使已缓存的文件失效
+EXPORT_VERSION = 1
+
+# 报告中不参与内容摘要的字段（导出本身会改写这些字段）
+_UNHASHED_FIELDS = ('export_formats', 'export_path', 'updated_at')
+
+SUMMARY_FIELDS = (
+    ('report_no', '报告编号'), ('name', '报告名称'), ('report_type', '报告类型'),
+    ('environment', '测试环境'), ('build_version', '构建版本'),
+    ('start_time', '开始时间'), ('end_time', '结束时间'), ('duration', '执行时长(秒)'),
+    ('total_cases', '总用例数'), ('passed_cases', '通过'), ('failed_cases', '失败'),
+    ('blocked_cases', '阻塞'), ('skipped_cases', '跳过'),
+    ('pass_rate', '通过率(%)'), ('execution_rate', '执行率(%)'),
+    ('total_defects', '总缺陷数'), ('critical_defects', '严重缺陷'), ('high_defects', '高危缺陷'),
+    ('medium_defects', '中危缺陷'), ('low_defects', '低危缺陷'),
+    ('generated_by', '生成人'), ('created_at', '创建时间')
+)
+METRIC_HEADER = ('指标名称', '指标键值', '指标值', '指标类型', '分类')
+CASE_HEADER = ('用例编号', '用例名称', '优先级', '执行人', '执行状态')
+DEFECT_HEADER = ('缺陷编号', '缺陷标题', '严重程度', '优先级', '状态', '分配给')
+
+_HTML_TEMPLATE = Environment(autoescape=True).from_string('''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>{{ report.name }}</title>
+<style>
+body { font-family: sans-serif; margin: 24px; color: #303133; }
+h1 { font-size: 22px; } h2 { font-size: 17px; margin-top: 28px; }
+table { border-collapse: collapse; width: 100%; font-size: 13px; }
+th, td { border: 1px solid #dcdfe6; padding: 6px 8px; text-align: left; }
+th { background: #f5f7fa; }
+.summary th { width: 160px; }
+</style>
+</head>
+<body>
+<h1>{{ report.name }}</h1>
+<h2>报告概要</h2>
+<table class="summary">
+{% for label, value in summary %}<tr><th>{{ label }}</th><td>{{ value if value is not none else '' }}</td></tr>
+{% endfor %}</table>
+{% if metrics %}<h2>度量指标</h2>
+<table>
+<tr>{% for title in metric_header %}<th>{{ title }}</th>{% endfor %}</tr>
+{% for row in metrics %}<tr>{% for value in row %}<td>{{ value if value is not none else '' }}</td>{% endfor %}</tr>
+{% endfor %}</table>{% endif %}
+{% if has_plan %}<h2>测试用例</h2>
+<table>
+<tr>{% for title in case_header %}<th>{{ title }}</th>{% endfor %}</tr>
+{% for row in cases %}<tr>{% for value in row %}<td>{{ value if value is not none else '' }}</td>{% endfor %}</tr>
+{% endfor %}</table>
+<h2>缺陷</h2>
+<table>
+<tr>{% for title in defect_header %}<th>{{ title }}</th>{% endfor %}</tr>
+{% for row in defects %}<tr>{% for value in row %}<td>{{ value if value is not none else '' }}</td>{% endfor %}</tr>
+{% endfor %}</table>{% endif %}
+</body>
+</html>
+''')
+
+
+class ReportExportService:
+    """测试报告导出服务"""
+
+    def __init__(self, export_dir: str, batch_size: int = 1000):
+        """
+        Args:
+            export_dir: 导出文件存储目录，多实例部署时应使用共享存储
+            batch_size: 从数据库流式读取时每批的行数
+        """
+        self.export_dir = export_dir
+        self.batch_size = max(batch_size, 1)
+
+    @staticmethod
+    def pdf_renderer() -> Optional[str]:
+        """本机可用的 PDF 渲染器：weasyprint、wkhtmltopdf，均不可用时返回 None"""
+        try:
+            import weasyprint  # noqa: F401
+            return 'weasyprint'
+        except Exception:
+            pass
+        if shutil.which('wkhtmltopdf'):
+            return 'wkhtmltopdf'
+        return None
+
+    def content_hash(self, report: TestReport) -> str:
+        """报告内容摘要，只执行少量聚合查询，不读取用例与缺陷明细"""
+        report_data = {key: value for key, value in report.to_dict().items() if key not in _UNHASHED_FIELDS}
+        metrics = db.session.execute(
+            select(ReportMetric.metric_name, ReportMetric.metric_key, ReportMetric.metric_value,
+                   ReportMetric.metric_type, ReportMetric.category, ReportMetric.display_order)
+            .where(ReportMetric.report_id == report.id)
+            .order_by(ReportMetric.display_order, ReportMetric.id)
+        ).all()
+
+        fingerprint = {'version': EXPORT_VERSION, 'report': report_data, 'metrics': [list(row) for row in metrics]}
+        if report.test_plan_id:
+            fingerprint['cases'] = list(db.session.execute(
+                select(func.count(TestPlanCase.id), func.sum(TestPlanCase.id),
+                       func.sum(func.coalesce(TestPlanCase.last_execution_id, 0)),
+                       func.max(TestPlanCase.last_execution_id), func.max(TestCase.updated_at))
+                .join(TestCase, TestCase.id == TestPlanCase.test_case_id)
+                .where(TestPlanCase.test_plan_id == report.test_plan_id)
+            ).one())
+            # 计划用例的导出列（状态、执行人、排序）不更新任何时间戳，按状态与执行人分组，
+            # 以各组的用例ID和、平方和及按排序号加权的ID和识别用例在组间移动与顺序调整
+            fingerprint['plan_cases'] = [list(row) for row in db.session.execute(
+                select(TestPlanCase.last_status, TestPlanCase.assignee, func.count(TestPlanCase.id),
+                       func.sum(TestPlanCase.id), func.sum(TestPlanCase.id * TestPlanCase.id),
+                       func.sum(TestPlanCase.id * func.coalesce(TestPlanCase.sort_order, 0)))
+                .where(TestPlanCase.test_plan_id == report.test_plan_id)
+                .group_by(TestPlanCase.last_status, TestPlanCase.assignee)
+                .order_by(TestPlanCase.last_status, TestPlanCase.assignee)
+            ).all()]
+            fingerprint['defects'] = list(db.session.execute(
+                select(func.count(Defect.id), func.sum(Defect.id), func.max(Defect.updated_at))
+                .where(Defect.test_plan_id == report.test_plan_id)
+            ).one())
+
+        return hashlib.sha256(
+            json.dumps(fingerprint, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        ).hexdigest()
+
+    def artifact_path(self, report_id: int, format_type: str, content_hash: str) -> str:
+        """导出文件路径"""
+        return os.path.join(self.export_dir, str(report_id), f'{content_hash}.{format_type}')
+
+    def find_artifact(self, report: TestReport, format_type: str) -> Tuple[str, Optional[str]]:
+        """
+        查找与报告当前内容一致的导出文件
+
+        Returns:
+            Tuple[str, Optional[str]]: (内容摘要, 文件路径)，文件不存在时路径为 None
+        """
+        content_hash = self.content_hash(report)
+        path = self.artifact_path(report.id, format_type, content_hash)
+        return content_hash, path if os.path.exists(path) else None
+
+    def export(self, report: TestReport, format_type: str, context: Optional[JobContext] = None,
+               refresh: bool = False) -> Dict:
+        """
+        导出报告，内容未变化的文件已存在时直接返回
+
+        Args:
+            report: 测试报告
+            format_type: 导出格式
+            context: 后台任务上下文，用于检查取消
+            refresh: 忽略已有文件，重新生成
+
+        Returns:
+            Dict: {'format', 'content_hash', 'path', 'size', 'rows', 'cached'}
+        """
+        content_hash, path = self.find_artifact(report, format_type)
+        cached = path is not None and not refresh
+        rows = 0
+        if not cached:
+            path = self.artifact_path(report.id, format_type, content_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写入同目录的临时文件再改名，其他进程不会读到未写完的文件
+            fd, temp_path = tempfile.mkstemp(suffix=f'.{format_type}.tmp', dir=os.path.dirname(path))
+            os.close(fd)
+            try:
+                rows = getattr(self, f'_render_{format_type}')(report, temp_path, context)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self._remove_stale(report.id, format_type, path)
+
+        self._record(report, format_type, path)
+        return {
+            'format': format_type,
+            'content_hash': content_hash,
+            'path': path,
+            'size': os.path.getsize(path),
+            'rows': rows,
+            'cached': cached
+        }
+
+    def _remove_stale(self, report_id: int, format_type: str, current_path: str):
+        """删除同一报告、同一格式的旧版本文件"""
+        directory = os.path.dirname(current_path)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(f'.{format_type}') and path != current_path:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f'删除旧导出文件失败 {path}: {e}')
+
+    @staticmethod
+    def _record(report: TestReport, format_type: str, path: str):
+        """在报告上记录已导出的格式与最近一次导出的文件路径（不改变 updated_at）"""
+        formats = json.loads(report.export_formats) if report.export_formats else []
+        if format_type not in formats:
+            formats.append(format_type)
+        TestReport.query.filter_by(id=report.id).update({
+            'export_formats': json.dumps(formats),
+            'export_path': path,
+            'updated_at': TestReport.updated_at
+        }, synchronize_session=False)
+        db.session.commit()
+
+    # ---------- 数据读取 ----------
+
+    @staticmethod
+    def _summary(report: TestReport):
+        data = report.to_dict()
+        return [(label, data.get(key)) for key, label in SUMMARY_FIELDS]
+
+    @staticmethod
+    def _metrics(report: TestReport):
+        return db.session.execute(
+            select(ReportMetric.metric_name, ReportMetric.metric_key, ReportMetric.metric_value,
+                   ReportMetric.metric_type, ReportMetric.category)
+            .where(ReportMetric.report_id == report.id)
+            .order_by(ReportMetric.display_order, ReportMetric.id)
+        ).all()
+
+    def _stream(self, statement, context: Optional[JobContext], counter: Dict[str, int]) -> Iterator:
+        """
+        按批流式读取，每批检查一次取消。
+        读取过程中不能在同一会话上提交（MySQL 流式游标未读完时不能执行其他语句），
+        取消标记通过独立连接读取，任务心跳由任务队列的调度线程维护
+        """
+        result = db.session.execute(statement.execution_options(yield_per=self.batch_size))
+        try:
+            for partition in result.partitions():
+                if context is not None and context.is_cancelled():
+                    raise JobCancelled()
+                counter['rows'] += len(partition)
+                yield from partition
+        finally:
+            result.close()
+
+    def _cases(self, report: TestReport, context, counter) -> Iterator:
+        return self._stream(
+            select(TestCase.case_no, TestCase.name, TestCase.priority, TestPlanCase.assignee, TestPlanCase.last_status)
+            .join(TestCase, TestCase.id == TestPlanCase.test_case_id)
+            .where(TestPlanCase.test_plan_id == report.test_plan_id)
+            .order_by(TestPlanCase.sort_order, TestPlanCase.id),
+            context, counter
+        )
+
+    def _defects(self, report: TestReport, context, counter) -> Iterator:
+        return self._stream(
+            select(Defect.defect_no, Defect.title, Defect.severity, Defect.priority, Defect.status, Defect.assigned_to)
+            .where(Defect.test_plan_id == report.test_plan_id)
+            .order_by(Defect.id),
+            context, counter
+        )
+
+    # ---------- 渲染 ----------
+
+    def _render_html(self, report: TestReport, path: str, context: Optional[JobContext]) -> int:
+        counter = {'rows': 0}
+        has_plan = bool(report.test_plan_id)
+        stream = _HTML_TEMPLATE.generate(
+            report=report,
+            summary=self._summary(report),
+            metric_header=METRIC_HEADER,
+            metrics=self._metrics(report),
+            has_plan=has_plan,
+            case_header=CASE_HEADER,
+            cases=self._cases(report, context, counter) if has_plan else [],
+            defect_header=DEFECT_HEADER,
+            defects=self._defects(report, context, counter) if has_plan else []
+        )
+        with open(path, 'w', encoding='utf-8') as f:
+            for chunk in stream:
+                f.write(chunk)
+        return counter['rows']
+
+    def _render_csv(self, report: TestReport, path: str, context: Optional[JobContext]) -> int:
+        counter = {'rows': 0}
+        # utf-8-sig 使 Excel 能正确识别中文
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['报告概要'])
+            writer.writerows(self._summary(report))
+            metrics = self._metrics(report)
+            if metrics:
+                writer.writerows([[], ['度量指标'], METRIC_HEADER])
+                writer.writerows(metrics)
+            if report.test_plan_id:
+                writer.writerows([[], ['测试用例'], CASE_HEADER])
+                writer.writerows(self._cases(report, context, counter))
+                writer.writerows([[], ['缺陷'], DEFECT_HEADER])
+                writer.writerows(self._defects(report, context, counter))
+        return counter['rows']
+
+    def _render_xlsx(self, report: TestReport, path: str, context: Optional[JobContext]) -> int:
+        counter = {'rows': 0}
+        with open(path, 'wb') as f, XlsxWriter(f) as workbook:
+            workbook.write_sheet('报告概要', self._summary(report))
+            workbook.write_sheet('度量指标', self._metrics(report), header=METRIC_HEADER)
+            if report.test_plan_id:
+                workbook.write_sheet('测试用例', self._cases(report, context, counter), header=CASE_HEADER)
+                workbook.write_sheet('缺陷', self._defects(report, context, counter), header=DEFECT_HEADER)
+        return counter['rows']
+
+    def _render_pdf(self, report: TestReport, path: str, context: Optional[JobContext]) -> int:
+        renderer = self.pdf_renderer()
+        if renderer is None:
+            raise RuntimeError('当前环境未安装 PDF 渲染器（WeasyPrint 或 wkhtmltopdf）')
+        # 先流式生成 HTML，再交给渲染器转换
+        html_path = f'{path}.src'
+        try:
+            rows = self._render_html(report, html_path, context)
+            if renderer == 'weasyprint':
+                import weasyprint
+                weasyprint.HTML(filename=html_path).write_pdf(path)
+            else:
+                subprocess.run(['wkhtmltopdf', '--quiet', '--encoding', 'utf-8', html_path, path],
+                               check=True, capture_output=True, timeout=600)
+        finally:
+            if os.path.exists(html_path):
+                os.remove(html_path)
+        return rows
+
+
+# 全局实例
+_report_export_service = None
+
+
+def get_report_export_service() -> ReportExportService:
+    """获取报告导出服务实例"""
+    global _report_export_service
+    if _report_export_service is None:
+        _report_export_service = ReportExportService(
+            current_app.config.get('REPORT_EXPORT_DIR', 'report_exports'),
+            current_app.config.get('REPORT_EXPORT_BATCH_SIZE', 1000)
+        )
+    return _report_export_service
+
+
+@register_job_handler(REPORT_EXPORT_JOB_TYPE)
+def run_report_export(context: JobContext):
+    """后台导出报告，结果（格式、内容摘要、文件大小等）写入任务 state"""
+    report = db.session.get(TestReport, context.payload['report_id'])
+    if report is None:
+        raise ValueError('报告不存在')
+    result = get_report_export_service().export(report, context.payload['format'], context,
+                                                refresh=context.payload.get('refresh', False))
+    result.pop('path')
+    with context.lock:
+        context.state.update(result)
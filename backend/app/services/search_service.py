@@ -0,0 +1,435 @@
+"""
+全文检索服务
+测试用例、缺陷的可检索字段被拼接为纯文本写入 search_documents 表，
+并根据数据库类型选择检索后端：
+- MySQL: FULLTEXT 索引（ngram 分词，支持中文）
+- PostgreSQL: pg_trgm 三元组 GIN 索引上的 ILIKE 子串匹配（中文、部分编号也能命中），按 similarity() 排序
+- SQLite: FTS5 虚拟表（trigram 分词）
+- 以上不可用或关键词过短时: 退化为 search_documents 表上的 LIKE 匹配
+检索文档通过 ORM 映射事件在业务数据增删改的同一事务内增量维护。
+"""
+import re
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from markupsafe import escape
+from sqlalchemy import event, inspect, select, text, func, case, or_, literal_column, table, column
+from sqlalchemy.dialects import mysql
+
+from app import db
+from app.models import TestCase, Defect, SearchDocument
+
+
+DOC_TYPE_TEST_CASE = 'test_case'
+DOC_TYPE_DEFECT = 'defect'
+
+# 各文档类型对应的模型及参与检索的字段（标题字段、正文字段）
+SEARCHABLE_MODELS = {
+    DOC_TYPE_TEST_CASE: {
+        'model': TestCase,
+        'title_fields': ('case_no', 'name'),
+        'content_fields': ('description', 'preconditions', 'steps', 'expected_result', 'tags'),
+    },
+    DOC_TYPE_DEFECT: {
+        'model': Defect,
+        'title_fields': ('defect_no', 'title'),
+        'content_fields': ('description', 'reproduction_steps', 'expected_behavior', 'actual_behavior', 'tags'),
+    },
+}
+
+# 正文最大字符数，按 utf8mb4 每字符 4 字节计算不超过 TEXT 的 65535 字节上限
+MAX_CONTENT_LENGTH = 16000
+
+# PostgreSQL 三元组检索依赖的扩展，未安装时退化为 LIKE
+PG_TRGM_EXTENSION = 'pg_trgm'
+
+# SQLite FTS5 虚拟表名
+SQLITE_FTS_TABLE = 'search_documents_fts'
+
+
+def _flatten_text(value) -> str:
+    """将 JSON 文本（如测试步骤）展开为纯文本，非 JSON 内容原样返回"""
+    if not value:
+        return ''
+    try:
+        data = json.loads(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+    parts = []
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+        elif item is not None and not isinstance(item, bool):
+            parts.append(str(item))
+    return ' '.join(parts)
+
+
+def build_document(doc_type: str, obj) -> Tuple[str, str]:
+    """
+    根据业务对象生成检索文档
+
+    Args:
+        doc_type: 文档类型
+        obj: TestCase 或 Defect 实例
+
+    Returns:
+        (标题, 正文)
+    """
+    config = SEARCHABLE_MODELS[doc_type]
+    title_parts = [getattr(obj, field) for field in config['title_fields']]
+    content_parts = [_flatten_text(getattr(obj, field)) for field in config['content_fields']]
+    title = ' '.join(part for part in title_parts if part)[:500]
+    content = '\n'.join(part for part in content_parts if part)[:MAX_CONTENT_LENGTH]
+    return title, content
+
+
+def split_terms(keyword: str) -> List[str]:
+    """按空白拆分检索词，并去掉会破坏检索语法的引号"""
+    return [term for term in (keyword or '').replace('"', ' ').split() if term]
+
+
+class LikeSearchBackend:
+    """LIKE 兜底检索后端，不依赖数据库全文索引"""
+
+    name = 'like'
+    # 单个检索词的最小长度，低于该长度时回退到 LIKE 后端
+    min_term_length = 1
+
+    def match(self, doc_type: str, terms: List[str]):
+        """
+        构造命中文档的查询
+
+        Returns:
+            Select: 包含 doc_id、score 两列，score 越大越相关
+        """
+        conditions = [
+            or_(SearchDocument.title.contains(term), SearchDocument.content.contains(term))
+            for term in terms
+        ]
+        # 标题命中的文档排在前面
+        score = case((SearchDocument.title.contains(terms[0]), 1), else_=0)
+        return select(
+            SearchDocument.doc_id.label('doc_id'),
+            score.label('score')
+        ).where(SearchDocument.doc_type == doc_type, *conditions)
+
+
+class MySQLFullTextBackend(LikeSearchBackend):
+    """MySQL FULLTEXT 检索后端（ngram 分词）"""
+
+    name = 'mysql_fulltext'
+    # ngram_token_size 默认为 2
+    min_term_length = 2
+
+    def match(self, doc_type: str, terms: List[str]):
+        # 布尔模式下每个词作为短语必须命中，ngram 短语匹配等价于子串匹配
+        against = ' '.join(f'+"{term}"' for term in terms)
+        score = mysql.match(SearchDocument.title, SearchDocument.content, against=against).in_boolean_mode()
+        return select(
+            SearchDocument.doc_id.label('doc_id'),
+            score.label('score')
+        ).where(SearchDocument.doc_type == doc_type, score > 0)
+
+
+class PostgresTrigramBackend(LikeSearchBackend):
+    """PostgreSQL pg_trgm 检索后端（标题、正文上的 gin_trgm_ops 索引加速 ILIKE 子串匹配）"""
+
+    name = 'postgresql_trgm'
+
+    def match(self, doc_type: str, terms: List[str]):
+        conditions = [
+            or_(SearchDocument.title.icontains(term, autoescape=True),
+                SearchDocument.content.icontains(term, autoescape=True))
+            for term in terms
+        ]
+        # 标题按整体相似度、正文按与检索词最相近的片段计分
+        keyword = ' '.join(terms)
+        score = (func.similarity(func.coalesce(SearchDocument.title, ''), keyword)
+                 + func.word_similarity(keyword, func.coalesce(SearchDocument.content, '')))
+        return select(
+            SearchDocument.doc_id.label('doc_id'),
+            score.label('score')
+        ).where(SearchDocument.doc_type == doc_type, *conditions)
+
+
+class SQLiteFTSBackend(LikeSearchBackend):
+    """SQLite FTS5 检索后端（trigram 分词）"""
+
+    name = 'sqlite_fts5'
+    # trigram 分词要求每个检索词至少 3 个字符
+    min_term_length = 3
+
+    def match(self, doc_type: str, terms: List[str]):
+        fts = table(SQLITE_FTS_TABLE, column('rowid'))
+        fts_ref = literal_column(SQLITE_FTS_TABLE)
+        expression = ' '.join(f'"{term}"' for term in terms)
+        # bm25 越小越相关，取负数与其他后端保持“越大越相关”
+        return select(
+            SearchDocument.doc_id.label('doc_id'),
+            (-func.bm25(fts_ref)).label('score')
+        ).select_from(
+            SearchDocument.__table__.join(fts, fts.c.rowid == SearchDocument.id)
+        ).where(SearchDocument.doc_type == doc_type, fts_ref.op('MATCH')(expression))
+
+
+class SearchService:
+    """全文检索服务"""
+
+    def __init__(self):
+        """初始化检索服务"""
+        self._backends = {}
+        self._fallback = LikeSearchBackend()
+
+    def get_backend(self) -> LikeSearchBackend:
+        """获取当前数据库可用的检索后端（按数据库连接缓存）"""
+        key = str(db.engine.url)
+        backend = self._backends.get(key)
+        if backend is None:
+            backend = self._detect_backend()
+            self._backends[key] = backend
+        return backend
+
+    def _detect_backend(self) -> LikeSearchBackend:
+        """根据数据库类型及索引是否存在选择检索后端"""
+        dialect = db.engine.dialect.name
+        if dialect == 'mysql':
+            return MySQLFullTextBackend()
+        if dialect == 'postgresql':
+            with db.engine.connect() as connection:
+                exists = connection.execute(
+                    text("SELECT 1 FROM pg_extension WHERE extname = :name"), {'name': PG_TRGM_EXTENSION}
+                ).first()
+            if exists:
+                return PostgresTrigramBackend()
+        if dialect == 'sqlite':
+            with db.engine.connect() as connection:
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': SQLITE_FTS_TABLE}
+                ).first()
+            if exists:
+                return SQLiteFTSBackend()
+        return self._fallback
+
+    def match_subquery(self, doc_type: str, keyword: str):
+        """
+        获取关键词命中的文档子查询
+
+        Args:
+            doc_type: 文档类型
+            keyword: 检索关键词，空白分隔的多个词之间为“且”关系
+
+        Returns:
+            Subquery: 包含 doc_id、score 两列，可直接 join 到业务表
+        """
+        terms = split_terms(keyword) or [keyword.strip()]
+        backend = self.get_backend()
+        if min(len(term) for term in terms) < backend.min_term_length:
+            backend = self._fallback
+        return backend.match(doc_type, terms).subquery()
+
+    def highlight(self, keyword: str, content: Optional[str], context: int = 40) -> Optional[str]:
+        """
+        生成命中片段，命中词以 <mark> 包裹，其余内容做 HTML 转义
+
+        Args:
+            keyword: 检索关键词
+            content: 原始文本
+            context: 首个命中词前保留的字符数
+
+        Returns:
+            高亮片段，未命中返回 None
+        """
+        terms = split_terms(keyword)
+        if not content or not terms:
+            return None
+
+        pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.I)
+        first = pattern.search(content)
+        if first is None:
+            return None
+
+        start = max(first.start() - context, 0)
+        end = min(start + context * 4, len(content))
+        snippet = content[start:end]
+
+        parts = ['...'] if start > 0 else []
+        last = 0
+        for matched in pattern.finditer(snippet):
+            parts.append(str(escape(snippet[last:matched.start()])))
+            parts.append(f'<mark>{escape(matched.group())}</mark>')
+            last = matched.end()
+        parts.append(str(escape(snippet[last:])))
+        if end < len(content):
+            parts.append('...')
+        return ''.join(parts)
+
+    def to_dicts_with_highlight(self, doc_type: str, objs, keyword: Optional[str] = None) -> List[Dict]:
+        """序列化业务对象，有关键词时附加 highlight 字段"""
+        items = []
+        for obj in objs:
+            item = obj.to_dict()
+            if keyword:
+                title, content = build_document(doc_type, obj)
+                item['highlight'] = {
+                    'title': self.highlight(keyword, title),
+                    'content': self.highlight(keyword, content)
+                }
+            items.append(item)
+        return items
+
+    def index_document(self, doc_type: str, obj, connection=None):
+        """
+        写入或更新单个检索文档
+
+        Args:
+            doc_type: 文档类型
+            obj: 业务对象
+            connection: 数据库连接，ORM 事件内需传入当前 flush 的连接
+        """
+        executor = connection if connection is not None else db.session
+        documents = SearchDocument.__table__
+        title, content = build_document(doc_type, obj)
+        values = {'title': title, 'content': content, 'updated_at': datetime.utcnow()}
+
+        result = executor.execute(
+            documents.update()
+            .where(documents.c.doc_type == doc_type, documents.c.doc_id == obj.id)
+            .values(**values)
+        )
+        if result.rowcount == 0:
+            executor.execute(documents.insert().values(doc_type=doc_type, doc_id=obj.id, **values))
+
+    def remove_documents(self, doc_type: str, doc_ids, connection=None):
+        """批量删除检索文档（用于软删除、物理删除及绕过 ORM 事件的批量操作）"""
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        executor = connection if connection is not None else db.session
+        documents = SearchDocument.__table__
+        executor.execute(
+            documents.delete().where(documents.c.doc_type == doc_type, documents.c.doc_id.in_(doc_ids))
+        )
+
+    def rebuild(self, doc_type: Optional[str] = None, batch_size: int = 500) -> Dict[str, int]:
+        """
+        全量重建检索文档
+
+        Args:
+            doc_type: 仅重建指定类型，默认全部
+            batch_size: 每批读取/写入的行数
+
+        Returns:
+            各文档类型写入的文档数
+        """
+        documents = SearchDocument.__table__
+        counts = {}
+        for current_type, config in SEARCHABLE_MODELS.items():
+            if doc_type and current_type != doc_type:
+                continue
+
+            model = config['model']
+            db.session.execute(documents.delete().where(documents.c.doc_type == current_type))
+
+            count = 0
+            last_id = 0
+            while True:
+                # 按主键分批读取，避免一次加载全表
+                query = model.query.filter(model.id > last_id)
+                if hasattr(model, 'is_deleted'):
+                    query = query.filter(model.is_deleted == False)
+                batch = query.order_by(model.id).limit(batch_size).all()
+                if not batch:
+                    break
+
+                rows = []
+                now = datetime.utcnow()
+                for obj in batch:
+                    title, content = build_document(current_type, obj)
+                    rows.append({
+                        'doc_type': current_type,
+                        'doc_id': obj.id,
+                        'title': title,
+                        'content': content,
+                        'updated_at': now
+                    })
+                db.session.execute(documents.insert(), rows)
+                count += len(rows)
+                last_id = batch[-1].id
+
+            counts[current_type] = count
+
+        db.session.commit()
+        return counts
+
+
+# 全局实例
+_search_service = None
+
+
+def get_search_service():
+    """获取全文检索服务实例"""
+    global _search_service
+    if _search_service is None:
+        _search_service = SearchService()
+    return _search_service
+
+
+# 模型类 -> 文档类型
+_MODEL_DOC_TYPES = {config['model']: doc_type for doc_type, config in SEARCHABLE_MODELS.items()}
+
+
+def _search_fields_changed(target, doc_type: str) -> bool:
+    """判断本次更新是否涉及检索字段"""
+    config = SEARCHABLE_MODELS[doc_type]
+    attrs = inspect(target).attrs
+    return any(
+        attrs[field].history.has_changes()
+        for field in config['title_fields'] + config['content_fields']
+    )
+
+
+def _on_after_insert(mapper, connection, target):
+    """新建业务数据后写入检索文档"""
+    if getattr(target, 'is_deleted', False):
+        return
+    get_search_service().index_document(_MODEL_DOC_TYPES[type(target)], target, connection)
+
+
+def _on_after_update(mapper, connection, target):
+    """更新业务数据后同步检索文档，软删除时移除"""
+    doc_type = _MODEL_DOC_TYPES[type(target)]
+    service = get_search_service()
+
+    if getattr(target, 'is_deleted', False):
+        if inspect(target).attrs.is_deleted.history.has_changes():
+            service.remove_documents(doc_type, [target.id], connection)
+        return
+
+    restored = hasattr(target, 'is_deleted') and inspect(target).attrs.is_deleted.history.has_changes()
+    if restored or _search_fields_changed(target, doc_type):
+        service.index_document(doc_type, target, connection)
+
+
+def _on_after_delete(mapper, connection, target):
+    """物理删除业务数据后移除检索文档"""
+    get_search_service().remove_documents(_MODEL_DOC_TYPES[type(target)], [target.id], connection)
+
+
+def register_search_index_hooks():
+    """注册检索文档增量维护的 ORM 事件（重复调用安全）"""
+    handlers = (
+        ('after_insert', _on_after_insert),
+        ('after_update', _on_after_update),
+        ('after_delete', _on_after_delete),
+    )
+    for model in _MODEL_DOC_TYPES:
+        for identifier, handler in handlers:
+            if not event.contains(model, identifier, handler):
+                event.listen(model, identifier, handler)
@@ -0,0 +1,341 @@
+"""
+技能文件解析
+从技能目录的 SKILL.md 或脚本文件内容中提取技能信息，供 Git 仓库同步服务使用：
+- 解析函数不依赖 Flask 应用上下文与数据库，可以在子进程中执行；文件内容由调用方读取后传入
+- 技能目录较多时通过进程池并行解析（SkillParsePool），结果顺序与输入一致
+- YAML 优先使用 libyaml 提供的 CSafeLoader，不可用时回退到纯 Python 的 SafeLoader
+"""
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# SKILL.md 文件名（Claude Code 标准），按优先级排列
+SKILL_MD_FILES = ('SKILL.md', 'skill.md')
+# 脚本文件扩展名，按优先级排列：.py > .js > .yaml > .yml > .json
+SCRIPT_EXTENSIONS = ('.py', '.js', '.yaml', '.yml', '.json')
+
+# 解析任务: (技能目录名, 技能文件路径, 源文件名, 源文件内容)
+ParseTask = Tuple[str, str, str, str]
+# 解析结果: (技能信息, 日志级别, 日志内容)，解析失败或跳过时技能信息为 None
+ParseResult = Tuple[Optional[Dict], int, str]
+
+
+def yaml_load(content: str):
+    """安全加载 YAML"""
+    return yaml.load(content, Loader=_YAML_LOADER)
+
+
+def find_skill_file(file_names: Iterable[str]) -> Optional[str]:
+    """
+    在技能目录中查找技能文件：优先 SKILL.md，其次脚本文件
+
+    Args:
+        file_names: 技能目录下的文件名
+
+    Returns:
+        Optional[str]: 技能文件名
+    """
+    file_names = sorted(file_names)
+    for md_file in SKILL_MD_FILES:
+        if md_file in file_names:
+            return md_file
+    for ext in SCRIPT_EXTENSIONS:
+        for filename in file_names:
+            if filename.endswith(ext):
+                return filename
+    return None
+
+
+def get_script_type(file_ext: str) -> str:
+    """获取脚本类型"""
+    type_map = {
+        '.py': 'python',
+        '.js': 'javascript',
+        '.yaml': 'yaml',
+        '.yml': 'yaml',
+        '.json': 'json'
+    }
+    return type_map.get(file_ext, 'unknown')
+
+
+def parse_skill(task: ParseTask) -> ParseResult:
+    """
+    解析单个技能目录 - 参考 Claude Code Skills 格式
+
+    SKILL.md 格式:
+    ---
+    name: pdf
+    description: Extract and analyze text from PDF documents. Use when users ask to process or read PDFs.
+    ---
+
+    # PDF Processing Skill
+
+    Use the extract_text.py script in this folder to extract text from PDFs...
+
+    Args:
+        task: (技能目录名, 技能文件路径, 源文件名, 源文件内容)
+
+    Returns:
+        ParseResult: (技能信息, 日志级别, 日志内容)
+    """
+    skill_dir_name, file_path, source_file, content = task
+    try:
+        # 默认技能信息
+        skill_info = {
+            'name': skill_dir_name,
+            'code': skill_dir_name.lower().replace('-', '_').replace(' ', '_'),
+            'description': f'The {skill_dir_name} skill',
+            'script_content': '',
+            'script_type': 'markdown',
+            'params_schema': None,
+            'file_path': file_path
+        }
+
+        if source_file in SKILL_MD_FILES:
+            # 提取 YAML front matter 和描述
+            metadata = extract_skill_metadata(content)
+            skill_info.update(metadata)
+
+            # 完整的 SKILL.md 内容作为技能内容
+            skill_info['script_content'] = content
+            skill_info['script_type'] = 'markdown'
+
+            return skill_info, logging.INFO, f'解析技能: {skill_info["name"]} - {skill_info["description"][:50]}...'
+
+        # 没有 SKILL.md，从脚本文件解析
+        file_ext = os.path.splitext(source_file)[1].lower()
+        skill_info['script_content'] = content
+        skill_info['script_type'] = get_script_type(file_ext)
+
+        # 尝试从脚本文件提取元数据
+        metadata = extract_metadata(content, file_ext)
+        if metadata.get('name'):
+            skill_info.update(metadata)
+
+        return skill_info, logging.INFO, f'解析技能(从脚本): {skill_info["name"]}'
+
+    except Exception as e:
+        return None, logging.WARNING, f'解析技能目录失败 {skill_dir_name}: {str(e)}'
+
+
+def extract_skill_metadata(md_content: str) -> Dict:
+    """
+    从 skill.md 中提取技能元数据
+
+    支持格式：
+    ---
+    name: skill-name
+    description: Skill description
+    ---
+
+    Args:
+        md_content: Markdown 文件内容
+
+    Returns:
+        Dict: 元数据
+    """
+    metadata = {}
+
+    # 尝试提取 YAML front matter
+    front_matter = extract_front_matter(md_content)
+
+    if front_matter and isinstance(front_matter, dict):
+        # 从 front matter 提取字段
+        if front_matter.get('name'):
+            metadata['name'] = front_matter.get('name')
+            # 如果没有 code 字段，从 name 生成
+            if front_matter.get('code'):
+                metadata['code'] = front_matter.get('code')
+            else:
+                metadata['code'] = front_matter.get('name').lower().replace('-', '_').replace(' ', '_')
+        if front_matter.get('description'):
+            metadata['description'] = front_matter.get('description')
+
+        # 处理参数定义
+        params = front_matter.get('parameters')
+        if params:
+            metadata['params_schema'] = json.dumps(params, ensure_ascii=False)
+    else:
+        # 没有 front matter，尝试从 Markdown 内容中提取
+        lines = md_content.split('\n')
+        for line in lines:
+            line = line.strip()
+            if line.startswith('# '):
+                metadata['name'] = line[2:].strip()
+                metadata['code'] = metadata['name'].lower().replace('-', '_').replace(' ', '_')
+                break
+
+        # 如果没有找到描述，使用前几行非标题内容
+        if not metadata.get('description'):
+            desc_lines = []
+            for line in lines:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    desc_lines.append(line)
+                    if len(desc_lines) >= 3:
+                        break
+            metadata['description'] = ' '.join(desc_lines)[:200] if desc_lines else ''
+
+    return metadata
+
+
+def extract_metadata(content: str, file_ext: str) -> Dict:
+    """
+    从文件内容中提取元数据
+
+    Args:
+        content: 文件内容
+        file_ext: 文件扩展名
+
+    Returns:
+        Dict: 元数据
+    """
+    metadata = {}
+
+    if file_ext in ['.yaml', '.yml']:
+        # YAML格式，整个文件就是技能定义
+        try:
+            data = yaml_load(content)
+            if isinstance(data, dict):
+                metadata['name'] = data.get('name', metadata.get('name'))
+                metadata['code'] = data.get('code', metadata.get('code'))
+                metadata['description'] = data.get('description', '')
+                metadata['params_schema'] = json.dumps(data.get('parameters')) if data.get('parameters') else None
+        except:
+            pass
+
+    elif file_ext == '.json':
+        # JSON格式
+        try:
+            data = json.loads(content)
+            if isinstance(data, dict):
+                metadata['name'] = data.get('name', metadata.get('name'))
+                metadata['code'] = data.get('code', metadata.get('code'))
+                metadata['description'] = data.get('description', '')
+                metadata['params_schema'] = json.dumps(data.get('parameters')) if data.get('parameters') else None
+        except:
+            pass
+
+    elif file_ext in ['.py', '.js']:
+        # 从注释中提取YAML front matter
+        front_matter = extract_front_matter(content)
+        if front_matter:
+            metadata['name'] = front_matter.get('name', metadata.get('name'))
+            metadata['code'] = front_matter.get('code', metadata.get('code'))
+            metadata['description'] = front_matter.get('description', '')
+            metadata['params_schema'] = json.dumps(front_matter.get('parameters')) if front_matter.get('parameters') else None
+
+    return metadata
+
+
+def extract_front_matter(content: str) -> Optional[Dict]:
+    """
+    提取YAML front matter
+
+    Args:
+        content: 文件内容
+
+    Returns:
+        Optional[Dict]: front matter数据
+    """
+    # 匹配 --- 分隔的YAML front matter
+    pattern = r'^---\s*\n(.*?)\n---\s*\n'
+    match = re.match(pattern, content, re.DOTALL)
+
+    if match:
+        try:
+            return yaml_load(match.group(1))
+        except:
+            pass
+
+    return None
+
+
+class SkillParsePool:
+    """技能解析进程池（线程安全，每个进程一个实例，首次并行解析时创建子进程）"""
+
+    def __init__(self, workers: int = 4, threshold: int = 100):
+        """
+        Args:
+            workers: 子进程数量，小于等于1时始终在当前进程解析
+            threshold: 技能目录数达到该值才使用进程池，数量较少时进程间传输的开销大于并行收益
+        """
+        self.workers = workers
+        self.threshold = threshold
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._mp_context())
+            return self._executor
+
+    @staticmethod
+    def _mp_context():
+        """
+        子进程启动方式：不使用 fork，避免复制 Web 进程中的线程、锁与数据库连接。
+        优先 forkserver（预加载本模块，子进程从已导入 yaml 的服务进程派生），不支持的平台（Windows）使用 spawn；
+        两种方式下子进程都会以 __mp_main__ 重新导入启动脚本，因此 run.py 只在 __main__ 中创建应用，
+        其他启动脚本同样不能在模块级创建应用
+        """
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload([__name__])
+            return context
+        return multiprocessing.get_context('spawn')
+
+    def map(self, tasks: List[ParseTask]) -> List[ParseResult]:
+        """
+        解析多个技能目录
+
+        Returns:
+            List[ParseResult]: 解析结果，顺序与 tasks 一致
+        """
+        if self.workers <= 1 or len(tasks) < max(self.threshold, 2):
+            return [parse_skill(task) for task in tasks]
+
+        # 每个子进程分到若干批，兼顾负载均衡与进程间传输次数
+        chunksize = max(1, len(tasks) // (self.workers * 4))
+        try:
+            return list(self._get_executor().map(parse_skill, tasks, chunksize=chunksize))
+        except BrokenProcessPool as e:
+            # 子进程异常退出时丢弃进程池，本次改为在当前进程解析
+            logger.warning(f'技能解析进程池不可用，改为串行解析: {e}')
+            self.shutdown()
+            return [parse_skill(task) for task in tasks]
+
+    def shutdown(self):
+        """结束子进程"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局实例
+_skill_parse_pool = None
+
+
+def get_skill_parse_pool() -> SkillParsePool:
+    """获取技能解析进程池实例"""
+    global _skill_parse_pool
+    if _skill_parse_pool is None:
+        _skill_parse_pool = SkillParsePool(
+            current_app.config.get('SKILL_PARSE_WORKERS', 4),
+            current_app.config.get('SKILL_PARSE_PARALLEL_THRESHOLD', 100)
+        )
+    return _skill_parse_pool
@@ -3,6 +3,7 @@
 """
 from .errors import success_response, error_response, abort_with_message
 from .crypto import encrypt_data, decrypt_data, get_crypto_manager, generate_fernet_key
+from .pagination import is_cursor_request, cursor_paginate, cursor_page_response, InvalidCursorError
 
 __all__ = [
     'success_response',
@@ -11,5 +12,9 @@ __all__ = [
     'encrypt_data',
     'decrypt_data',
     'get_crypto_manager',
-    'generate_fernet_key'
+    'generate_fernet_key',
+    'is_cursor_request',
+    'cursor_paginate',
+    'cursor_page_response',
+    'InvalidCursorError'
 ]
@@ -1,37 +1,115 @@
 """
 异步辅助工具
+进程内只有一个常驻的后台事件循环线程，所有 MCP 客户端会话都运行在其中；
+同步代码（Flask 请求处理线程、后台任务线程）通过 run_coroutine_threadsafe 提交协程并等待结果，
+因此异步连接可以跨请求保持，多个请求线程的调用也能在同一个循环中并发执行
 """
 import asyncio
+import atexit
 import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 
-def run_async(coro):
+class EventLoopThread:
+    """后台事件循环线程"""
+
+    def __init__(self, name: str = 'async-loop'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """事件循环，首次访问时启动线程"""
+        if self._loop is None or self._loop.is_closed():
+            with self._lock:
+                if self._loop is None or self._loop.is_closed():
+                    loop = asyncio.new_event_loop()
+                    ready = threading.Event()
+                    self._thread = threading.Thread(target=self._run, args=(loop, ready), name=self.name, daemon=True)
+                    self._thread.start()
+                    ready.wait()
+                    self._loop = loop
+                    logger.info(f'后台事件循环线程已启动: {self.name}')
+        return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        """当前是否在事件循环线程中"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro) -> Future:
+        """提交协程，立即返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """
+        提交协程并同步等待结果
+
+        Args:
+            coro: 协程对象
+            timeout: 等待超时（秒），超时或等待被中断时取消协程
+
+        Raises:
+            asyncio.TimeoutError: 超时
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError('不能在事件循环线程中同步等待协程，请直接 await')
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise asyncio.TimeoutError()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 5):
+        """停止事件循环"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# 全局实例
+_event_loop_thread = None
+_event_loop_thread_lock = threading.Lock()
+
+
+def get_event_loop_thread() -> EventLoopThread:
+    """获取进程级后台事件循环线程"""
+    global _event_loop_thread
+    if _event_loop_thread is None:
+        with _event_loop_thread_lock:
+            if _event_loop_thread is None:
+                _event_loop_thread = EventLoopThread('mcp-event-loop')
+                atexit.register(_event_loop_thread.stop)
+    return _event_loop_thread
+
+
+def run_async(coro, timeout: Optional[float] = None):
     """
-    在同步上下文中运行异步函数
+    在同步上下文中运行异步函数（提交到后台事件循环线程）
 
     Args:
         coro: 协程对象
+        timeout: 等待超时（秒），超时后取消协程并抛出 asyncio.TimeoutError
 
     Returns:
         协程的返回值
     """
-    try:
-        # 尝试获取现有事件循环
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # 如果循环正在运行，创建新循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-    except RuntimeError:
-        # 没有事件循环，创建新的
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        # 确保循环被正确关闭
-        if not loop.is_closed():
-            loop.close()
+    return get_event_loop_thread().run(coro, timeout)
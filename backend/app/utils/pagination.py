@@ -0,0 +1,95 @@
+"""
+游标（keyset）分页工具
+
+传统 paginate() 每次都会执行 COUNT(*) 并用 OFFSET 跳过前面的行，页码越深越慢。
+游标分页以上一页最后一条记录的 id 作为起点（WHERE id < cursor），
+配合主键索引只扫描本页数据，默认不统计总数。
+游标分页固定按 id 倒序，不支持按相关度等其他字段排序。
+"""
+from flask import request
+
+from .errors import success_response, error_response
+
+
+class InvalidCursorError(ValueError):
+    """游标参数格式错误"""
+    pass
+
+
+def is_cursor_request():
+    """
+    判断当前请求是否启用游标分页
+
+    只要查询参数中带有 cursor（包括空值 cursor= 表示第一页）即视为启用
+    """
+    return 'cursor' in request.args
+
+
+def _parse_cursor():
+    """解析游标参数，空值表示第一页，非正整数视为格式错误"""
+    value = request.args.get('cursor', '').strip()
+    if not value:
+        return None
+    if not value.isdigit() or int(value) <= 0:
+        raise InvalidCursorError(f'游标格式错误: {value}')
+    return int(value)
+
+
+def cursor_paginate(query, id_column, per_page, serializer=None):
+    """
+    按 id 倒序执行游标分页
+
+    Args:
+        query: 已应用过滤条件、尚未排序的查询
+        id_column: 作为游标的主键列，如 TestCase.id
+        per_page: 每页数量
+        serializer: 接收本页对象列表并返回字典列表的函数，默认逐条调用 to_dict()
+
+    Returns:
+        dict: 包含 items、next_cursor、has_more、per_page；
+              请求参数 with_total=true 时额外返回 total
+
+    Raises:
+        InvalidCursorError: 游标参数格式错误
+    """
+    cursor = _parse_cursor()
+    per_page = max(per_page or 20, 1)
+
+    page_query = query
+    if cursor:
+        page_query = page_query.filter(id_column < cursor)
+
+    # 多取一条用于判断是否还有下一页
+    rows = page_query.order_by(id_column.desc()).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if serializer is None:
+        items = [item.to_dict() for item in rows]
+    else:
+        items = serializer(rows)
+
+    data = {
+        'items': items,
+        'next_cursor': rows[-1].id if has_more else None,
+        'has_more': has_more,
+        'per_page': per_page
+    }
+
+    if request.args.get('with_total', 'false').lower() == 'true':
+        data['total'] = query.order_by(None).count()
+
+    return data
+
+
+def cursor_page_response(query, id_column, per_page, serializer=None):
+    """
+    执行游标分页并生成响应，游标格式错误时返回 400
+
+    参数同 cursor_paginate
+    """
+    try:
+        data = cursor_paginate(query, id_column, per_page, serializer)
+    except InvalidCursorError as e:
+        return error_response(message=str(e), code=400)
+    return success_response(data=data)
@@ -0,0 +1,55 @@
+"""
+按唯一键批量写入（upsert）
+MySQL 使用 INSERT ... ON DUPLICATE KEY UPDATE，PostgreSQL / SQLite 使用 INSERT ... ON CONFLICT DO UPDATE，
+一条语句写入整批数据；其他数据库逐行先更新、未命中再插入
+"""
+from typing import Dict, List, Sequence
+
+from sqlalchemy import Table, and_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+
+def upsert(executor, table: Table, rows: List[Dict], key_columns: Sequence[str],
+           increment_columns: Sequence[str] = (), update_columns: Sequence[str] = ()):
+    """
+    批量写入，唯一键已存在时累加或覆盖指定字段
+
+    Args:
+        executor: db.session 或数据库连接（ORM 事件内传入当前 flush 的连接）
+        table: 目标表
+        rows: 待写入的行，每行包含相同的字段
+        key_columns: 唯一键字段，表上需有对应的唯一约束
+        increment_columns: 键已存在时累加的字段（原值 + 新值）
+        update_columns: 键已存在时覆盖为新值的字段
+    """
+    if not rows:
+        return
+    dialect = executor.dialect.name if hasattr(executor, 'dialect') else executor.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        statement = mysql.insert(table)
+        values = {name: table.c[name] + statement.inserted[name] for name in increment_columns}
+        values.update({name: statement.inserted[name] for name in update_columns})
+        executor.execute(statement.on_duplicate_key_update(**values), rows)
+        return
+
+    if dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        values = {name: table.c[name] + statement.excluded[name] for name in increment_columns}
+        values.update({name: statement.excluded[name] for name in update_columns})
+        if values:
+            statement = statement.on_conflict_do_update(index_elements=list(key_columns), set_=values)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(key_columns))
+        executor.execute(statement, rows)
+        return
+
+    for row in rows:
+        condition = and_(*(table.c[name] == row[name] for name in key_columns))
+        values = {name: table.c[name] + row[name] for name in increment_columns}
+        values.update({name: row[name] for name in update_columns})
+        result = executor.execute(table.update().where(condition).values(**values)) if values else None
+        if result is None or result.rowcount == 0:
+            if result is None and executor.execute(table.select().where(condition)).first() is not None:
+                continue
+            executor.execute(table.insert().values(**row))
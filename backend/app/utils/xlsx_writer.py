@@ -0,0 +1,147 @@
+"""
+流式 XLSX 写入
+按行写入工作表，行数据直接写进 zip 条目，不在内存中保留整个工作表；
+只生成内联字符串与数字单元格，满足报告导出需要，不依赖第三方库
+"""
+import re
+import zipfile
+from datetime import date, datetime
+from typing import IO, Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+# XML 1.0 不允许的控制字符
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# 工作表名称不允许的字符
+_ILLEGAL_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+_CONTENT_TYPES_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _column_name(index: int) -> str:
+    """列序号（从0开始）转列名，如 0 -> A, 26 -> AA"""
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(ord('A') + remainder) + name
+    return name
+
+
+def _cell(reference: str, value) -> str:
+    """单元格 XML，空值返回空串"""
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    text = escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class XlsxWriter:
+    """流式 XLSX 写入器，工作表需依次写完，不能交替写入"""
+
+    def __init__(self, file: IO[bytes]):
+        """
+        Args:
+            file: 以二进制写模式打开的文件
+        """
+        self._zip = zipfile.ZipFile(file, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._sheets: List[str] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_sheet(self, title: str, rows: Iterable[Iterable], header: Optional[Iterable] = None) -> int:
+        """
+        写入一个工作表
+
+        Args:
+            title: 工作表名称（最长31个字符）
+            rows: 行数据，可以是生成器
+            header: 表头行
+
+        Returns:
+            int: 写入的数据行数（不含表头）
+        """
+        title = _ILLEGAL_SHEET_CHARS.sub('_', title)[:31] or f'Sheet{len(self._sheets) + 1}'
+        self._sheets.append(title)
+        count = 0
+        with self._zip.open(f'xl/worksheets/sheet{len(self._sheets)}.xml', 'w', force_zip64=True) as part:
+            part.write(_SHEET_HEAD.encode('utf-8'))
+            row_number = 0
+            if header is not None:
+                row_number += 1
+                part.write(self._row(row_number, header))
+            for row in rows:
+                row_number += 1
+                count += 1
+                part.write(self._row(row_number, row))
+            part.write(_SHEET_TAIL.encode('utf-8'))
+        return count
+
+    @staticmethod
+    def _row(row_number: int, values: Iterable) -> bytes:
+        cells = ''.join(_cell(f'{_column_name(index)}{row_number}', value) for index, value in enumerate(values))
+        return f'<row r="{row_number}">{cells}</row>'.encode('utf-8')
+
+    def close(self):
+        """写入工作簿结构并关闭文件"""
+        if self._zip is None:
+            return
+        if not self._sheets:
+            self.write_sheet('Sheet1', [])
+        sheets = range(1, len(self._sheets) + 1)
+        content_types = _CONTENT_TYPES_HEAD + ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{index}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for index in sheets
+        ) + '</Types>'
+        workbook = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + ''.join(f'<sheet name="{escape(title, {chr(34): "&quot;"})}" sheetId="{index}" r:id="rId{index}"/>'
+                      for index, title in zip(sheets, self._sheets))
+            + '</sheets></workbook>'
+        )
+        workbook_rels = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(f'<Relationship Id="rId{index}" '
+                      'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                      f'Target="worksheets/sheet{index}.xml"/>' for index in sheets)
+            + '</Relationships>'
+        )
+        self._zip.writestr('[Content_Types].xml', content_types)
+        self._zip.writestr('_rels/.rels', _ROOT_RELS)
+        self._zip.writestr('xl/workbook.xml', workbook)
+        self._zip.writestr('xl/_rels/workbook.xml.rels', workbook_rels)
+        self._zip.close()
+        self._zip = None
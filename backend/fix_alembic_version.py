@@ -3,10 +3,12 @@
 修复 Alembic 版本表
 当数据库表已存在但 alembic_version 记录不正确时使用
 """
-from run import app
+from run import create_app
 from app import db
 from sqlalchemy import text
 
+app = create_app()
+
 def check_and_fix_alembic_version():
     """检查并修复 alembic_version 表"""
     with app.app_context():
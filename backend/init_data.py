@@ -1,10 +1,12 @@
 """
 初始化测试数据
 """
-from run import app, db
+from run import create_app, db
 from app.models import Tenant, User
 from datetime import datetime, timedelta
 
+app = create_app()
+
 
 def init_test_data():
     """初始化测试数据"""
@@ -1,10 +1,12 @@
 """
 数据迁移脚本：将现有数据关联到项目
 """
-from run import app, db
+from run import create_app, db
 from app.models import Project, TestSuite, TestPlan, Defect
 from sqlalchemy import text
 
+app = create_app()
+
 
 def migrate_data_to_projects():
     """将现有数据迁移到项目"""
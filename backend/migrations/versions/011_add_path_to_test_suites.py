@@ -0,0 +1,54 @@
+"""Add materialized path to test_suites
+
+Revision ID: 011_add_suite_path
+Revises: f6ec7584e789
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011_add_suite_path'
+down_revision = 'f6ec7584e789'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """添加 path 物化路径字段到 test_suites 表，并回填现有数据"""
+    with op.batch_alter_table('test_suites', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('path', sa.String(length=500), nullable=True, comment='物化路径，如 /1/5/12/'))
+        batch_op.create_index('ix_test_suites_path', ['path'], unique=False)
+
+    # 回填物化路径：自顶向下遍历套件树
+    connection = op.get_bind()
+    rows = connection.execute(sa.text('SELECT id, parent_id FROM test_suites')).fetchall()
+
+    suite_ids = {row[0] for row in rows}
+    children_index = {}
+    for suite_id, parent_id in rows:
+        parent_key = parent_id if parent_id in suite_ids else None
+        children_index.setdefault(parent_key, []).append(suite_id)
+
+    paths = []
+    stack = [(suite_id, '/') for suite_id in children_index.get(None, [])]
+    while stack:
+        suite_id, parent_path = stack.pop()
+        path = f'{parent_path}{suite_id}/'
+        paths.append({'id': suite_id, 'path': path})
+        stack.extend((child_id, path) for child_id in children_index.get(suite_id, []))
+
+    if paths:
+        connection.execute(
+            sa.text('UPDATE test_suites SET path = :path WHERE id = :id'),
+            paths
+        )
+
+
+def downgrade():
+    """删除 path 字段"""
+    with op.batch_alter_table('test_suites', schema=None) as batch_op:
+        batch_op.drop_index('ix_test_suites_path')
+        batch_op.drop_column('path')
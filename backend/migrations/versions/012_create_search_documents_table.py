@@ -0,0 +1,148 @@
+"""Create search_documents table for full-text search
+
+Revision ID: 012_search_documents
+Revises: 011_add_suite_path
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012_search_documents'
+down_revision = '011_add_suite_path'
+branch_labels = None
+depends_on = None
+
+
+# 与 app/services/search_service.py 中的检索字段、表达式保持一致
+SEARCHABLE_SOURCES = {
+    'test_case': {
+        'sql': 'SELECT id, case_no, name, description, preconditions, steps, expected_result, tags '
+               'FROM test_cases WHERE is_deleted IS NULL OR NOT is_deleted',
+        'title_fields': ('case_no', 'name'),
+        'content_fields': ('description', 'preconditions', 'steps', 'expected_result', 'tags'),
+    },
+    'defect': {
+        'sql': 'SELECT id, defect_no, title, description, reproduction_steps, expected_behavior, '
+               'actual_behavior, tags FROM defects',
+        'title_fields': ('defect_no', 'title'),
+        'content_fields': ('description', 'reproduction_steps', 'expected_behavior', 'actual_behavior', 'tags'),
+    },
+}
+MAX_CONTENT_LENGTH = 16000
+PG_TSVECTOR_SQL = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(content, ''))"
+
+
+def _flatten_text(value):
+    """将 JSON 文本展开为纯文本，非 JSON 内容原样返回"""
+    if not value:
+        return ''
+    try:
+        data = json.loads(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+    parts = []
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+        elif item is not None and not isinstance(item, bool):
+            parts.append(str(item))
+    return ' '.join(parts)
+
+
+def _create_sqlite_fts(connection):
+    """创建 SQLite FTS5 虚拟表及同步触发器，SQLite 不支持 FTS5/trigram 时跳过（检索退化为 LIKE）"""
+    try:
+        connection.execute(sa.text(
+            "CREATE VIRTUAL TABLE search_documents_fts USING fts5("
+            "title, content, content='search_documents', content_rowid='id', tokenize='trigram')"
+        ))
+    except Exception:
+        return
+
+    connection.execute(sa.text("""
+        CREATE TRIGGER search_documents_ai AFTER INSERT ON search_documents BEGIN
+            INSERT INTO search_documents_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    """))
+    connection.execute(sa.text("""
+        CREATE TRIGGER search_documents_ad AFTER DELETE ON search_documents BEGIN
+            INSERT INTO search_documents_fts(search_documents_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+        END
+    """))
+    connection.execute(sa.text("""
+        CREATE TRIGGER search_documents_au AFTER UPDATE ON search_documents BEGIN
+            INSERT INTO search_documents_fts(search_documents_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO search_documents_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    """))
+
+
+def upgrade():
+    """创建全文检索文档表，按数据库类型创建全文索引，并回填现有用例和缺陷"""
+    op.create_table('search_documents',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('doc_type', sa.String(length=50), nullable=False, comment='文档类型: test_case, defect'),
+        sa.Column('doc_id', sa.Integer(), nullable=False, comment='业务数据ID'),
+        sa.Column('title', sa.String(length=500), nullable=True, comment='标题（编号 + 名称）'),
+        sa.Column('content', sa.Text(), nullable=True, comment='正文（描述、步骤、标签等拼接后的纯文本）'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('doc_type', 'doc_id', name='uq_search_documents_doc'),
+        comment='全文检索文档表'
+    )
+
+    connection = op.get_bind()
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        # ngram 分词解析器支持中文
+        op.execute('CREATE FULLTEXT INDEX ft_search_documents ON search_documents (title, content) WITH PARSER ngram')
+    elif dialect == 'postgresql':
+        op.execute(f'CREATE INDEX ix_search_documents_tsv ON search_documents USING gin ({PG_TSVECTOR_SQL})')
+    elif dialect == 'sqlite':
+        _create_sqlite_fts(connection)
+
+    # 回填检索文档
+    documents = sa.table('search_documents',
+        sa.column('doc_type', sa.String), sa.column('doc_id', sa.Integer),
+        sa.column('title', sa.String), sa.column('content', sa.Text),
+        sa.column('updated_at', sa.DateTime))
+    now = datetime.utcnow()
+    for doc_type, source in SEARCHABLE_SOURCES.items():
+        rows = connection.execute(sa.text(source['sql'])).mappings().fetchall()
+        payload = []
+        for row in rows:
+            title = ' '.join(row[field] for field in source['title_fields'] if row[field])[:500]
+            content = '\n'.join(
+                part for part in (_flatten_text(row[field]) for field in source['content_fields']) if part
+            )[:MAX_CONTENT_LENGTH]
+            payload.append({
+                'doc_type': doc_type,
+                'doc_id': row['id'],
+                'title': title,
+                'content': content,
+                'updated_at': now
+            })
+        if payload:
+            op.bulk_insert(documents, payload)
+
+
+def downgrade():
+    """删除全文检索文档表"""
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('search_documents_ai', 'search_documents_ad', 'search_documents_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS search_documents_fts')
+    op.drop_table('search_documents')
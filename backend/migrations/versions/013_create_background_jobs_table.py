@@ -0,0 +1,51 @@
+"""Create background_jobs table
+
+Revision ID: 013_background_jobs
+Revises: 012_search_documents
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '013_background_jobs'
+down_revision = '012_search_documents'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """创建后台任务表"""
+    op.create_table('background_jobs',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('job_type', sa.String(length=50), nullable=False, comment='任务类型，如 ai_execution'),
+        sa.Column('status', sa.String(length=20), nullable=True, comment='状态: pending, running, completed, failed, stopped'),
+        sa.Column('payload', sa.Text(), nullable=True, comment='任务参数(JSON)'),
+        sa.Column('state', sa.Text().with_variant(mysql.LONGTEXT(), 'mysql'), nullable=True,
+                  comment='任务运行状态(JSON)，由任务处理函数维护'),
+        sa.Column('progress', sa.Integer(), nullable=True, comment='进度(0-100)'),
+        sa.Column('error_message', sa.Text(), nullable=True, comment='错误信息'),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=True, comment='是否已请求取消'),
+        sa.Column('attempts', sa.Integer(), nullable=True, comment='已执行次数'),
+        sa.Column('max_attempts', sa.Integer(), nullable=True, comment='最大执行次数，工作进程退出后据此决定是否重新排队'),
+        sa.Column('worker_id', sa.String(length=100), nullable=True, comment='执行该任务的工作进程标识'),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True, comment='最后心跳时间'),
+        sa.Column('created_at', sa.DateTime(), nullable=True, comment='创建时间'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='开始时间'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='结束时间'),
+        sa.Column('created_by', sa.String(length=100), nullable=True, comment='创建人'),
+        sa.PrimaryKeyConstraint('id'),
+        comment='后台任务表'
+    )
+    op.create_index('ix_background_jobs_job_type', 'background_jobs', ['job_type'], unique=False)
+    op.create_index('ix_background_jobs_status', 'background_jobs', ['status'], unique=False)
+
+
+def downgrade():
+    """删除后台任务表"""
+    op.drop_index('ix_background_jobs_status', table_name='background_jobs')
+    op.drop_index('ix_background_jobs_job_type', table_name='background_jobs')
+    op.drop_table('background_jobs')
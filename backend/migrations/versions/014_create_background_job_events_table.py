@@ -0,0 +1,37 @@
+"""Create background_job_events table
+
+Revision ID: 014_background_job_events
+Revises: 013_background_jobs
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014_background_job_events'
+down_revision = '013_background_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """创建后台任务增量事件表"""
+    op.create_table('background_job_events',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('job_id', sa.Integer(), nullable=False, comment='后台任务ID'),
+        sa.Column('event_type', sa.String(length=50), nullable=False, comment='事件类型，如 case_status, log'),
+        sa.Column('data', sa.Text(), nullable=True, comment='事件数据(JSON)'),
+        sa.Column('created_at', sa.DateTime(), nullable=True, comment='创建时间'),
+        sa.ForeignKeyConstraint(['job_id'], ['background_jobs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        comment='后台任务增量事件表'
+    )
+    op.create_index('ix_background_job_events_job_id_id', 'background_job_events', ['job_id', 'id'], unique=False)
+
+
+def downgrade():
+    """删除后台任务增量事件表"""
+    op.drop_index('ix_background_job_events_job_id_id', table_name='background_job_events')
+    op.drop_table('background_job_events')
@@ -0,0 +1,29 @@
+"""Add session_pool_size to mcp_servers
+
+Revision ID: 015_mcp_session_pool_size
+Revises: 014_background_job_events
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015_mcp_session_pool_size'
+down_revision = '014_background_job_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """添加 session_pool_size 字段到 mcp_servers 表"""
+    with op.batch_alter_table('mcp_servers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_pool_size', sa.Integer(), nullable=True, server_default='1',
+                                      comment='常驻会话数上限，会话繁忙时按需扩容至该数量'))
+
+
+def downgrade():
+    """删除 session_pool_size 字段"""
+    with op.batch_alter_table('mcp_servers', schema=None) as batch_op:
+        batch_op.drop_column('session_pool_size')
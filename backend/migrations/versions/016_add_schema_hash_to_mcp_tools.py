@@ -0,0 +1,29 @@
+"""Add schema_hash to mcp_tools
+
+Revision ID: 016_mcp_tool_schema_hash
+Revises: 015_mcp_session_pool_size
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '016_mcp_tool_schema_hash'
+down_revision = '015_mcp_session_pool_size'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """添加 schema_hash 字段到 mcp_tools 表（已有记录在下次同步时补齐）"""
+    with op.batch_alter_table('mcp_tools', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('schema_hash', sa.String(length=64), nullable=True,
+                                      comment='输入schema摘要(SHA-256)，同步时据此判断是否需要改写'))
+
+
+def downgrade():
+    """删除 schema_hash 字段"""
+    with op.batch_alter_table('mcp_tools', schema=None) as batch_op:
+        batch_op.drop_column('schema_hash')
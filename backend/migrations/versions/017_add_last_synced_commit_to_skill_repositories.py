@@ -0,0 +1,29 @@
+"""Add last_synced_commit to skill_repositories
+
+Revision ID: 017_skill_repo_last_synced_commit
+Revises: 016_mcp_tool_schema_hash
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '017_skill_repo_last_synced_commit'
+down_revision = '016_mcp_tool_schema_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """添加 last_synced_commit 字段到 skill_repositories 表（为空时下次同步为全量同步）"""
+    with op.batch_alter_table('skill_repositories', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_synced_commit', sa.String(length=64), nullable=True,
+                                      comment='最后一次成功同步的commit，增量同步的比较基准'))
+
+
+def downgrade():
+    """删除 last_synced_commit 字段"""
+    with op.batch_alter_table('skill_repositories', schema=None) as batch_op:
+        batch_op.drop_column('last_synced_commit')
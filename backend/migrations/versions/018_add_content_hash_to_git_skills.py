@@ -0,0 +1,29 @@
+"""Add content_hash to git_skills
+
+Revision ID: 018_git_skill_content_hash
+Revises: 017_skill_repo_last_synced_commit
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '018_git_skill_content_hash'
+down_revision = '017_skill_repo_last_synced_commit'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """添加 content_hash 字段到 git_skills 表（已有记录在下次同步时补齐）"""
+    with op.batch_alter_table('git_skills', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True,
+                                      comment='技能内容摘要(SHA-256)，同步时据此跳过未变化的技能'))
+
+
+def downgrade():
+    """删除 content_hash 字段"""
+    with op.batch_alter_table('git_skills', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,64 @@
+"""Create execution_daily_stats table
+
+Revision ID: 019_execution_daily_stats
+Revises: 018_git_skill_content_hash
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '019_execution_daily_stats'
+down_revision = '018_git_skill_content_hash'
+branch_labels = None
+depends_on = None
+
+
+# 按 项目 × 测试计划 × 日期 × 状态 汇总已有执行记录，规则与 ExecutionStatsService.rebuild 一致
+BACKFILL_SQL = """
+INSERT INTO execution_daily_stats
+    (project_id, test_plan_id, stat_date, status, execution_count, total_duration)
+SELECT COALESCE(p.project_id, s.project_id, 0),
+       COALESCE(e.test_plan_id, 0),
+       DATE(e.execution_time),
+       COALESCE(e.status, 'not_executed'),
+       COUNT(e.id),
+       COALESCE(SUM(e.duration), 0)
+FROM test_executions e
+LEFT JOIN test_plans p ON p.id = e.test_plan_id
+LEFT JOIN test_cases c ON c.id = e.test_case_id
+LEFT JOIN test_suites s ON s.id = c.suite_id
+WHERE e.execution_time IS NOT NULL
+GROUP BY COALESCE(p.project_id, s.project_id, 0),
+         COALESCE(e.test_plan_id, 0),
+         DATE(e.execution_time),
+         COALESCE(e.status, 'not_executed')
+"""
+
+
+def upgrade():
+    """创建执行记录按日汇总表，并汇总已有执行记录"""
+    op.create_table('execution_daily_stats',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('project_id', sa.Integer(), nullable=False, server_default='0', comment='项目ID，0 表示未归属项目'),
+        sa.Column('test_plan_id', sa.Integer(), nullable=False, server_default='0',
+                  comment='测试计划ID，0 表示不属于测试计划'),
+        sa.Column('stat_date', sa.Date(), nullable=False, comment='执行日期(UTC)'),
+        sa.Column('status', sa.String(length=20), nullable=False, comment='执行状态'),
+        sa.Column('execution_count', sa.Integer(), nullable=False, server_default='0', comment='执行次数'),
+        sa.Column('total_duration', sa.BigInteger(), nullable=False, server_default='0', comment='执行总时长(秒)'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('project_id', 'test_plan_id', 'stat_date', 'status', name='uq_execution_daily_stats_key'),
+        comment='执行记录按日汇总表'
+    )
+    op.create_index('ix_execution_daily_stats_project_date', 'execution_daily_stats',
+                    ['project_id', 'stat_date'], unique=False)
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade():
+    """删除执行记录按日汇总表"""
+    op.drop_index('ix_execution_daily_stats_project_date', table_name='execution_daily_stats')
+    op.drop_table('execution_daily_stats')
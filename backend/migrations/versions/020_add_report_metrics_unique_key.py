@@ -0,0 +1,40 @@
+"""Add unique key (report_id, metric_key) to report_metrics
+
+Revision ID: 020_report_metrics_unique_key
+Revises: 019_execution_daily_stats
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '020_report_metrics_unique_key'
+down_revision = '019_execution_daily_stats'
+branch_labels = None
+depends_on = None
+
+
+# 同一报告重复的指标键只保留最新一条（MySQL 不允许子查询直接引用被删除的表，需包一层派生表）
+DEDUPLICATE_SQL = """
+DELETE FROM report_metrics
+WHERE id NOT IN (
+    SELECT id FROM (
+        SELECT MAX(id) AS id FROM report_metrics GROUP BY report_id, metric_key
+    ) latest
+)
+"""
+
+
+def upgrade():
+    """清理重复的指标键，并为 report_metrics 添加 (report_id, metric_key) 唯一约束"""
+    op.execute(DEDUPLICATE_SQL)
+    with op.batch_alter_table('report_metrics', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_report_metrics_report_key', ['report_id', 'metric_key'])
+
+
+def downgrade():
+    """删除唯一约束（已清理的重复数据不恢复）"""
+    with op.batch_alter_table('report_metrics', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_report_metrics_report_key', type_='unique')
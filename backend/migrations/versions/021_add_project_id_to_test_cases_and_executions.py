@@ -0,0 +1,59 @@
+"""Add denormalized project_id to test_cases and test_executions
+
+Revision ID: 021_case_execution_project_id
+Revises: 020_report_metrics_unique_key
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '021_case_execution_project_id'
+down_revision = '020_report_metrics_unique_key'
+branch_labels = None
+depends_on = None
+
+
+# 用例取所在套件的项目，执行记录取用例的项目（关联子查询，MySQL / PostgreSQL / SQLite 通用）
+BACKFILL_CASES_SQL = """
+UPDATE test_cases
+SET project_id = (SELECT s.project_id FROM test_suites s WHERE s.id = test_cases.suite_id)
+WHERE suite_id IS NOT NULL
+"""
+
+BACKFILL_EXECUTIONS_SQL = """
+UPDATE test_executions
+SET project_id = (SELECT c.project_id FROM test_cases c WHERE c.id = test_executions.test_case_id)
+"""
+
+
+def upgrade():
+    """为用例与执行记录添加所属项目字段，按套件回填，并建立项目维度的组合索引"""
+    with op.batch_alter_table('test_cases', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('project_id', sa.Integer(), nullable=True,
+                                      comment='所属项目ID（冗余自所在套件，由 ORM 事件维护）'))
+    with op.batch_alter_table('test_executions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('project_id', sa.Integer(), nullable=True,
+                                      comment='所属项目ID（冗余自用例，由 ORM 事件维护）'))
+
+    op.execute(BACKFILL_CASES_SQL)
+    op.execute(BACKFILL_EXECUTIONS_SQL)
+
+    op.create_index('ix_test_cases_project_deleted_id', 'test_cases',
+                    ['project_id', 'is_deleted', 'id'], unique=False)
+    op.create_index('ix_test_executions_project_id', 'test_executions', ['project_id', 'id'], unique=False)
+    op.create_index('ix_test_executions_project_time', 'test_executions',
+                    ['project_id', 'execution_time'], unique=False)
+
+
+def downgrade():
+    """删除项目字段及索引"""
+    op.drop_index('ix_test_executions_project_time', table_name='test_executions')
+    op.drop_index('ix_test_executions_project_id', table_name='test_executions')
+    op.drop_index('ix_test_cases_project_deleted_id', table_name='test_cases')
+    with op.batch_alter_table('test_executions', schema=None) as batch_op:
+        batch_op.drop_column('project_id')
+    with op.batch_alter_table('test_cases', schema=None) as batch_op:
+        batch_op.drop_column('project_id')
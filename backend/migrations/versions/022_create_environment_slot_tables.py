@@ -0,0 +1,47 @@
+"""Create environment_slots and environment_slot_leases tables
+
+Revision ID: 022_environment_slots
+Revises: 021_case_execution_project_id
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '022_environment_slots'
+down_revision = '021_case_execution_project_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """创建测试环境执行槽位占用表与占用记录表"""
+    op.create_table('environment_slots',
+        sa.Column('environment_id', sa.Integer(), nullable=False, autoincrement=False,
+                  comment='测试环境ID，0 表示未指定环境'),
+        sa.Column('in_use', sa.Integer(), nullable=False, server_default='0', comment='占用中的槽位数'),
+        sa.PrimaryKeyConstraint('environment_id'),
+        comment='测试环境执行槽位占用数'
+    )
+    op.create_table('environment_slot_leases',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('environment_id', sa.Integer(), nullable=False, comment='测试环境ID，0 表示未指定环境'),
+        sa.Column('job_id', sa.Integer(), nullable=False, comment='占用槽位的后台任务ID'),
+        sa.Column('worker_id', sa.String(length=100), nullable=True, comment='占用槽位的工作进程标识'),
+        sa.Column('acquired_at', sa.DateTime(), nullable=True, comment='占用时间'),
+        sa.PrimaryKeyConstraint('id'),
+        comment='测试环境槽位占用记录'
+    )
+    op.create_index('ix_environment_slot_leases_environment_id', 'environment_slot_leases',
+                    ['environment_id'], unique=False)
+    op.create_index('ix_environment_slot_leases_job_id', 'environment_slot_leases', ['job_id'], unique=False)
+
+
+def downgrade():
+    """删除测试环境执行槽位表"""
+    op.drop_index('ix_environment_slot_leases_job_id', table_name='environment_slot_leases')
+    op.drop_index('ix_environment_slot_leases_environment_id', table_name='environment_slot_leases')
+    op.drop_table('environment_slot_leases')
+    op.drop_table('environment_slots')
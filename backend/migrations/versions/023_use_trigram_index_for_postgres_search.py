@@ -0,0 +1,47 @@
+"""Use pg_trgm indexes for search_documents on PostgreSQL
+
+Revision ID: 023_search_documents_trgm
+Revises: 022_environment_slots
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '023_search_documents_trgm'
+down_revision = '022_environment_slots'
+branch_labels = None
+depends_on = None
+
+
+PG_TSVECTOR_SQL = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(content, ''))"
+
+
+def upgrade():
+    """
+    PostgreSQL 改用 pg_trgm 三元组 GIN 索引：tsvector 按整词匹配，中文及部分编号无法命中；
+    无权限创建扩展时只删除旧索引，检索退化为 LIKE；其他数据库无变化
+    """
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_search_documents_tsv')
+    try:
+        with connection.begin_nested():
+            connection.execute(sa.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    except Exception:
+        return
+    op.execute('CREATE INDEX ix_search_documents_title_trgm ON search_documents USING gin (title gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_search_documents_content_trgm ON search_documents USING gin (content gin_trgm_ops)')
+
+
+def downgrade():
+    """恢复 tsvector 表达式索引（保留 pg_trgm 扩展）"""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX IF EXISTS ix_search_documents_content_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_search_documents_title_trgm')
+    op.execute(f'CREATE INDEX ix_search_documents_tsv ON search_documents USING gin ({PG_TSVECTOR_SQL})')
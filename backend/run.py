@@ -2,35 +2,45 @@
 测试管理平台 - 后端启动入口
 """
 import os
-from app import create_app, db
+from app import create_app as create_flask_app, db
 from app.models import (
     TestCase, TestSuite, TestPlan, TestPlanCase,
     TestEnvironment, Defect, DefectWorkflow,
     TestExecution, TestReport, Tenant, TenantUser, User
 )
 
-# 创建应用实例
-app = create_app(os.getenv('FLASK_ENV') or 'development')
 
-# Shell上下文
-@app.shell_context_processor
-def make_shell_context():
-    """注册shell上下文"""
-    return {
-        'db': db,
-        'TestCase': TestCase,
-        'TestSuite': TestSuite,
-        'TestPlan': TestPlan,
-        'TestPlanCase': TestPlanCase,
-        'TestEnvironment': TestEnvironment,
-        'Defect': Defect,
-        'DefectWorkflow': DefectWorkflow,
-        'TestExecution': TestExecution,
-        'TestReport': TestReport,
-        'Tenant': Tenant,
-        'TenantUser': TenantUser,
-        'User': User,
-    }
+def create_app():
+    """
+    创建应用实例（flask 命令行通过 FLASK_APP=run.py 自动调用该工厂函数）
+
+    应用不在模块导入时创建：技能解析进程池的子进程会以 __mp_main__ 重新导入启动脚本，
+    模块级创建应用会让每个子进程都执行数据库迁移并注册全部钩子
+    """
+    app = create_flask_app(os.getenv('FLASK_ENV') or 'development')
+
+    # Shell上下文
+    @app.shell_context_processor
+    def make_shell_context():
+        """注册shell上下文"""
+        return {
+            'db': db,
+            'TestCase': TestCase,
+            'TestSuite': TestSuite,
+            'TestPlan': TestPlan,
+            'TestPlanCase': TestPlanCase,
+            'TestEnvironment': TestEnvironment,
+            'Defect': Defect,
+            'DefectWorkflow': DefectWorkflow,
+            'TestExecution': TestExecution,
+            'TestReport': TestReport,
+            'Tenant': Tenant,
+            'TenantUser': TenantUser,
+            'User': User,
+        }
+
+    return app
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
@@ -8,6 +8,15 @@ export const aiExecutionApi = {
   // 获取执行状态
   getStatus: (executionId) => request.get(`/ai-execution/${executionId}/status`),
 
+  // 长轮询获取增量事件（since 为已收到的最大事件序号）
+  getEvents: (executionId, params) => request.get(`/ai-execution/${executionId}/events`, { params }),
+
+  // SSE 事件流地址
+  getStreamUrl: (executionId, since = 0) => `${request.defaults.baseURL}/ai-execution/${executionId}/stream?since=${since}`,
+
+  // 按区间读取完整日志
+  getLogs: (executionId, params) => request.get(`/ai-execution/${executionId}/logs`, { params }),
+
   // 停止执行
   stop: (executionId) => request.post(`/ai-execution/${executionId}/stop`)
 }
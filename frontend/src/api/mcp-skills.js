@@ -21,13 +21,18 @@ export const mcpServerApi = {
   testConnection: (id) => request.post(`/mcp-servers/${id}/test`),
 
   // 同步MCP工具和资源
-  sync: (id) => request.post(`/mcp-servers/${id}/sync`),
+  sync: (id, force = false) => request.post(`/mcp-servers/${id}/sync`, null, { params: force ? { force: true } : {} }),
+  syncAll: (ids, force = false) => request.post('/mcp-servers/sync-all', { ...(ids ? { ids } : {}), force }),
+
+  // 获取MCP工具和资源目录（优先读取服务端缓存）
+  getCatalog: (id, refresh = false) => request.get(`/mcp-servers/${id}/catalog`, { params: refresh ? { refresh: true } : {} }),
 
   // 获取MCP Server工具列表
   getTools: (id) => request.get(`/mcp-servers/${id}/tools`),
 
   // 调用MCP Server工具
   invokeTool: (id, toolName, data) => request.post(`/mcp-servers/${id}/tools/${toolName}/invoke`, data),
+  invokeBatch: (id, calls, parallel = false) => request.post(`/mcp-servers/${id}/invoke-batch`, { calls, parallel }),
 
   // 获取MCP Server资源列表
   getResources: (id) => request.get(`/mcp-servers/${id}/resources`)
@@ -17,9 +17,21 @@ export const reportApi = {
   // 删除测试报告
   delete: (id) => request.delete(`/test-reports/${id}`),
 
-  // 导出报告
+  // 按测试计划的当前数据重新生成报告统计
+  regenerate: (id) => request.post(`/test-reports/${id}/regenerate`),
+
+  // 导出报告（报告内容未变化时直接返回已导出的文件，否则提交后台导出任务）
   export: (id, data) => request.post(`/test-reports/${id}/export`, data),
 
+  // 获取导出任务状态
+  getExportJob: (id, jobId) => request.get(`/test-reports/${id}/export/jobs/${jobId}`),
+
+  // 下载导出文件（export_url 由导出接口返回）
+  downloadExport: (exportUrl) => request.get(exportUrl, { responseType: 'blob', timeout: 0 }),
+
+  // 获取执行趋势（project_id、test_plan_id、from、to、granularity: day/week/month）
+  getTrends: (params) => request.get('/test-reports/trends', { params }),
+
   // 获取报告模板列表
   getTemplates: (params) => request.get('/test-reports/templates', { params }),
 
@@ -41,6 +53,6 @@ export const reportMetricApi = {
   // 删除度量指标
   delete: (id) => request.delete(`/report-metrics/${id}`),
 
-  // 批量创建度量指标
+  // 批量写入度量指标（按 report_id + metric_key 新增或覆盖，return_items 为 true 时返回写入后的指标）
   batchCreate: (data) => request.post('/report-metrics/batch', data)
 }